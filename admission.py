@@ -0,0 +1,130 @@
+"""
+Admission control for public deep links (/start case_…).
+
+When a popular case goes out, thousands of students tap the button at
+once. Each deep link costs several Bot API calls plus auto-delete jobs, so
+they are admitted through a semaphore (DEEPLINK_CONCURRENCY at a time)
+with a cap on how many may wait (own waiters + the update processor's
+public backlog). Beyond the cap the user gets one cheap "retry" reply;
+updates that already waited longer than DEEPLINK_MAX_AGE_SECONDS are
+dropped silently (the user has likely tapped again). Repeated taps of the
+same link are coalesced by the handler and counted as "deduped". Counters
+feed /slo and /metrics.
+"""
+
+import asyncio
+import threading
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from config import Config
+
+ADMITTED = "admitted"
+SHED_OVERLOADED = "overloaded"
+SHED_STALE = "stale"
+DEDUPED = "deduped"
+
+
+class AdmissionController:
+    """Semaphore-bounded admission with a queue-depth cap and stale-drop."""
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        max_age_seconds: float,
+        queue_depth: Optional[Callable[[], int]] = None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_age_seconds = max_age_seconds
+        # Extra backlog ahead of this layer (e.g. the update processor's)
+        self.queue_depth = queue_depth
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.running = 0
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def _is_stale(self, sent_at: Optional[datetime]) -> bool:
+        if sent_at is None or self.max_age_seconds <= 0:
+            return False
+        return (datetime.now(timezone.utc) - sent_at).total_seconds() > self.max_age_seconds
+
+    def depth(self) -> int:
+        return self.waiting + (self.queue_depth() if self.queue_depth else 0)
+
+    @asynccontextmanager
+    async def admit(self, sent_at: Optional[datetime] = None) -> AsyncIterator[str]:
+        """Yields ADMITTED (holding a slot for the body) or the shed reason.
+
+            async with deeplink_admission.admit(update.message.date) as outcome:
+                if outcome != ADMITTED:
+                    ...
+        """
+        if self._is_stale(sent_at):
+            self.record(SHED_STALE)
+            yield SHED_STALE
+            return
+        if self.depth() >= self.max_queue:
+            self.record(SHED_OVERLOADED)
+            yield SHED_OVERLOADED
+            return
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            # It may have gone stale while waiting for the slot
+            if self._is_stale(sent_at):
+                self.record(SHED_STALE)
+                yield SHED_STALE
+                return
+            self.record(ADMITTED)
+            self.running += 1
+            try:
+                yield ADMITTED
+            finally:
+                self.running -= 1
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            ADMITTED: counters.get(ADMITTED, 0),
+            SHED_OVERLOADED: counters.get(SHED_OVERLOADED, 0),
+            SHED_STALE: counters.get(SHED_STALE, 0),
+            DEDUPED: counters.get(DEDUPED, 0),
+        }
+
+    def render_prometheus(self, name: str = "deeplink") -> str:
+        stats = self.stats()
+        return (
+            f"# TYPE {name}_requests_total counter\n"
+            f'{name}_requests_total{{outcome="admitted"}} {stats[ADMITTED]}\n'
+            f'{name}_requests_total{{outcome="shed_overloaded"}} {stats[SHED_OVERLOADED]}\n'
+            f'{name}_requests_total{{outcome="shed_stale"}} {stats[SHED_STALE]}\n'
+            f'{name}_requests_total{{outcome="deduped"}} {stats[DEDUPED]}\n'
+            f"# TYPE {name}_running gauge\n"
+            f"{name}_running {stats['running']}\n"
+            f"# TYPE {name}_waiting gauge\n"
+            f"{name}_waiting {stats['waiting']}\n"
+        )
+
+
+# Process-wide instance for the /start deep-link handler
+deeplink_admission = AdmissionController(
+    Config.DEEPLINK_CONCURRENCY, Config.DEEPLINK_MAX_QUEUE, Config.DEEPLINK_MAX_AGE_SECONDS
+)
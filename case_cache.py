@@ -0,0 +1,74 @@
+"""
+In-process read-through cache for `cases` rows.
+
+Bounded LRU with a per-entry TTL, keyed by case UUID. Used by
+AsyncSupabaseClient so hot cases (just published, being edited, about to be
+published by the scheduler) cost no network round trip.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TTL_SECONDS = 600
+
+
+class CaseCache:
+    """LRU + TTL cache of case rows with hit/miss counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._rows: "OrderedDict[str, tuple]" = OrderedDict()  # uuid -> (expires_at, row)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, case_uuid: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached row, or None on miss/expiry."""
+        entry = self._rows.get(case_uuid)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, row = entry
+        if expires_at < time.monotonic():
+            del self._rows[case_uuid]
+            self.misses += 1
+            return None
+        self._rows.move_to_end(case_uuid)
+        self.hits += 1
+        return dict(row)
+
+    def put(self, row: Dict[str, Any]) -> None:
+        """Store (or replace) a full case row."""
+        case_uuid = row.get("id")
+        if not case_uuid or self.max_entries <= 0:
+            return
+        self._rows[case_uuid] = (time.monotonic() + self.ttl_seconds, dict(row))
+        self._rows.move_to_end(case_uuid)
+        while len(self._rows) > self.max_entries:
+            self._rows.popitem(last=False)
+
+    def merge(self, case_uuid: str, data: Dict[str, Any]) -> None:
+        """Apply a partial update to a cached row (no-op if not cached)."""
+        entry = self._rows.get(case_uuid)
+        if entry is None:
+            return
+        row = dict(entry[1])
+        row.update(data)
+        self.put(row)
+
+    def invalidate(self, case_uuid: str) -> None:
+        self._rows.pop(case_uuid, None)
+
+    def clear(self) -> None:
+        self._rows.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
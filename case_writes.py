@@ -0,0 +1,136 @@
+"""
+Write-behind buffer for draft (preview) case updates.
+
+Each photo of an album used to rewrite the whole case row. Updates queued
+here are debounced per case UUID, diffed column by column against the last
+persisted state, and sent as one minimal PATCH. flush() is the barrier used
+before preview/publish/schedule so nothing stale reaches the channel.
+"""
+
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 1.5
+DEFAULT_MAX_WAIT_SECONDS = 5.0
+
+
+def column_diff(desired: Dict[str, Any], persisted: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columns of `desired` whose value differs from `persisted`."""
+    if persisted is None:
+        return dict(desired)
+    return {k: v for k, v in desired.items() if k not in persisted or persisted[k] != v}
+
+
+class CaseWriteBuffer:
+    """Debounced, diffing write-behind buffer keyed by case UUID.
+
+    `write(case_uuid, columns) -> bool` performs the actual PATCH.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[str, Dict[str, Any]], Awaitable[bool]],
+        debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+    ):
+        self._write = write
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._desired: Dict[str, Dict[str, Any]] = {}
+        self._first_queued: Dict[str, float] = {}
+        self._persisted: Dict[str, Dict[str, Any]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.queued = 0
+        self.flushed_writes = 0
+        self.skipped_writes = 0
+
+    # ── Persisted-state bookkeeping ──
+
+    def track(self, row: Dict[str, Any]) -> None:
+        """Record a freshly persisted full row (e.g. right after save_case)."""
+        if row.get("id"):
+            self._persisted[row["id"]] = copy.deepcopy(row)
+
+    def note_written(self, case_uuid: str, columns: Dict[str, Any]) -> None:
+        """Record columns written outside the buffer (only for tracked cases)."""
+        if case_uuid in self._persisted:
+            self._persisted[case_uuid].update(copy.deepcopy(columns))
+
+    def discard(self, case_uuid: str) -> None:
+        """Forget everything about a case (deleted)."""
+        timer = self._timers.pop(case_uuid, None)
+        if timer:
+            timer.cancel()
+        self._desired.pop(case_uuid, None)
+        self._first_queued.pop(case_uuid, None)
+        self._persisted.pop(case_uuid, None)
+        self._locks.pop(case_uuid, None)
+
+    def has_pending(self, case_uuid: str) -> bool:
+        return case_uuid in self._desired
+
+    # ── Queue / flush ──
+
+    def queue(self, case_uuid: str, data: Dict[str, Any]) -> None:
+        """Queue the latest desired state of a case; written after the debounce."""
+        self._desired[case_uuid] = copy.deepcopy(data)
+        self._first_queued.setdefault(case_uuid, time.monotonic())
+        self.queued += 1
+        timer = self._timers.pop(case_uuid, None)
+        if timer:
+            timer.cancel()
+        elapsed = time.monotonic() - self._first_queued[case_uuid]
+        delay = max(0.0, min(self.debounce_seconds, self.max_wait_seconds - elapsed))
+        self._timers[case_uuid] = asyncio.create_task(self._flush_later(case_uuid, delay))
+
+    async def _flush_later(self, case_uuid: str, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        # Past the sleep: this flush must not be cancelled by a new queue()
+        self._timers.pop(case_uuid, None)
+        await self.flush(case_uuid)
+
+    async def flush(self, case_uuid: str) -> bool:
+        """Write the pending state of one case now. True if nothing failed."""
+        timer = self._timers.pop(case_uuid, None)
+        if timer:
+            timer.cancel()
+        lock = self._locks.setdefault(case_uuid, asyncio.Lock())
+        async with lock:
+            desired = self._desired.pop(case_uuid, None)
+            self._first_queued.pop(case_uuid, None)
+            if desired is None:
+                return True
+            diff = column_diff(desired, self._persisted.get(case_uuid))
+            if not diff:
+                self.skipped_writes += 1
+                return True
+            ok = await self._write(case_uuid, diff)
+            if ok:
+                self.flushed_writes += 1
+                self._persisted.setdefault(case_uuid, {}).update(copy.deepcopy(diff))
+                logger.info(f"Flushed {len(diff)} column(s) of case {case_uuid}: {sorted(diff)}")
+            else:
+                # Keep it for the next barrier unless something newer was queued
+                self._desired.setdefault(case_uuid, desired)
+            return ok
+
+    async def flush_all(self) -> bool:
+        results = [await self.flush(case_uuid) for case_uuid in list(self._desired)]
+        return all(results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._desired),
+            "queued": self.queued,
+            "flushed_writes": self.flushed_writes,
+            "skipped_writes": self.skipped_writes,
+        }
@@ -4,6 +4,7 @@ Loads environment variables with sensible defaults.
 """
 
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -38,11 +39,100 @@ class Config:
     AUTO_DELETE_MINUTES = int(os.getenv("AUTO_DELETE_MINUTES", "10"))
     TZ = os.getenv("TZ", "America/Bogota")
 
+    # Case cache (in-process, keyed by case UUID)
+    CASE_CACHE_SIZE = int(os.getenv("CASE_CACHE_SIZE", "500"))
+    CASE_CACHE_TTL_SECONDS = int(os.getenv("CASE_CACHE_TTL_SECONDS", "600"))
+    CASE_CACHE_WARM_COUNT = int(os.getenv("CASE_CACHE_WARM_COUNT", "50"))
+
+    # Debounce for buffered draft-case writes (photo albums, edits)
+    CASE_WRITE_DEBOUNCE_SECONDS = float(os.getenv("CASE_WRITE_DEBOUNCE_SECONDS", "1.5"))
+
+    # bot_settings snapshot refresh interval
+    SETTINGS_REFRESH_SECONDS = int(os.getenv("SETTINGS_REFRESH_SECONDS", "300"))
+
+    # Supabase call resilience (retries + circuit breaker)
+    SUPABASE_RETRY_ATTEMPTS = int(os.getenv("SUPABASE_RETRY_ATTEMPTS", "3"))
+    SUPABASE_BREAKER_THRESHOLD = int(os.getenv("SUPABASE_BREAKER_THRESHOLD", "5"))
+    SUPABASE_BREAKER_RESET_SECONDS = int(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "30"))
+
+    # Local write-ahead journal for Supabase mutations (empty = disabled)
+    WRITE_JOURNAL_PATH = os.getenv("WRITE_JOURNAL_PATH", "")
+
+    # Scheduler safety-net poll (the timer heap handles exact deadlines)
+    SCHEDULER_RECONCILE_SECONDS = int(os.getenv("SCHEDULER_RECONCILE_SECONDS", "300"))
+
+    # Catch-up of posts missed while the bot was down:
+    # up to GRACE late counts as on time; beyond MAX_LATENESS the post is failed;
+    # in between posts are published late, one every SPACING seconds
+    CATCHUP_GRACE_SECONDS = int(os.getenv("CATCHUP_GRACE_SECONDS", "120"))
+    CATCHUP_MAX_LATENESS_SECONDS = int(os.getenv("CATCHUP_MAX_LATENESS_SECONDS", "7200"))
+    CATCHUP_SPACING_SECONDS = int(os.getenv("CATCHUP_SPACING_SECONDS", "60"))
+
+    # Scheduled polls are rendered and validated this long before their slot
+    PUBLISH_PREFETCH_SECONDS = int(os.getenv("PUBLISH_PREFETCH_SECONDS", "300"))
+
+    # Channel send rate (Bot API allows ~20 messages/min per channel)
+    CHANNEL_RATE_PER_MINUTE = float(os.getenv("CHANNEL_RATE_PER_MINUTE", "20"))
+    CHANNEL_BURST = int(os.getenv("CHANNEL_BURST", "3"))
+
+    # Publish leases: identity of this process and how long a claim lasts
+    INSTANCE_ID = os.getenv("INSTANCE_ID", "") or f"{socket.gethostname()}:{os.getpid()}"
+    PUBLISH_LEASE_SECONDS = int(os.getenv("PUBLISH_LEASE_SECONDS", "120"))
+
+    # Storage backend: "supabase" (production) or "sqlite" (local dev / benchmarks)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", "local.db")
+    LOCAL_BUCKET_DIR = os.getenv("LOCAL_BUCKET_DIR", "local_bucket")
+    LOCAL_BUCKET_URL = os.getenv("LOCAL_BUCKET_URL", "")  # public base URL of the bucket dir, if served
+
+    # How Telegram updates arrive: "polling" or "webhook" (served on PORT
+    # together with the health/metrics routes; needs WEBHOOK_URL + WEBHOOK_SECRET)
+    UPDATE_MODE = os.getenv("UPDATE_MODE", "polling").lower()
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "") or os.getenv("RENDER_EXTERNAL_URL", "")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+    # Updates processed in parallel (different users; one user's updates stay
+    # in order). 1 = strictly sequential, as PTB does by default
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "16"))
+    # Extra slots reserved for admin updates (fast lane), never used by public traffic
+    ADMIN_LANE_CONCURRENCY = int(os.getenv("ADMIN_LANE_CONCURRENCY", "4"))
+
+    # Admission control of public deep links: concurrent handlers, max backlog
+    # before answering "retry", and age after which a waiting tap is dropped
+    DEEPLINK_CONCURRENCY = int(os.getenv("DEEPLINK_CONCURRENCY", "8"))
+    DEEPLINK_MAX_QUEUE = int(os.getenv("DEEPLINK_MAX_QUEUE", "200"))
+    DEEPLINK_MAX_AGE_SECONDS = int(os.getenv("DEEPLINK_MAX_AGE_SECONDS", "60"))
+    # Same link tapped again by the same user within this window: keep the
+    # Mini App message already sent instead of deleting and re-sending it
+    DEEPLINK_DEDUPE_SECONDS = int(os.getenv("DEEPLINK_DEDUPE_SECONDS", "10"))
+
+    # Process role: "all" (single process), or one of the split roles
+    # "updates" (Telegram updates + handlers), "scheduler" (scheduled
+    # publishing) and "media" (image download/upload jobs)
+    BOT_ROLE = os.getenv("BOT_ROLE", "all").lower()
+    # Split roles do not see each other's schedule changes: reconcile more often
+    SPLIT_SCHEDULER_RECONCILE_SECONDS = int(os.getenv("SPLIT_SCHEDULER_RECONCILE_SECONDS", "30"))
+    MEDIA_WORKER_POLL_SECONDS = float(os.getenv("MEDIA_WORKER_POLL_SECONDS", "1"))
+    MEDIA_JOB_TIMEOUT_SECONDS = int(os.getenv("MEDIA_JOB_TIMEOUT_SECONDS", "90"))
+
     # Validation
     @staticmethod
     def validate():
         """Validate that all required configuration values are set."""
-        required = ["BOT_TOKEN", "PUBLIC_CHANNEL_ID", "SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_SERVICE_KEY", "MINIAPP_URL"]
+        required = ["BOT_TOKEN", "PUBLIC_CHANNEL_ID", "MINIAPP_URL"]
+        if Config.STORAGE_BACKEND == "supabase":
+            required += ["SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_SERVICE_KEY"]
+        elif Config.STORAGE_BACKEND != "sqlite":
+            raise ValueError(f"Unknown STORAGE_BACKEND: {Config.STORAGE_BACKEND!r} (use 'supabase' or 'sqlite')")
+        if Config.BOT_ROLE not in ("all", "updates", "scheduler", "media"):
+            raise ValueError(
+                f"Unknown BOT_ROLE: {Config.BOT_ROLE!r} (use 'all', 'updates', 'scheduler' or 'media')"
+            )
+        if Config.UPDATE_MODE == "webhook":
+            required += ["WEBHOOK_URL", "WEBHOOK_SECRET"]
+        elif Config.UPDATE_MODE != "polling":
+            raise ValueError(f"Unknown UPDATE_MODE: {Config.UPDATE_MODE!r} (use 'polling' or 'webhook')")
         missing = [key for key in required if not getattr(Config, key)]
         if missing:
             raise ValueError(f"Missing required configuration values: {missing}")
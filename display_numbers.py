@@ -0,0 +1,63 @@
+"""
+Display numbers (#1000-#3000) shown in the Mini App for each case.
+
+The number is a hash of the case UUID, so collisions are expected once the
+bank grows. DisplayNumberIndex keeps display_number → UUIDs in memory so
+/editar_caso can resolve a number without scanning the cases table.
+"""
+
+from typing import Dict, Iterable, List, Set
+
+
+def case_display_num(uuid_str: str) -> int:
+    """Generate a consistent display number (1000-3000) from UUID hash.
+    Must match the JavaScript version in index.html exactly."""
+    if not uuid_str:
+        return 1000
+    h = 0
+    for ch in uuid_str:
+        h = ((h << 5) - h) + ord(ch)
+        h &= 0xFFFFFFFF  # Keep as 32-bit
+        if h >= 0x80000000:
+            h -= 0x100000000  # Convert to signed 32-bit
+    return 1000 + (abs(h) % 2001)
+
+
+class DisplayNumberIndex:
+    """In-memory display_number → {case UUID} map for published cases."""
+
+    def __init__(self):
+        self._by_number: Dict[int, Set[str]] = {}
+        self._by_uuid: Dict[str, int] = {}
+        self.loaded = False
+
+    def rebuild(self, rows: Iterable[Dict]) -> None:
+        """Replace the index with rows of {"id", "display_number"}."""
+        self._by_number.clear()
+        self._by_uuid.clear()
+        for row in rows:
+            if row.get("display_number") is not None:
+                self.add(row["id"], row["display_number"])
+        self.loaded = True
+
+    def add(self, case_uuid: str, display_number: int) -> None:
+        self.remove(case_uuid)
+        self._by_number.setdefault(int(display_number), set()).add(case_uuid)
+        self._by_uuid[case_uuid] = int(display_number)
+
+    def remove(self, case_uuid: str) -> None:
+        old = self._by_uuid.pop(case_uuid, None)
+        if old is None:
+            return
+        uuids = self._by_number.get(old)
+        if uuids:
+            uuids.discard(case_uuid)
+            if not uuids:
+                del self._by_number[old]
+
+    def lookup(self, display_number: int) -> List[str]:
+        """UUIDs sharing this display number (sorted for stable prompts)."""
+        return sorted(self._by_number.get(display_number, ()))
+
+    def __len__(self) -> int:
+        return len(self._by_uuid)
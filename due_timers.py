@@ -0,0 +1,73 @@
+"""
+In-memory min-heap of pending scheduled posts, keyed by deadline.
+
+The scheduler sleeps until the earliest deadline instead of polling.
+Entries are added/removed through the storage client's schedule listeners;
+removals are lazy (stale heap items are skipped when they surface).
+"""
+
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def deadline_of(scheduled_at) -> float:
+    """Epoch seconds of a scheduled_at value (datetime or ISO string)."""
+    if isinstance(scheduled_at, str):
+        scheduled_at = datetime.fromisoformat(scheduled_at.replace("Z", "+00:00"))
+    return scheduled_at.timestamp()
+
+
+class DueTimerHeap:
+    """entry_id → deadline, with O(log n) push and earliest-deadline peek.
+
+    `lead_seconds` moves every deadline earlier (e.g. to prepare posts
+    ahead of their scheduled_at).
+    """
+
+    def __init__(self, lead_seconds: float = 0.0):
+        self.lead_seconds = lead_seconds
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+
+    def rebuild(self, rows: Iterable[Dict]) -> None:
+        """Replace the content with rows of {"id", "scheduled_at"}."""
+        self._deadlines = {row["id"]: deadline_of(row["scheduled_at"]) - self.lead_seconds for row in rows}
+        self._heap = [(deadline, entry_id) for entry_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def add(self, entry_id: str, scheduled_at) -> None:
+        deadline = deadline_of(scheduled_at) - self.lead_seconds
+        self._deadlines[entry_id] = deadline
+        heapq.heappush(self._heap, (deadline, entry_id))
+
+    def remove(self, entry_id: str) -> None:
+        self._deadlines.pop(entry_id, None)
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        return max(0.0, deadline - (time.time() if now is None else now))
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Remove and return every entry whose deadline has passed."""
+        now = time.time() if now is None else now
+        due = []
+        while self.next_deadline() is not None and self._heap[0][0] <= now:
+            _, entry_id = heapq.heappop(self._heap)
+            del self._deadlines[entry_id]
+            due.append(entry_id)
+        return due
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
@@ -0,0 +1,805 @@
+"""
+SQLite-backed stand-in for AsyncSupabaseClient.
+
+Selected with STORAGE_BACKEND=sqlite. It exposes the same coroutine surface
+as AsyncSupabaseClient on top of one local SQLite file (cases,
+scheduled_posts, bot_settings) plus a directory used as the image bucket,
+so the bot, the scheduler and benchmarks run without the live service.
+
+Rows come back shaped like PostgREST responses: JSON columns decoded,
+booleans as bool, timestamps as UTC ISO strings and `cases(...)` joins
+embedded under the "cases" key.
+"""
+
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+
+from case_writes import CaseWriteBuffer, DEFAULT_DEBOUNCE_SECONDS
+from display_numbers import case_display_num
+from supabase_client import (
+    DUE_POSTS_BATCH,
+    DUE_POST_COLUMNS,
+    CLAIM_BATCH_SIZE,
+    DEFAULT_LEASE_SECONDS,
+    MEDIA_CLAIM_BATCH_SIZE,
+    MEDIA_LEASE_SECONDS,
+    QUEUE_COLUMNS,
+    QUEUE_PAGE_SIZE,
+    SCHEDULED_POST_COLUMNS,
+    QueueCursor,
+    ScheduleNotifier,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id TEXT PRIMARY KEY,
+    vignette TEXT NOT NULL DEFAULT '',
+    options TEXT NOT NULL DEFAULT '[]',
+    correct_letter TEXT NOT NULL DEFAULT '',
+    correct_text TEXT NOT NULL DEFAULT '',
+    justification TEXT NOT NULL DEFAULT '',
+    tip TEXT NOT NULL DEFAULT '',
+    bibliography TEXT NOT NULL DEFAULT '[]',
+    images TEXT NOT NULL DEFAULT '[]',
+    published INTEGER NOT NULL DEFAULT 0,
+    telegram_message_id INTEGER,
+    display_number INTEGER,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_display_number_idx ON cases (display_number) WHERE published = 1;
+
+CREATE TABLE IF NOT EXISTS scheduled_posts (
+    id TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL REFERENCES cases (id) ON DELETE CASCADE,
+    scheduled_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    admin_user_id INTEGER,
+    source TEXT NOT NULL DEFAULT 'manual',
+    telegram_message_id INTEGER,
+    published_at TEXT,
+    error_message TEXT,
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scheduled_posts_status_idx ON scheduled_posts (status, scheduled_at);
+
+CREATE TABLE IF NOT EXISTS bot_settings (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS case_number_seq (
+    n INTEGER PRIMARY KEY AUTOINCREMENT
+);
+
+CREATE TABLE IF NOT EXISTS media_jobs (
+    id TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    result_url TEXT,
+    error_message TEXT,
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    created_at TEXT NOT NULL
+);
+"""
+
+CASE_JSON_COLUMNS = ("options", "bibliography", "images")
+CASE_BOOL_COLUMNS = ("published",)
+
+
+def _split_columns(columns: str) -> List[str]:
+    """Split a PostgREST select list on top-level commas."""
+    parts, depth, current = [], 0, ""
+    for ch in columns:
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _utc_iso(value: datetime) -> str:
+    """Normalize a datetime the way timestamptz does (naive = UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+class LocalSqliteClient(ScheduleNotifier):
+    """AsyncSupabaseClient look-alike backed by SQLite and a local folder.
+
+    Calls are synchronous SQLite statements on a local file, fast enough to
+    run directly on the event loop. Public methods keep the Supabase
+    client's contract: errors are logged and None/False/[] is returned.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        bucket_dir: str,
+        bucket_url: str = "",
+        write_debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+    ):
+        self.db_path = db_path
+        self.bucket_dir = Path(bucket_dir)
+        self.bucket_dir.mkdir(parents=True, exist_ok=True)
+        self.bucket_url = bucket_url.rstrip("/")
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._case_columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(cases)")}
+        self.case_writes = CaseWriteBuffer(self._patch_case, write_debounce)
+        self.journal = None
+        self.schedule_listeners = []
+        logger.info(f"Local SQLite backend at {db_path} (bucket {self.bucket_dir})")
+
+    async def close(self) -> None:
+        self.conn.close()
+
+    # ── Health / stats (same shape as the Supabase client) ──
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        return {"breaker_state": "closed", "breaker_trips": 0, "retries": 0, "fast_failures": 0}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"size": 0, "hits": 0, "misses": 0, "hit_ratio": 0.0}
+
+    def journal_stats(self) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def drain_journal_loop(self) -> None:
+        return
+
+    # ── Row helpers ──
+
+    def _query(self, sql: str, args: Iterable = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.conn.execute(sql, tuple(args)).fetchall()]
+
+    def _case_out(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        for col in CASE_JSON_COLUMNS:
+            if col in row and isinstance(row[col], str):
+                row[col] = json.loads(row[col])
+        for col in CASE_BOOL_COLUMNS:
+            if col in row and row[col] is not None:
+                row[col] = bool(row[col])
+        return row
+
+    def _case_in(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep known columns only and encode them for SQLite."""
+        row = {}
+        for col, value in data.items():
+            if col not in self._case_columns:
+                continue
+            if col in CASE_JSON_COLUMNS:
+                value = json.dumps(value or [])
+            elif col in CASE_BOOL_COLUMNS:
+                value = 1 if value else 0
+            row[col] = value
+        return row
+
+    def _project(self, posts: List[Dict[str, Any]], columns: str = "*") -> List[Dict[str, Any]]:
+        """Apply a PostgREST-style select list to scheduled_posts rows,
+        embedding `cases(...)` like the PostgREST join."""
+        parts = _split_columns(columns)
+        join = next((p for p in parts if p.startswith("cases(")), None)
+        cases: Dict[str, Dict[str, Any]] = {}
+        case_ids = list({post["case_id"] for post in posts})
+        if join and case_ids:
+            placeholders = ",".join("?" * len(case_ids))
+            cases = {
+                row["id"]: self._case_out(row)
+                for row in self._query(f"SELECT * FROM cases WHERE id IN ({placeholders})", case_ids)
+            }
+        wanted_case = _split_columns(join[len("cases("):-1]) if join else []
+        result = []
+        for post in posts:
+            out = dict(post) if "*" in parts else {p: post.get(p) for p in parts if p != join}
+            if join:
+                case = cases.get(post["case_id"])
+                if case is not None and "*" not in wanted_case:
+                    case = {c: case.get(c) for c in wanted_case}
+                out["cases"] = case
+            result.append(out)
+        return result
+
+    def _pending_page(
+        self, extra_where: str, args: List[Any], limit: int, after: Optional[QueueCursor]
+    ) -> List[Dict[str, Any]]:
+        """Keyset page of pending posts ordered by (scheduled_at, id)."""
+        where = "status = 'pending'" + extra_where
+        if after:
+            where += " AND (scheduled_at > ? OR (scheduled_at = ? AND id > ?))"
+            args = [*args, after[0], after[0], after[1]]
+        return self._query(
+            f"SELECT * FROM scheduled_posts WHERE {where} ORDER BY scheduled_at, id LIMIT ?", [*args, limit]
+        )
+
+    # ═══════════════════════════════════════════
+    # CASES TABLE
+    # ═══════════════════════════════════════════
+
+    async def save_case(self, parsed_case: Dict[str, Any]) -> Optional[str]:
+        """Save a parsed case to the database. Returns UUID."""
+        try:
+            case_uuid = str(uuid.uuid4())
+            case_data = {
+                "id": case_uuid,
+                "vignette": parsed_case.get("vignette", ""),
+                "options": [
+                    {"letter": opt.get("letter", ""), "text": opt.get("text", "")}
+                    for opt in parsed_case.get("options", [])
+                ],
+                "correct_letter": parsed_case.get("correct_letter", ""),
+                "correct_text": parsed_case.get("correct_text", ""),
+                "justification": parsed_case.get("justification", ""),
+                "tip": parsed_case.get("tip", ""),
+                "bibliography": parsed_case.get("bibliography", []),
+                "images": parsed_case.get("images", []),
+                "published": False,
+                "telegram_message_id": None,
+            }
+            row = self._case_in(case_data)
+            row["created_at"] = _utc_iso(datetime.now(timezone.utc))
+            cols = ",".join(row)
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO cases ({cols}) VALUES ({','.join('?' * len(row))})",
+                tuple(row.values()),
+            )
+            self.case_writes.track(case_data)
+            logger.info(f"Case saved with UUID: {case_uuid}")
+            return case_uuid
+        except Exception as e:
+            logger.error(f"Error saving case to database: {e}")
+            return None
+
+    async def get_case(self, case_uuid: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Retrieve a case by UUID (always from the DB: `fresh` is accepted
+        for parity with the Supabase client)."""
+        try:
+            rows = self._query("SELECT * FROM cases WHERE id = ?", (case_uuid,))
+            if rows:
+                return self._case_out(rows[0])
+            logger.warning(f"Case not found: {case_uuid}")
+            return None
+        except Exception as e:
+            logger.error(f"Error retrieving case: {e}")
+            return None
+
+    async def update_case(self, case_uuid: str, data: Dict[str, Any]) -> bool:
+        """Update a case. Buffered writes for the same case are flushed first."""
+        if self.case_writes.has_pending(case_uuid):
+            await self.case_writes.flush(case_uuid)
+        ok = await self._patch_case(case_uuid, data)
+        if ok:
+            self.case_writes.note_written(case_uuid, data)
+        return ok
+
+    async def _patch_case(self, case_uuid: str, data: Dict[str, Any]) -> bool:
+        try:
+            row = self._case_in(data)
+            if row:
+                assignments = ",".join(f"{col} = ?" for col in row)
+                self.conn.execute(
+                    f"UPDATE cases SET {assignments} WHERE id = ?", (*row.values(), case_uuid)
+                )
+            logger.info(f"Case updated: {case_uuid}")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating case: {e}")
+            return False
+
+    def queue_case_update(self, case_uuid: str, data: Dict[str, Any]) -> None:
+        self.case_writes.queue(case_uuid, data)
+
+    async def flush_case_writes(self, case_uuid: Optional[str] = None) -> bool:
+        if case_uuid is None:
+            return await self.case_writes.flush_all()
+        return await self.case_writes.flush(case_uuid)
+
+    async def sync_case(self, case_uuid: str, data: Dict[str, Any]) -> bool:
+        self.case_writes.queue(case_uuid, data)
+        return await self.case_writes.flush(case_uuid)
+
+    async def upload_image(self, file_bytes: bytes, filename: str) -> Optional[str]:
+        """Store an image in the bucket directory. Returns its public URL."""
+        try:
+            unique_filename = f"{uuid.uuid4()}_{os.path.basename(filename)}"
+            path = self.bucket_dir / unique_filename
+            await asyncio.to_thread(path.write_bytes, file_bytes)
+            logger.info(f"Image stored: {unique_filename} ({mimetypes.guess_type(filename)[0]})")
+            if self.bucket_url:
+                return f"{self.bucket_url}/{unique_filename}"
+            return path.resolve().as_uri()
+        except Exception as e:
+            logger.error(f"Error uploading image: {e}")
+            return None
+
+    async def get_case_images(self, case_uuid: str) -> List[str]:
+        case = await self.get_case(case_uuid)
+        if case and "images" in case:
+            return case["images"]
+        return []
+
+    async def delete_case(self, case_uuid: str) -> bool:
+        """Delete a case (its scheduled posts go with it)."""
+        self.case_writes.discard(case_uuid)
+        try:
+            self.conn.execute("DELETE FROM cases WHERE id = ?", (case_uuid,))
+            logger.info(f"Case deleted: {case_uuid}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting case: {e}")
+            return False
+
+    async def get_next_case_number(self) -> int:
+        """Next value of the local case-number sequence."""
+        try:
+            return self.conn.execute("INSERT INTO case_number_seq DEFAULT VALUES").lastrowid
+        except Exception as e:
+            # Raised like the Supabase client: a made-up number could repeat
+            logger.error(f"Error getting next case number: {e}")
+            raise
+
+    # ── Display numbers ──
+
+    async def load_display_index(self) -> int:
+        """Display numbers are served by the SQLite index; nothing to load."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM cases WHERE published = 1 AND display_number IS NOT NULL"
+        ).fetchone()[0]
+
+    async def backfill_display_numbers(self) -> int:
+        try:
+            rows = self._query("SELECT id FROM cases WHERE published = 1 AND display_number IS NULL")
+            self.conn.executemany(
+                "UPDATE cases SET display_number = ? WHERE id = ?",
+                [(case_display_num(row["id"]), row["id"]) for row in rows],
+            )
+            if rows:
+                logger.info(f"Backfilled display_number for {len(rows)} cases")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error backfilling display numbers: {e}")
+            return 0
+
+    async def find_case_ids_by_display_number(self, display_number: int) -> List[str]:
+        try:
+            rows = self._query(
+                "SELECT id FROM cases WHERE published = 1 AND display_number = ? ORDER BY id",
+                (display_number,),
+            )
+            return [row["id"] for row in rows]
+        except Exception as e:
+            logger.error(f"Error finding case #{display_number}: {e}")
+            return []
+
+    async def warm_case_cache(self, limit: int = 50) -> int:
+        return 0
+
+    # ═══════════════════════════════════════════
+    # SCHEDULED POSTS TABLE
+    # ═══════════════════════════════════════════
+
+    def _insert_post(self, case_id: str, scheduled_at: datetime, admin_user_id: int, source: str) -> str:
+        entry_id = str(uuid.uuid4())
+        self.conn.execute(
+            "INSERT INTO scheduled_posts (id, case_id, scheduled_at, status, admin_user_id, source, created_at) "
+            "VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+            (entry_id, case_id, _utc_iso(scheduled_at), admin_user_id, source, _utc_iso(datetime.now(timezone.utc))),
+        )
+        return entry_id
+
+    async def schedule_case(self, case_id: str, scheduled_at: datetime, admin_user_id: int) -> Optional[str]:
+        """Schedule a case for future publication. Returns the entry UUID."""
+        try:
+            entry_id = self._insert_post(case_id, scheduled_at, admin_user_id, "manual")
+            logger.info(f"Case {case_id} scheduled for {scheduled_at} (entry {entry_id})")
+            self._notify_schedule("scheduled", entry_id, scheduled_at)
+            return entry_id
+        except Exception as e:
+            logger.error(f"Error scheduling case: {e}")
+            return None
+
+    async def get_due_posts(
+        self,
+        now: datetime,
+        limit: int = DUE_POSTS_BATCH,
+        after: Optional[QueueCursor] = None,
+        columns: str = DUE_POST_COLUMNS,
+    ) -> List[Dict[str, Any]]:
+        try:
+            posts = self._pending_page(" AND scheduled_at <= ?", [_utc_iso(now)], limit, after)
+            return self._project(posts, columns)
+        except Exception as e:
+            logger.error(f"Error fetching due posts: {e}")
+            return []
+
+    async def get_queue(
+        self,
+        limit: int = QUEUE_PAGE_SIZE,
+        after: Optional[QueueCursor] = None,
+        columns: str = QUEUE_COLUMNS,
+    ) -> List[Dict[str, Any]]:
+        try:
+            return self._project(self._pending_page("", [], limit, after), columns)
+        except Exception as e:
+            logger.error(f"Error fetching queue: {e}")
+            return []
+
+    async def count_queue(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM scheduled_posts WHERE status = 'pending'").fetchone()[0]
+
+    async def get_scheduled_post(
+        self, entry_id: str, columns: str = SCHEDULED_POST_COLUMNS
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            posts = self._project(self._query("SELECT * FROM scheduled_posts WHERE id = ?", (entry_id,)), columns)
+            return posts[0] if posts else None
+        except Exception as e:
+            logger.error(f"Error fetching scheduled post {entry_id}: {e}")
+            return None
+
+    async def get_scheduled_case_id(self, entry_id: str) -> Optional[str]:
+        post = self.conn.execute("SELECT case_id FROM scheduled_posts WHERE id = ?", (entry_id,)).fetchone()
+        return post["case_id"] if post else None
+
+    async def mark_publishing(
+        self, entry_id: str, owner: Optional[str] = None, lease_expires_at: Optional[datetime] = None
+    ) -> bool:
+        try:
+            cursor = self.conn.execute(
+                "UPDATE scheduled_posts SET status = 'publishing', lease_owner = ?, lease_expires_at = ? "
+                "WHERE id = ? AND status = 'pending'",
+                (owner, _utc_iso(lease_expires_at) if lease_expires_at else None, entry_id),
+            )
+            return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error marking post as publishing: {e}")
+            return False
+
+    async def claim_due_posts(
+        self,
+        owner: str,
+        now: datetime,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        limit: int = CLAIM_BATCH_SIZE,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Same contract as the claim_due_posts RPC, in one SQLite transaction.
+        None when the claim failed."""
+        now_iso = _utc_iso(now)
+        expires = _utc_iso(now + timedelta(seconds=lease_seconds))
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                rows = self._query(
+                    "SELECT id, case_id, scheduled_at, status = 'publishing' AS reclaimed FROM scheduled_posts "
+                    "WHERE (status = 'pending' AND scheduled_at <= ?) "
+                    "OR (status = 'publishing' AND lease_expires_at < ?) "
+                    "ORDER BY scheduled_at, id LIMIT ?",
+                    (now_iso, now_iso, limit),
+                )
+                self.conn.executemany(
+                    "UPDATE scheduled_posts SET status = 'publishing', lease_owner = ?, lease_expires_at = ? "
+                    "WHERE id = ?",
+                    [(owner, expires, row["id"]) for row in rows],
+                )
+            for row in rows:
+                row["reclaimed"] = bool(row["reclaimed"])
+            return rows
+        except Exception as e:
+            logger.error(f"Error claiming due posts: {e}")
+            return None
+
+    @staticmethod
+    def _claimed_by(entry_id: str, owner: Optional[str]) -> Tuple[str, List[Any]]:
+        if owner:
+            return "id = ? AND status = 'publishing' AND lease_owner = ?", [entry_id, owner]
+        return "id = ?", [entry_id]
+
+    async def mark_done(
+        self,
+        entry_id: str,
+        telegram_message_id: Optional[int],
+        note: Optional[str] = None,
+        owner: Optional[str] = None,
+    ) -> bool:
+        try:
+            where, args = self._claimed_by(entry_id, owner)
+            # Nothing sent (no message id): keep published_at / telegram_message_id
+            sent = telegram_message_id is not None
+            self.conn.execute(
+                "UPDATE scheduled_posts SET status = 'done', "
+                "published_at = CASE WHEN ? THEN ? ELSE published_at END, "
+                "telegram_message_id = COALESCE(?, telegram_message_id), "
+                f"error_message = COALESCE(?, error_message) WHERE {where}",
+                [sent, _utc_iso(datetime.now(timezone.utc)), telegram_message_id, note, *args],
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error marking post as done: {e}")
+            return False
+
+    async def mark_failed(self, entry_id: str, error_msg: str, owner: Optional[str] = None) -> bool:
+        try:
+            where, args = self._claimed_by(entry_id, owner)
+            self.conn.execute(
+                f"UPDATE scheduled_posts SET status = 'failed', error_message = ? WHERE {where}",
+                [error_msg[:500], *args],
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error marking post as failed: {e}")
+            return False
+
+    async def cancel_scheduled(self, entry_id: str) -> bool:
+        """Cancel a pending scheduled post and delete its case."""
+        try:
+            post = self.conn.execute(
+                "SELECT case_id, status FROM scheduled_posts WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if not post:
+                return False
+            if post["status"] != "pending":
+                logger.warning(f"Cannot cancel post {entry_id}: status is {post['status']}")
+                return False
+            deleted = self.conn.execute(
+                "DELETE FROM scheduled_posts WHERE id = ? AND status = 'pending'", (entry_id,)
+            ).rowcount
+            if not deleted:
+                logger.warning(f"Cannot cancel post {entry_id}: no longer pending")
+                return False
+            self._notify_schedule("cancelled", entry_id)
+            await self.delete_case(post["case_id"])
+            logger.info(f"Scheduled post {entry_id} cancelled + case {post['case_id']} deleted")
+            return True
+        except Exception as e:
+            logger.error(f"Error cancelling scheduled post: {e}")
+            return False
+
+    # ── Bulk status transitions ──
+
+    def _transition_posts(
+        self, where: str, args: Iterable, data: Dict[str, Any], select: str = "*"
+    ) -> List[Dict[str, Any]]:
+        """Apply `data` to every post matching `where` in one transaction and
+        return the affected rows (ordered by scheduled_at)."""
+        assignments = ",".join(f"{col} = ?" for col in data)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self._query(f"SELECT id FROM scheduled_posts WHERE {where}", args)
+            ids = [row["id"] for row in rows]
+            if not ids:
+                return []
+            placeholders = ",".join("?" * len(ids))
+            self.conn.execute(
+                f"UPDATE scheduled_posts SET {assignments} WHERE id IN ({placeholders})",
+                (*data.values(), *ids),
+            )
+            posts = self._query(
+                f"SELECT * FROM scheduled_posts WHERE id IN ({placeholders}) ORDER BY scheduled_at", ids
+            )
+        return self._project(posts, select)
+
+    async def fail_overdue_posts(self, now: datetime, error_msg: str) -> List[Dict[str, Any]]:
+        try:
+            return self._transition_posts(
+                "status = 'pending' AND scheduled_at < ?",
+                (_utc_iso(now),),
+                {"status": "failed", "error_message": error_msg[:500]},
+                select="id,case_id,scheduled_at,cases(vignette)",
+            )
+        except Exception as e:
+            logger.error(f"Error failing overdue posts: {e}")
+            return []
+
+    async def fail_stuck_publishing(self, error_msg: str) -> List[Dict[str, Any]]:
+        try:
+            return self._transition_posts(
+                "status = 'publishing' AND lease_expires_at IS NULL",
+                (),
+                {"status": "failed", "error_message": error_msg[:500]},
+            )
+        except Exception as e:
+            logger.error(f"Error failing stuck publishing posts: {e}")
+            return []
+
+    async def set_posts_status(
+        self, entry_ids: List[str], status: str, error_msg: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if not entry_ids:
+            return []
+        data: Dict[str, Any] = {"status": status}
+        if error_msg is not None:
+            data["error_message"] = error_msg[:500]
+        try:
+            return self._transition_posts(f"id IN ({','.join('?' * len(entry_ids))})", entry_ids, data)
+        except Exception as e:
+            logger.error(f"Error setting status {status} on {len(entry_ids)} posts: {e}")
+            return []
+
+    async def mark_overdue_as_failed(self, now: datetime, max_lateness_seconds: float = 0) -> List[Dict[str, Any]]:
+        cutoff = now - timedelta(seconds=max_lateness_seconds)
+        overdue = await self.fail_overdue_posts(cutoff, "Bot estaba offline a la hora programada")
+        if overdue:
+            logger.warning(f"Marked {len(overdue)} overdue posts as failed on startup")
+        return overdue
+
+    # ═══════════════════════════════════════════
+    # BOT SETTINGS TABLE
+    # ═══════════════════════════════════════════
+
+    async def load_settings(self) -> bool:
+        return True
+
+    async def settings_refresh_loop(self, interval: float = 0) -> None:
+        return
+
+    async def get_setting(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM bot_settings WHERE key = ?", (key,)).fetchone()
+        if row is None or row["value"] is None:
+            return default
+        return json.loads(row["value"])
+
+    async def set_setting(self, key: str, value) -> bool:
+        try:
+            self.conn.execute(
+                "INSERT INTO bot_settings (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, json.dumps(value), datetime.now().isoformat()),
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error setting {key}: {e}")
+            return False
+
+    # ═══════════════════════════════════════════
+    # AUTO-QUEUE LOGIC
+    # ═══════════════════════════════════════════
+
+    async def get_last_queued_date(self) -> Optional[datetime]:
+        row = self.conn.execute(
+            "SELECT MAX(scheduled_at) FROM scheduled_posts WHERE status = 'pending' AND source = 'queue'"
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    async def schedule_case_queue(self, case_id: str, scheduled_at: datetime, admin_user_id: int) -> Optional[str]:
+        entry_ids = await self.schedule_cases_queue([(case_id, scheduled_at)], admin_user_id)
+        return entry_ids[0] if entry_ids else None
+
+    async def schedule_cases_queue(self, entries: List[Tuple[str, datetime]], admin_user_id: int) -> List[str]:
+        """Auto-queue several (case_id, scheduled_at) pairs in one transaction."""
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                entry_ids = [
+                    self._insert_post(case_id, scheduled_at, admin_user_id, "queue")
+                    for case_id, scheduled_at in entries
+                ]
+            for entry_id, (case_id, scheduled_at) in zip(entry_ids, entries):
+                logger.info(f"Case {case_id} auto-queued for {scheduled_at} (entry {entry_id})")
+                self._notify_schedule("scheduled", entry_id, scheduled_at)
+            return entry_ids
+        except Exception as e:
+            logger.error(f"Error auto-queuing cases: {e}")
+            return []
+
+    async def reschedule_posts(self, changes: List[Tuple[str, datetime]]) -> Optional[List[str]]:
+        """Move pending posts to new times in one transaction (None on error)."""
+        if not changes:
+            return []
+        try:
+            moved = []
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                for entry_id, scheduled_at in changes:
+                    cursor = self.conn.execute(
+                        "UPDATE scheduled_posts SET scheduled_at = ? WHERE id = ? AND status = 'pending'",
+                        (_utc_iso(scheduled_at), entry_id),
+                    )
+                    if cursor.rowcount:
+                        moved.append(entry_id)
+            new_times = dict(changes)
+            for entry_id in moved:
+                self._notify_schedule("rescheduled", entry_id, new_times[entry_id])
+            logger.info(f"Rescheduled {len(moved)}/{len(changes)} pending posts")
+            return moved
+        except Exception as e:
+            logger.error(f"Error rescheduling posts: {e}")
+            return None
+
+    # ═══════════════════════════════════════════
+    # MEDIA JOBS
+    # ═══════════════════════════════════════════
+
+    async def enqueue_media_job(self, file_id: str, filename: str) -> Optional[str]:
+        try:
+            job_id = str(uuid.uuid4())
+            self.conn.execute(
+                "INSERT INTO media_jobs (id, file_id, filename, status, created_at) VALUES (?, ?, ?, 'pending', ?)",
+                (job_id, file_id, filename, _utc_iso(datetime.now(timezone.utc))),
+            )
+            return job_id
+        except Exception as e:
+            logger.error(f"Error queuing media job: {e}")
+            return None
+
+    async def get_media_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT id, status, result_url, error_message FROM media_jobs WHERE id = ?", (job_id,)
+        )
+        return rows[0] if rows else None
+
+    async def claim_media_jobs(
+        self,
+        owner: str,
+        now: datetime,
+        lease_seconds: int = MEDIA_LEASE_SECONDS,
+        limit: int = MEDIA_CLAIM_BATCH_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """Claim pending (or lease-expired) media jobs in one transaction."""
+        now_iso = _utc_iso(now)
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                rows = self._query(
+                    "SELECT id, file_id, filename FROM media_jobs "
+                    "WHERE status = 'pending' OR (status = 'processing' AND lease_expires_at < ?) "
+                    "ORDER BY created_at LIMIT ?",
+                    (now_iso, limit),
+                )
+                self.conn.executemany(
+                    "UPDATE media_jobs SET status = 'processing', lease_owner = ?, lease_expires_at = ? WHERE id = ?",
+                    [(owner, _utc_iso(now + timedelta(seconds=lease_seconds)), row["id"]) for row in rows],
+                )
+            return rows
+        except Exception as e:
+            logger.error(f"Error claiming media jobs: {e}")
+            return []
+
+    async def finish_media_job(
+        self, job_id: str, result_url: Optional[str] = None, error_msg: Optional[str] = None
+    ) -> bool:
+        try:
+            if result_url:
+                self.conn.execute(
+                    "UPDATE media_jobs SET status = 'done', result_url = ? WHERE id = ?", (result_url, job_id)
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE media_jobs SET status = 'failed', error_message = ? WHERE id = ?",
+                    ((error_msg or "Sin resultado")[:500], job_id),
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error finishing media job {job_id}: {e}")
+            return False
+
+
+def init_local_client(db_path: str, bucket_dir: str, **options) -> LocalSqliteClient:
+    """Initialize and return the SQLite-backed client."""
+    return LocalSqliteClient(db_path, bucket_dir, **options)
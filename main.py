@@ -7,7 +7,9 @@ import logging
 import asyncio
 import io
 import os
+import signal
 import threading
+import time
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
@@ -37,7 +39,18 @@ from telegram.constants import ChatAction
 
 from config import Config
 from case_parser import parse_case, validate_case
-from supabase_client import init_supabase
+from supabase_client import QUEUE_PAGE_SIZE, init_async_supabase, queue_cursor
+from local_client import init_local_client
+from resilience import ResilientCaller
+from write_journal import WriteJournal
+from display_numbers import case_display_num
+from queue_slots import QueueSlotAllocator
+from media_worker import media_worker_loop, store_telegram_image, wait_media_job
+from publisher import PRIORITY_MANUAL, build_poll_payload, get_engine, publish_case
+from metrics import scheduler_metrics
+from webhook_server import WebhookServer, health_response
+from update_processing import LANE_PUBLIC, PerUserOrderedProcessor
+from admission import ADMITTED, DEDUPED, SHED_OVERLOADED, deeplink_admission
 from justification_messages import get_random_message
 
 # Configure logging
@@ -109,20 +122,6 @@ def restore_formatting(text: str, entities) -> str:
     return result
 
 
-def case_display_num(uuid_str: str) -> int:
-    """Generate a consistent display number (1000-3000) from UUID hash.
-    Must match the JavaScript version in index.html exactly."""
-    if not uuid_str:
-        return 1000
-    h = 0
-    for ch in uuid_str:
-        h = ((h << 5) - h) + ord(ch)
-        h &= 0xFFFFFFFF  # Keep as 32-bit
-        if h >= 0x80000000:
-            h -= 0x100000000  # Convert to signed 32-bit
-    return 1000 + (abs(h) % 2001)
-
-
 def parse_schedule_datetime(text: str) -> Optional[datetime]:
     """Parse schedule datetime in Colombian-style formats.
     Supports:
@@ -229,51 +228,25 @@ def format_scheduled_datetime(dt: datetime) -> str:
     return dt.strftime("%d/%m %H:%M")
 
 
-def calculate_next_queue_slot() -> datetime:
-    """Calculate the next available auto-queue slot.
-    1. Get queue settings (default_hour, active_days)
-    2. Find the latest pending queue entry's date
-    3. Next slot = that date + 1 day (skipping inactive days)
-    4. If no queue entries, start from tomorrow (or today if before default_hour)
-    """
-    tz = pytz.timezone(Config.TZ)
-    now = datetime.now(tz)
-
-    # Get settings
-    hour_str = supabase.get_setting("queue_default_hour", "07:00")
-    active_days = supabase.get_setting("queue_active_days", [1, 2, 3, 4, 5, 6])
-
-    hour, minute = map(int, hour_str.split(":"))
-
-    # Find the latest queued entry
-    last_queued = supabase.get_last_queued_date()
-
-    if last_queued:
-        # Start searching from the day AFTER the last queued entry
-        last_queued_local = last_queued.astimezone(tz)
-        candidate = last_queued_local.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        candidate += timedelta(days=1)
-    else:
-        # No queue entries: start from today (if before default hour) or tomorrow
-        today_slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if today_slot > now:
-            candidate = today_slot
-        else:
-            candidate = today_slot + timedelta(days=1)
+# Supabase client
+supabase = None
+app = None
+queue_allocator = None
+update_processor = None
+# Long-running loops started after init; cancelled in post_shutdown
+background_tasks = []
 
-    # Skip inactive days (isoweekday: 1=Mon, 7=Sun)
-    for _ in range(14):  # Safety: max 2 weeks lookahead
-        if candidate.isoweekday() in active_days:
-            return candidate
-        candidate += timedelta(days=1)
+# edited_message lets the bot detect when the admin edits case text
+ALLOWED_UPDATES = ["message", "edited_message", "callback_query"]
 
-    # Fallback
-    return candidate
+# Cheap answer to deep links shed under overload
+DEEPLINK_BUSY_TEXT = "⏳ Hay muchas solicitudes en este momento. Reintenta en unos segundos."
 
+# /cola messages whose page cursors are remembered (per admin)
+COLA_VIEWS_KEPT = 5
 
-# Supabase client
-supabase = None
-app = None
+# Max moved entries listed in the /rebalancear_cola preview
+REBALANCE_PREVIEW_MAX = 20
 
 
 def _admin_keyboard() -> ReplyKeyboardMarkup:
@@ -324,6 +297,54 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     logger.info(f"/start called with args={args} for user {user.id}")
     deep_link = args[0]
 
+    if _is_admin(user.id):
+        await _dispatch_deeplink(update, context, deep_link)
+        return
+
+    # Double tap on the same link: the Mini App message is still there
+    if _is_repeated_deeplink(context, deep_link):
+        deeplink_admission.record(DEDUPED)
+        logger.info(f"Repeated deep link from user {user.id} coalesced")
+        return
+
+    # Public taps go through admission control (bounded under traffic spikes)
+    async with deeplink_admission.admit(update.message.date) as outcome:
+        if outcome == ADMITTED:
+            await _dispatch_deeplink(update, context, deep_link)
+            if context.user_data.get("last_justification_ids"):
+                context.user_data["last_deeplink"] = (_deeplink_key(deep_link), time.monotonic())
+        elif outcome == SHED_OVERLOADED:
+            try:
+                await update.message.reply_text(DEEPLINK_BUSY_TEXT)
+            except Exception as e:
+                logger.warning(f"Could not send busy reply to {user.id}: {e}")
+        else:
+            logger.info(f"Dropped stale deep link from user {user.id}")
+
+
+def _deeplink_key(deep_link: str) -> str:
+    """Same key for the case_UUID and raw-UUID (Mini App) forms of a link."""
+    if len(deep_link) == 36 and deep_link.count("-") == 4:
+        return f"case_{deep_link}"
+    return deep_link
+
+
+def _is_repeated_deeplink(context: ContextTypes.DEFAULT_TYPE, deep_link: str) -> bool:
+    """True if this user was just served the same link and its messages
+    have not been replaced since."""
+    last = context.user_data.get("last_deeplink")
+    if not last or Config.DEEPLINK_DEDUPE_SECONDS <= 0:
+        return False
+    key, served_at = last
+    return (
+        key == _deeplink_key(deep_link)
+        and time.monotonic() - served_at <= Config.DEEPLINK_DEDUPE_SECONDS
+        and bool(context.user_data.get("last_justification_ids"))
+    )
+
+
+async def _dispatch_deeplink(update: Update, context: ContextTypes.DEFAULT_TYPE, deep_link: str) -> None:
+    """Route a /start payload to the handler of its format."""
     # NEW FORMAT: case_UUID
     if deep_link.startswith("case_"):
         await _handle_new_format_deeplink(update, context, deep_link)
@@ -554,7 +575,7 @@ async def caso_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     old_preview = context.user_data.get("preview_uuid")
     if old_preview:
         try:
-            supabase.delete_case(old_preview)
+            await supabase.delete_case(old_preview)
             logger.info(f"Cleaned up old preview {old_preview} on new /caso")
         except Exception as e:
             logger.warning(f"Could not delete old preview {old_preview}: {e}")
@@ -700,6 +721,17 @@ async def case_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return STATE_CASE_MODE
 
 
+async def _store_image(context: ContextTypes.DEFAULT_TYPE, file_id: str, filename: str) -> Optional[str]:
+    """Download a Telegram image and upload it to the bucket. Returns its URL.
+    With BOT_ROLE=updates the work is queued for the media role instead."""
+    if Config.BOT_ROLE == "updates":
+        job_id = await supabase.enqueue_media_job(file_id, filename)
+        if not job_id:
+            return None
+        return await wait_media_job(supabase, job_id, Config.MEDIA_JOB_TIMEOUT_SECONDS)
+    return await store_telegram_image(context.bot, supabase, file_id, filename)
+
+
 async def image_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle photo uploads in waiting_images state."""
     if not update.message:
@@ -721,16 +753,10 @@ async def image_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         # Immediate feedback: show upload indicator
         await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.UPLOAD_PHOTO)
 
-        # Get the largest photo
+        # Get the largest photo, download it and upload to Supabase
         photo = update.message.photo[-1]
-        file = await context.bot.get_file(photo.file_id)
-
-        # Download photo
-        photo_bytes = await file.download_as_bytearray()
-
-        # Upload to Supabase
         filename = f"photo_{photo.file_id}.jpg"
-        image_url = supabase.upload_image(bytes(photo_bytes), filename)
+        image_url = await _store_image(context, photo.file_id, filename)
 
         if not image_url:
             await update.message.reply_text("❌ Error al subir la imagen. Intenta de nuevo.")
@@ -746,7 +772,7 @@ async def image_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         # Auto-update preview in Supabase if it exists
         preview_uuid = context.user_data.get("preview_uuid")
         if preview_uuid:
-            supabase.update_case(preview_uuid, context.user_data["pending_case"])
+            supabase.queue_case_update(preview_uuid, context.user_data["pending_case"])
 
         await update.message.reply_text(
             f"🖼️ Imagen {image_count} agregada.{' (preview actualizado)' if preview_uuid else ''}\n"
@@ -786,15 +812,12 @@ async def document_warning_handler(update: Update, context: ContextTypes.DEFAULT
             # Immediate feedback: show upload indicator
             await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.UPLOAD_PHOTO)
 
-            file = await context.bot.get_file(doc.file_id)
-            doc_bytes = await file.download_as_bytearray()
-
             # Determine extension from mime type
             ext_map = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/heic": "heic"}
             ext = ext_map.get(mime, "jpg")
             filename = f"photo_{doc.file_id}.{ext}"
 
-            image_url = supabase.upload_image(bytes(doc_bytes), filename)
+            image_url = await _store_image(context, doc.file_id, filename)
 
             if not image_url:
                 await update.message.reply_text("❌ Error al subir la imagen. Intenta de nuevo.")
@@ -810,7 +833,7 @@ async def document_warning_handler(update: Update, context: ContextTypes.DEFAULT
             # Auto-update preview in Supabase if it exists
             preview_uuid = context.user_data.get("preview_uuid")
             if preview_uuid:
-                supabase.update_case(preview_uuid, context.user_data["pending_case"])
+                supabase.queue_case_update(preview_uuid, context.user_data["pending_case"])
 
             await update.message.reply_text(
                 f"🖼️ Imagen {image_count} agregada (calidad original).{' (preview actualizado)' if preview_uuid else ''}\n"
@@ -1016,7 +1039,7 @@ async def programar_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     preview_uuid = context.user_data.get("preview_uuid")
     if not preview_uuid:
         try:
-            preview_uuid = supabase.save_case(pending_case)
+            preview_uuid = await supabase.save_case(pending_case)
             context.user_data["preview_uuid"] = preview_uuid
             logger.info(f"Auto-saved case {preview_uuid} for scheduling")
         except Exception as e:
@@ -1071,7 +1094,9 @@ async def schedule_datetime_handler(update: Update, context: ContextTypes.DEFAUL
         case_uuid = context.user_data.get("preview_uuid")
         user_id = update.effective_user.id
 
-        supabase.schedule_case(case_uuid, scheduled_dt, user_id)
+        # Flush barrier: the scheduler publishes whatever is in the DB
+        await supabase.sync_case(case_uuid, context.user_data["pending_case"])
+        await supabase.schedule_case(case_uuid, scheduled_dt, user_id)
 
         formatted_date = format_scheduled_datetime(scheduled_dt)
         await update.message.reply_text(
@@ -1116,77 +1141,125 @@ async def cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)
 
     try:
-        queue = supabase.get_queue()
-
-        if not queue:
+        # First page; page cursors (and the total) are kept per /cola message
+        view = {"cursors": [None], "total": await supabase.count_queue()}
+        text, keyboard = await _render_queue_page(view, 0)
+        if text is None:
             await update.message.reply_text("📋 La cola está vacía.")
             return
 
-        tz = pytz.timezone(Config.TZ)
-        day_names = {1: "Lun", 2: "Mar", 3: "Mié", 4: "Jue", 5: "Vie", 6: "Sáb", 7: "Dom"}
+        sent = await update.message.reply_text(text, parse_mode="HTML", reply_markup=keyboard)
+        _remember_cola_view(context, sent.message_id, view)
 
-        # Format queue entries
-        buttons_list = []
-        message_text = "📋 <b>Cola de publicación</b>\n\n"
-        for i, entry in enumerate(queue, 1):
-            entry_id = entry.get("id")
-            scheduled_at = entry.get("scheduled_at")
-            source = entry.get("source", "manual")
-            source_label = "🤖" if source == "queue" else "✋"
+    except Exception as e:
+        logger.error(f"Error getting queue: {e}")
+        await update.message.reply_text(f"❌ Error al obtener la cola: {str(e)}")
 
-            # Format date
-            try:
-                if scheduled_at:
-                    dt = datetime.fromisoformat(scheduled_at.replace("Z", "+00:00"))
-                    dt_local = dt.astimezone(tz)
-                    day_name = day_names.get(dt_local.isoweekday(), "")
-                    formatted_time = f"{day_name} {dt_local.strftime('%d/%m %H:%M')}"
-                else:
-                    formatted_time = "N/A"
-            except Exception:
-                formatted_time = str(scheduled_at)[:16] if scheduled_at else "N/A"
 
-            # Get vignette from joined cases data
-            case_data = entry.get("cases") or {}
-            vignette = (case_data.get("vignette") or "(sin viñeta)")[:60].replace("\n", " ")
+def _remember_cola_view(context: ContextTypes.DEFAULT_TYPE, message_id: int, view: Dict[str, Any]) -> None:
+    """Keep the paging state of a /cola message (only the latest few)."""
+    views = context.user_data.setdefault("cola_views", {})
+    views[message_id] = view
+    while len(views) > COLA_VIEWS_KEPT:
+        views.pop(next(iter(views)))
+
+
+async def _render_queue_page(view: Dict[str, Any], page: int):
+    """Build the text + keyboard of one /cola page (keyset pagination).
+    `view` holds the page cursors and queue total of one /cola message.
+    Returns (None, None) if the page is empty."""
+    cursors = view["cursors"]
+    if page >= len(cursors):
+        page = 0
+    # One extra row tells whether a next page exists (no count per page)
+    queue = await supabase.get_queue(limit=QUEUE_PAGE_SIZE + 1, after=cursors[page])
+    has_next = len(queue) > QUEUE_PAGE_SIZE
+    queue = queue[:QUEUE_PAGE_SIZE]
+    if not queue:
+        return None, None
+    if len(cursors) == page + 1:
+        cursors.append(queue_cursor(queue))
+    total = view["total"]
+
+    tz = pytz.timezone(Config.TZ)
+    day_names = {1: "Lun", 2: "Mar", 3: "Mié", 4: "Jue", 5: "Vie", 6: "Sáb", 7: "Dom"}
+
+    # Format queue entries
+    buttons_list = []
+    message_text = "📋 <b>Cola de publicación</b>\n\n"
+    for i, entry in enumerate(queue, page * QUEUE_PAGE_SIZE + 1):
+        entry_id = entry.get("id")
+        scheduled_at = entry.get("scheduled_at")
+        source = entry.get("source", "manual")
+        source_label = "🤖" if source == "queue" else "✋"
+
+        # Format date
+        try:
+            if scheduled_at:
+                dt = datetime.fromisoformat(scheduled_at.replace("Z", "+00:00"))
+                dt_local = dt.astimezone(tz)
+                day_name = day_names.get(dt_local.isoweekday(), "")
+                formatted_time = f"{day_name} {dt_local.strftime('%d/%m %H:%M')}"
+            else:
+                formatted_time = "N/A"
+        except Exception:
+            formatted_time = str(scheduled_at)[:16] if scheduled_at else "N/A"
 
-            message_text += f"{i}. {source_label} {formatted_time}\n«{vignette}»\n\n"
+        # Get vignette from joined cases data
+        case_data = entry.get("cases") or {}
+        vignette = (case_data.get("vignette") or "(sin viñeta)")[:60].replace("\n", " ")
 
-            buttons_list.append([
-                InlineKeyboardButton("👁️ Preview", callback_data=f"cola_preview_{entry_id}"),
-                InlineKeyboardButton("🗑️ Eliminar", callback_data=f"cola_delete_{entry_id}"),
-            ])
+        message_text += f"{i}. {source_label} {formatted_time}\n«{vignette}»\n\n"
 
-        message_text += f"Total: {len(queue)} caso(s)\n"
-        message_text += "<i>🤖 = auto-cola  ✋ = manual</i>"
+        buttons_list.append([
+            InlineKeyboardButton("👁️ Preview", callback_data=f"cola_preview_{entry_id}"),
+            InlineKeyboardButton("🗑️ Eliminar", callback_data=f"cola_delete_{entry_id}"),
+        ])
 
-        keyboard = InlineKeyboardMarkup(buttons_list[:10])
+    message_text += f"Total: {total} caso(s)\n"
+    message_text += "<i>🤖 = auto-cola  ✋ = manual</i>"
 
-        await update.message.reply_text(
-            message_text,
-            parse_mode="HTML",
-            reply_markup=keyboard if buttons_list else None,
-        )
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ Anterior", callback_data=f"cola_page_{page - 1}"))
+    if has_next:
+        nav.append(InlineKeyboardButton("Siguiente ➡️", callback_data=f"cola_page_{page + 1}"))
+    if nav:
+        buttons_list.append(nav)
 
-    except Exception as e:
-        logger.error(f"Error getting queue: {e}")
-        await update.message.reply_text(f"❌ Error al obtener la cola: {str(e)}")
+    return message_text, InlineKeyboardMarkup(buttons_list)
 
 
 async def cola_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle cola preview and delete callbacks."""
     query = update.callback_query
 
-    if query.data.startswith("cola_preview_"):
+    if query.data.startswith("cola_page_"):
+        page = int(query.data.replace("cola_page_", ""))
+        await query.answer()
+        try:
+            view = context.user_data.get("cola_views", {}).get(query.message.message_id)
+            if view is None:
+                # Older message (or bot restarted): start over from page 1
+                view = {"cursors": [None], "total": await supabase.count_queue()}
+                _remember_cola_view(context, query.message.message_id, view)
+            text, keyboard = await _render_queue_page(view, page)
+            if text is None:
+                await query.edit_message_text("📋 La cola está vacía.")
+                return
+            await query.edit_message_text(text, parse_mode="HTML", reply_markup=keyboard)
+        except Exception as e:
+            logger.error(f"Error paging queue: {e}")
+
+    elif query.data.startswith("cola_preview_"):
         entry_id = query.data.replace("cola_preview_", "")
         await query.answer("⏳ Cargando preview...")
 
         try:
             # Get the scheduled entry to get case_id
-            entry = supabase.client.table("scheduled_posts").select("case_id").eq("id", entry_id).execute()
+            case_uuid = await supabase.get_scheduled_case_id(entry_id)
 
-            if entry.data:
-                case_uuid = entry.data[0]["case_id"]
+            if case_uuid:
                 miniapp_short_name = os.getenv("MINIAPP_SHORT_NAME", "justificacion")
                 preview_url = f"https://t.me/{context.bot.username}/{miniapp_short_name}?startapp={case_uuid}"
 
@@ -1202,11 +1275,38 @@ async def cola_callback_handler(update: Update, context: ContextTypes.DEFAULT_TY
             logger.error(f"Error showing cola preview: {e}")
             await query.answer("❌ Error al mostrar preview", show_alert=True)
 
+    elif query.data == "cola_rebalance_apply":
+        expected_ids = context.user_data.pop("rebalance_ids", None)
+        if expected_ids is None:
+            await query.answer("❌ Vuelve a usar /rebalancear_cola", show_alert=True)
+            return
+        await query.answer("⏳ Aplicando...")
+        try:
+            moved = await queue_allocator.rebalance(expected_ids)
+            if moved is None:
+                await query.edit_message_text(
+                    "⚠️ La cola cambió desde la vista previa. Usa /rebalancear_cola de nuevo."
+                )
+            else:
+                await query.edit_message_text(f"✅ Cola rebalanceada: {moved} caso(s) reprogramados.")
+        except Exception as e:
+            logger.error(f"Error applying queue rebalance: {e}")
+            await query.edit_message_text(
+                "❌ Error al rebalancear la cola (puede haber quedado a medias). Usa /rebalancear_cola de nuevo."
+            )
+
+    elif query.data == "cola_rebalance_cancel":
+        context.user_data.pop("rebalance_ids", None)
+        await query.answer()
+        await query.edit_message_text("❌ Rebalanceo cancelado. La cola no cambió.")
+
     elif query.data.startswith("cola_delete_"):
         entry_id = query.data.replace("cola_delete_", "")
 
         try:
-            supabase.cancel_scheduled(entry_id)
+            if not await supabase.cancel_scheduled(entry_id):
+                await query.answer("⚠️ No se pudo eliminar: ya no está pendiente", show_alert=True)
+                return
             await query.edit_message_text("🗑️ Eliminado")
             await query.answer("✅ Programación cancelada")
         except Exception as e:
@@ -1214,6 +1314,52 @@ async def cola_callback_handler(update: Update, context: ContextTypes.DEFAULT_TY
             await query.answer("❌ Error al eliminar", show_alert=True)
 
 
+def _format_rebalance_plan(moves) -> str:
+    """Diff preview of a queue rebalance (only entries that move)."""
+    day_names = {1: "Lun", 2: "Mar", 3: "Mié", 4: "Jue", 5: "Vie", 6: "Sáb", 7: "Dom"}
+
+    def fmt(dt: datetime) -> str:
+        return f"{day_names.get(dt.isoweekday(), '')} {dt.strftime('%d/%m %H:%M')}"
+
+    changed = [move for move in moves if move.changed]
+    lines = [f"⚖️ <b>Rebalancear cola</b>: {len(changed)} de {len(moves)} caso(s) cambian de hora\n"]
+    for move in changed[:REBALANCE_PREVIEW_MAX]:
+        vignette = move.vignette[:40].replace("\n", " ")
+        lines.append(f"• {fmt(move.old)} → <b>{fmt(move.new)}</b>\n  «{vignette}»")
+    if len(changed) > REBALANCE_PREVIEW_MAX:
+        lines.append(f"… y {len(changed) - REBALANCE_PREVIEW_MAX} más")
+    return "\n".join(lines)
+
+
+async def rebalancear_cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /rebalancear_cola - preview moving queued cases to the current hour/days."""
+    if not _is_admin(update.effective_user.id):
+        return
+
+    await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)
+
+    try:
+        moves = await queue_allocator.plan_rebalance()
+        if not any(move.changed for move in moves):
+            await update.message.reply_text(
+                "✅ La cola ya coincide con la hora y los días configurados.",
+                reply_markup=_admin_keyboard(),
+            )
+            return
+
+        # The plan is re-checked on apply; the queue must not have changed meanwhile
+        context.user_data["rebalance_ids"] = [move.entry_id for move in moves]
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ Aplicar", callback_data="cola_rebalance_apply"),
+            InlineKeyboardButton("❌ Cancelar", callback_data="cola_rebalance_cancel"),
+        ]])
+        await update.message.reply_text(_format_rebalance_plan(moves), parse_mode="HTML", reply_markup=keyboard)
+
+    except Exception as e:
+        logger.error(f"Error planning queue rebalance: {e}")
+        await update.message.reply_text(f"❌ Error al calcular el rebalanceo: {str(e)}")
+
+
 async def desprogramar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /desprogramar command - show usage info."""
     if not _is_admin(update.effective_user.id):
@@ -1225,6 +1371,44 @@ async def desprogramar_command(update: Update, context: ContextTypes.DEFAULT_TYP
     )
 
 
+async def slo_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /slo command - scheduler lag and publish latency report."""
+    if not _is_admin(update.effective_user.id):
+        return
+
+    engine = get_engine().stats()
+    if Config.BOT_ROLE == "all":
+        text = scheduler_metrics.render_text()
+    else:
+        # Scheduled publishes (and their metrics) live in the scheduler process
+        text = (
+            "📈 <b>SLO de publicación</b>\n\n"
+            f"ℹ️ Con roles separados (BOT_ROLE={Config.BOT_ROLE}) los casos programados se publican "
+            "desde el proceso <code>scheduler</code>: este proceso no ve sus métricas. "
+            "Consúltalas en <code>/metrics</code> de ese proceso."
+        )
+    text += (
+        f"\n\n📤 Motor de envío: {engine['sent']} enviados · {engine['queued']} en cola · "
+        f"{engine['flood_waits']} flood waits"
+    )
+    if update_processor:
+        lanes = update_processor.stats()["lanes"]
+        fast, public = lanes["fast"]["wait"], lanes["public"]["wait"]
+
+        def p99(summary) -> str:
+            return "—" if summary["p99"] is None else f"{summary['p99']:.2f}s"
+
+        text += (
+            f"\n⚡ Espera de updates (p99, última hora): admin {p99(fast)} · público {p99(public)}"
+        )
+    links = deeplink_admission.stats()
+    text += (
+        f"\n🔗 Deep links: {links['admitted']} atendidos · {links['overloaded']} rechazados por saturación · "
+        f"{links['stale']} descartados por antigüedad · {links['deduped']} toques repetidos"
+    )
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
 async def hora_cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /hora_cola command - view or change the default queue hour."""
     if not _is_admin(update.effective_user.id):
@@ -1233,7 +1417,7 @@ async def hora_cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     args = context.args
     if not args:
         # Show current setting
-        current = supabase.get_setting("queue_default_hour", "07:00")
+        current = await supabase.get_setting("queue_default_hour", "07:00")
         await update.message.reply_text(
             f"⏰ <b>Hora de publicación auto-cola:</b> {current}\n\n"
             f"Para cambiarla: <code>/hora_cola HH:MM</code>\n"
@@ -1263,12 +1447,12 @@ async def hora_cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     # Normalize to HH:MM
     normalized = f"{h:02d}:{m:02d}"
-    supabase.set_setting("queue_default_hour", normalized)
+    await supabase.set_setting("queue_default_hour", normalized)
 
     await update.message.reply_text(
         f"✅ Hora de auto-cola actualizada: <b>{normalized}</b>\n\n"
         f"Los próximos casos que agregues a la cola se programarán a esta hora.\n"
-        f"(Los que ya están en cola conservan su hora original.)",
+        f"(Los que ya están en cola conservan su hora original; usa /rebalancear_cola para moverlos.)",
         parse_mode="HTML",
         reply_markup=_admin_keyboard(),
     )
@@ -1284,7 +1468,7 @@ async def dias_cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if not args:
         # Show current setting
-        current = supabase.get_setting("queue_active_days", [1, 2, 3, 4, 5, 6])
+        current = await supabase.get_setting("queue_active_days", [1, 2, 3, 4, 5, 6])
         days_str = ", ".join(day_names.get(d, str(d)) for d in sorted(current))
         await update.message.reply_text(
             f"📅 <b>Días activos de auto-cola:</b>\n{days_str}\n\n"
@@ -1318,13 +1502,13 @@ async def dias_cola_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     days = sorted(set(days))
-    supabase.set_setting("queue_active_days", days)
+    await supabase.set_setting("queue_active_days", days)
     days_str = ", ".join(day_names.get(d, str(d)) for d in days)
 
     await update.message.reply_text(
         f"✅ Días activos actualizados:\n<b>{days_str}</b>\n\n"
         f"Los próximos casos en cola se programarán solo en estos días.\n"
-        f"(Los que ya están en cola conservan su día original.)",
+        f"(Los que ya están en cola conservan su día original; usa /rebalancear_cola para moverlos.)",
         parse_mode="HTML",
         reply_markup=_admin_keyboard(),
     )
@@ -1386,30 +1570,67 @@ async def edit_published_number_handler(update: Update, context: ContextTypes.DE
         )
         return STATE_EDIT_PUBLISHED_NUMBER
 
-    # First try to find by display_number field (for new cases)
     try:
-        result = supabase.client.table("cases").select("*").eq("display_number", display_num).eq("published", True).execute()
-
-        if not result.data:
-            # Fallback: search all published cases and compute hash
-            all_cases = supabase.client.table("cases").select("*").eq("published", True).execute()
-            found = None
-            for case in (all_cases.data or []):
-                if case_display_num(case["id"]) == display_num:
-                    found = case
-                    break
-
-            if not found:
-                await update.message.reply_text(
-                    f"❌ No se encontró ningún caso publicado con el número #{display_num}.\n"
-                    "Verifica el número e intenta de nuevo, o /cancelar."
-                )
-                return STATE_EDIT_PUBLISHED_NUMBER
+        # Display-number index (backfilled on startup, see migrations/002)
+        case_ids = await supabase.find_case_ids_by_display_number(display_num)
 
-            case_data = found
-        else:
-            case_data = result.data[0]
+        if not case_ids:
+            await update.message.reply_text(
+                f"❌ No se encontró ningún caso publicado con el número #{display_num}.\n"
+                "Verifica el número e intenta de nuevo, o /cancelar."
+            )
+            return STATE_EDIT_PUBLISHED_NUMBER
+
+        if len(case_ids) > 1:
+            # Hash collision: several cases share this number, let the admin pick
+            context.user_data["editing_display_num"] = display_num
+            buttons = []
+            for case_id in case_ids[:10]:
+                case = await supabase.get_case(case_id) or {}
+                vig = (case.get("vignette") or "(sin viñeta)")[:40].replace("\n", " ")
+                buttons.append([InlineKeyboardButton(f"«{vig}…»", callback_data=f"edit_pub_pick_{case_id}")])
+            await update.message.reply_text(
+                f"🔀 Hay {len(case_ids)} casos con el número #{display_num}.\n"
+                "¿Cuál quieres editar?",
+                reply_markup=InlineKeyboardMarkup(buttons),
+            )
+            return STATE_EDIT_PUBLISHED_NUMBER
+
+        case_data = await supabase.get_case(case_ids[0])
+        if not case_data:
+            await update.message.reply_text("❌ No se pudo cargar el caso. Intenta de nuevo o /cancelar.")
+            return STATE_EDIT_PUBLISHED_NUMBER
+
+        return await _show_published_case_for_edit(update.message, context, case_data, display_num)
+
+    except Exception as e:
+        logger.error(f"Error looking up case by display number: {e}")
+        await update.message.reply_text(f"❌ Error al buscar el caso: {str(e)}")
+        return STATE_EDIT_PUBLISHED_NUMBER
+
+
+async def edit_published_pick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Handle the pick between cases that share a display number."""
+    query = update.callback_query
+    case_uuid = query.data.replace("edit_pub_pick_", "")
+    display_num = context.user_data.get("editing_display_num", "?")
 
+    case_data = await supabase.get_case(case_uuid)
+    if not case_data:
+        await query.answer("❌ No se encontró el caso", show_alert=True)
+        return STATE_EDIT_PUBLISHED_NUMBER
+
+    await query.answer()
+    try:
+        await query.edit_message_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    return await _show_published_case_for_edit(query.message, context, case_data, display_num)
+
+
+async def _show_published_case_for_edit(message, context: ContextTypes.DEFAULT_TYPE, case_data: dict, display_num) -> int:
+    """Store the case being edited and show its current content."""
+    try:
         # Store the case being edited
         context.user_data["editing_case_uuid"] = case_data["id"]
         context.user_data["editing_display_num"] = display_num
@@ -1447,7 +1668,7 @@ async def edit_published_number_handler(update: Update, context: ContextTypes.DE
         if len(bibs) > 3:
             bib_lines += f"  ... y {len(bibs) - 3} más\n"
 
-        await update.message.reply_text(
+        await message.reply_text(
             f"📋 <b>Caso #{display_num}</b> encontrado\n"
             f"━━━━━━━━━━━━━━━━━━━━\n\n"
             f"📝 <b>Viñeta:</b>\n{html_esc(vig_preview)}...\n\n"
@@ -1464,8 +1685,8 @@ async def edit_published_number_handler(update: Update, context: ContextTypes.DE
         return STATE_EDIT_PUBLISHED_CASE
 
     except Exception as e:
-        logger.error(f"Error looking up case by display number: {e}")
-        await update.message.reply_text(f"❌ Error al buscar el caso: {str(e)}")
+        logger.error(f"Error showing case #{display_num} for edit: {e}")
+        await message.reply_text(f"❌ Error al mostrar el caso: {str(e)}")
         return STATE_EDIT_PUBLISHED_NUMBER
 
 
@@ -1631,7 +1852,7 @@ async def edit_published_confirm_callback(update: Update, context: ContextTypes.
 
         try:
             # Update the case in Supabase
-            supabase.update_case(case_uuid, new_case)
+            await supabase.update_case(case_uuid, new_case)
 
             await query.edit_message_text(
                 f"✅ <b>Caso #{display_num}</b> actualizado exitosamente.\n\n"
@@ -1702,7 +1923,7 @@ async def action_button_callback(update: Update, context: ContextTypes.DEFAULT_T
         preview_uuid = context.user_data.get("preview_uuid")
         if not preview_uuid:
             try:
-                preview_uuid = supabase.save_case(pending_case)
+                preview_uuid = await supabase.save_case(pending_case)
                 context.user_data["preview_uuid"] = preview_uuid
             except Exception as e:
                 logger.error(f"Error auto-saving case: {e}")
@@ -1734,7 +1955,7 @@ async def action_button_callback(update: Update, context: ContextTypes.DEFAULT_T
         preview_uuid = context.user_data.get("preview_uuid")
         if not preview_uuid:
             try:
-                preview_uuid = supabase.save_case(pending_case)
+                preview_uuid = await supabase.save_case(pending_case)
                 context.user_data["preview_uuid"] = preview_uuid
             except Exception as e:
                 logger.error(f"Error auto-saving case for queue: {e}")
@@ -1742,16 +1963,14 @@ async def action_button_callback(update: Update, context: ContextTypes.DEFAULT_T
                 return STATE_WAITING_IMAGES
         else:
             # Update existing preview with latest data
-            supabase.update_case(preview_uuid, pending_case)
-
-        # Calculate next available slot
-        next_slot = calculate_next_queue_slot()
+            await supabase.sync_case(preview_uuid, pending_case)
 
-        # Schedule it as queue entry
+        # Take the next free slot and queue it (serialized against other clicks)
         user_id = update.effective_user.id
-        entry_id = supabase.schedule_case_queue(preview_uuid, next_slot, user_id)
+        allocated = await queue_allocator.allocate([preview_uuid], user_id)
 
-        if entry_id:
+        if allocated:
+            _, next_slot = allocated[0]
             formatted = format_scheduled_datetime(next_slot)
             tz = pytz.timezone(Config.TZ)
             day_names = {1: "Lun", 2: "Mar", 3: "Mié", 4: "Jue", 5: "Vie", 6: "Sáb", 7: "Dom"}
@@ -1786,9 +2005,9 @@ async def _do_preview(query, context: ContextTypes.DEFAULT_TYPE) -> int:
         # Save case to Supabase (unpublished) for preview
         preview_uuid = context.user_data.get("preview_uuid")
         if preview_uuid:
-            supabase.update_case(preview_uuid, pending_case)
+            await supabase.sync_case(preview_uuid, pending_case)
         else:
-            preview_uuid = supabase.save_case(pending_case)
+            preview_uuid = await supabase.save_case(pending_case)
             context.user_data["preview_uuid"] = preview_uuid
 
         if not preview_uuid:
@@ -1832,67 +2051,21 @@ async def _do_publicar(query, context: ContextTypes.DEFAULT_TYPE) -> int:
 
     try:
         pending_case = context.user_data.get("pending_case")
-        case_number = supabase.get_next_case_number()
+        case_number = await supabase.get_next_case_number()
         case_uuid = context.user_data.get("preview_uuid")
         if case_uuid:
-            supabase.update_case(case_uuid, pending_case)
+            await supabase.sync_case(case_uuid, pending_case)
         else:
-            case_uuid = supabase.save_case(pending_case)
+            case_uuid = await supabase.save_case(pending_case)
         if not case_uuid:
             context.user_data["published"] = False
             return STATE_WAITING_IMAGES
 
-        vignette = pending_case["vignette"]
-        options = pending_case["options"]
-        poll_question = vignette
-        if len(vignette) > 290:
-            await context.bot.send_message(
-                chat_id=Config.PUBLIC_CHANNEL_ID,
-                text=vignette,
-            )
-            poll_question = "¿Cuál es la respuesta correcta?"
-
-        option_texts = []
-        for opt in options:
-            full = f"{opt['letter']}. {opt['text']}"
-            if len(full) > 100:
-                full = full[:97] + "..."
-            option_texts.append(full)
-
-        correct_letter = pending_case["correct_letter"]
-        correct_index = next(
-            (i for i, opt in enumerate(options) if opt["letter"] == correct_letter),
-            0,
-        )
-
-        # Use TIP for quiz explanation tooltip (lightbulb icon), fallback to justification
-        tip_text = pending_case.get("tip", "")
-        explanation = f"💡 {tip_text[:195]}" if tip_text else pending_case["justification"][:200]
-        miniapp_short_name = Config.MINIAPP_SHORT_NAME
-        keyboard = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text="VER JUSTIFICACIÓN 💬",
-                        url=f"https://t.me/{context.bot.username}/{miniapp_short_name}?startapp={case_uuid}",
-                    )
-                ]
-            ]
-        )
-
-        poll_msg = await context.bot.send_poll(
-            chat_id=Config.PUBLIC_CHANNEL_ID,
-            question=poll_question,
-            options=option_texts,
-            type="quiz",
-            correct_option_id=correct_index,
-            explanation=explanation,
-            is_anonymous=True,
-            reply_markup=keyboard,
-        )
+        payload = build_poll_payload(case_uuid, pending_case, context.bot.username)
+        poll_msg = await publish_case(context.bot, payload, Config.PUBLIC_CHANNEL_ID, PRIORITY_MANUAL)
 
         logger.info(f"Poll published for case {case_uuid}: {poll_msg.message_id}")
-        supabase.update_case(
+        await supabase.update_case(
             case_uuid,
             {"telegram_message_id": poll_msg.message_id, "published": True, "display_number": case_display_num(case_uuid)},
         )
@@ -1932,10 +2105,10 @@ async def preview_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         preview_uuid = context.user_data.get("preview_uuid")
         if preview_uuid:
             # Update existing preview
-            supabase.update_case(preview_uuid, pending_case)
+            await supabase.sync_case(preview_uuid, pending_case)
         else:
             # Save new preview
-            preview_uuid = supabase.save_case(pending_case)
+            preview_uuid = await supabase.save_case(pending_case)
             context.user_data["preview_uuid"] = preview_uuid
 
         if not preview_uuid:
@@ -2010,83 +2183,28 @@ async def publicar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         context.user_data["published"] = True
 
         # Get case number BEFORE saving (so count is accurate)
-        case_number = supabase.get_next_case_number()
+        case_number = await supabase.get_next_case_number()
 
         # Reuse preview UUID if it exists, otherwise save new
         case_uuid = context.user_data.get("preview_uuid")
         if case_uuid:
             # Update existing preview case with latest data
-            supabase.update_case(case_uuid, pending_case)
+            await supabase.sync_case(case_uuid, pending_case)
         else:
             # Save new case to Supabase
-            case_uuid = supabase.save_case(pending_case)
+            case_uuid = await supabase.save_case(pending_case)
         if not case_uuid:
             await update.message.reply_text("❌ Error al guardar el caso en la base de datos.")
             return ConversationHandler.END
 
-        # Prepare poll data
-        vignette = pending_case["vignette"]
-        options = pending_case["options"]
-
-        # If vignette is too long for poll question (300 char limit), send it as text first
-        poll_question = vignette
-        if len(vignette) > 290:
-            # Send vignette as separate message
-            await context.bot.send_message(
-                chat_id=Config.PUBLIC_CHANNEL_ID,
-                text=vignette,
-            )
-            # Use shorter question
-            poll_question = "¿Cuál es la respuesta correcta?"
-
-        # Prepare option texts
-        option_texts = []
-        for opt in options:
-            full = f"{opt['letter']}. {opt['text']}"
-            # Telegram limit is 100 chars per option
-            if len(full) > 100:
-                full = full[:97] + "..."
-            option_texts.append(full)
-
-        correct_letter = pending_case["correct_letter"]
-        correct_index = next(
-            (i for i, opt in enumerate(options) if opt["letter"] == correct_letter),
-            0,
-        )
-
-        # Use TIP for quiz explanation tooltip (lightbulb icon), fallback to justification
-        tip_text = pending_case.get("tip", "")
-        explanation = f"💡 {tip_text[:195]}" if tip_text else pending_case["justification"][:200]
-
-        # Prepare Mini App button (attached directly to the poll)
-        miniapp_short_name = Config.MINIAPP_SHORT_NAME
-        keyboard = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text="VER JUSTIFICACIÓN 💬",
-                        url=f"https://t.me/{context.bot.username}/{miniapp_short_name}?startapp={case_uuid}",
-                    )
-                ]
-            ]
-        )
-
-        # Send poll to channel WITH the button attached
-        poll_msg = await context.bot.send_poll(
-            chat_id=Config.PUBLIC_CHANNEL_ID,
-            question=poll_question,
-            options=option_texts,
-            type="quiz",
-            correct_option_id=correct_index,
-            explanation=explanation,
-            is_anonymous=True,
-            reply_markup=keyboard,
-        )
+        # Render the quiz and send it (long vignette first) through the publish engine
+        payload = build_poll_payload(case_uuid, pending_case, context.bot.username)
+        poll_msg = await publish_case(context.bot, payload, Config.PUBLIC_CHANNEL_ID, PRIORITY_MANUAL)
 
         logger.info(f"Poll published for case {case_uuid}: {poll_msg.message_id}")
 
         # Update case with message IDs
-        supabase.update_case(
+        await supabase.update_case(
             case_uuid,
             {
                 "telegram_message_id": poll_msg.message_id,
@@ -2121,7 +2239,7 @@ async def cancelar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     # Delete orphan preview from Supabase if it exists
     if preview_uuid:
         try:
-            supabase.delete_case(preview_uuid)
+            await supabase.delete_case(preview_uuid)
             logger.info(f"Cleaned up preview {preview_uuid} on cancel")
         except Exception as e:
             logger.warning(f"Could not delete preview {preview_uuid}: {e}")
@@ -2148,9 +2266,11 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         "/editar_caso - Editar caso ya publicado\n"
         "/programar - Programar publicación manual\n"
         "/cola - Ver cola de programados\n"
+        "/slo - Puntualidad de publicaciones\n"
         "/desprogramar - Desprogramar caso\n"
         "/hora_cola - Ver/cambiar hora de auto-cola\n"
         "/dias_cola - Ver/cambiar días activos\n"
+        "/rebalancear_cola - Mover la cola a la hora/días actuales\n"
         "/cancelar - Cancelar\n"
         "/admin - Ver este menú\n\n"
         "<b>Flujo:</b>\n"
@@ -2247,9 +2367,11 @@ async def post_init(application) -> None:
         BotCommand("editar_caso", "📝 Editar caso publicado"),
         BotCommand("programar", "🕐 Programar publicación"),
         BotCommand("cola", "📋 Ver cola de programados"),
+        BotCommand("slo", "📈 Puntualidad de publicaciones"),
         BotCommand("desprogramar", "🗑️ Desprogramar caso"),
         BotCommand("hora_cola", "⏰ Hora de auto-cola"),
         BotCommand("dias_cola", "📅 Días activos de cola"),
+        BotCommand("rebalancear_cola", "⚖️ Reprogramar cola con hora/días actuales"),
         BotCommand("cancelar", "🗑️ Cancelar caso pendiente"),
         BotCommand("admin", "🔧 Panel de administrador"),
         BotCommand("help", "ℹ️ Ayuda"),
@@ -2266,25 +2388,214 @@ async def post_init(application) -> None:
 
     logger.info("Bot commands menu registered")
 
+    # Replay journaled writes (left over from an outage) in the background
+    if supabase.journal:
+        _start_background(supabase.drain_journal_loop())
+
+    # Warm the case cache with the hottest (most recently published) cases
+    await supabase.warm_case_cache(Config.CASE_CACHE_WARM_COUNT)
+
+    # Display-number index: backfill missing numbers once, then load the map
+    await supabase.backfill_display_numbers()
+    await supabase.load_display_index()
+
+    # Load queue settings once; kept fresh in the background
+    await supabase.load_settings()
+    _start_background(supabase.settings_refresh_loop(Config.SETTINGS_REFRESH_SECONDS))
+
     # Initialize and start the scheduler for automatic publishing
-    from scheduler import init_scheduler, on_startup, scheduler_loop
-    init_scheduler(application, supabase)
-    await on_startup()
-    asyncio.ensure_future(scheduler_loop())
-    logger.info("Scheduler started")
+    # (with split roles it runs in its own process, see run_worker_role)
+    if Config.BOT_ROLE == "all":
+        from scheduler import init_scheduler, on_startup, scheduler_loop
+        init_scheduler(application, supabase)
+        await on_startup()
+        _start_background(scheduler_loop())
+        logger.info("Scheduler started")
+
+
+def _start_background(coro) -> asyncio.Task:
+    """Start a long-running loop, keeping a reference so it is not garbage
+    collected and can be cancelled on shutdown."""
+    task = asyncio.ensure_future(coro)
+    background_tasks.append(task)
+    return task
+
+
+async def post_shutdown(application) -> None:
+    """Stop the background loops, flush buffered case writes and release
+    the shared Supabase HTTP pool."""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    if supabase:
+        await supabase.flush_case_writes()
+        await supabase.close()
+
+
+def init_storage():
+    """Build the data client selected by Config.STORAGE_BACKEND."""
+    # With split roles another process reads the cases: no write-behind delay
+    write_debounce = Config.CASE_WRITE_DEBOUNCE_SECONDS if Config.BOT_ROLE == "all" else 0
+    if Config.STORAGE_BACKEND == "sqlite":
+        return init_local_client(
+            Config.LOCAL_DB_PATH,
+            Config.LOCAL_BUCKET_DIR,
+            bucket_url=Config.LOCAL_BUCKET_URL,
+            write_debounce=write_debounce,
+        )
+    return init_async_supabase(
+        Config.SUPABASE_URL,
+        Config.SUPABASE_KEY,
+        Config.SUPABASE_SERVICE_KEY,
+        case_cache_size=Config.CASE_CACHE_SIZE,
+        case_cache_ttl=Config.CASE_CACHE_TTL_SECONDS,
+        write_debounce=write_debounce,
+        journal=WriteJournal(Config.WRITE_JOURNAL_PATH) if Config.WRITE_JOURNAL_PATH else None,
+        resilience=ResilientCaller(
+            max_attempts=Config.SUPABASE_RETRY_ATTEMPTS,
+            failure_threshold=Config.SUPABASE_BREAKER_THRESHOLD,
+            reset_timeout=Config.SUPABASE_BREAKER_RESET_SECONDS,
+        ),
+    )
+
+
+async def run_worker_role(role: str) -> None:
+    """Run a split role that does not receive updates: "scheduler"
+    (scheduled publishing) or "media" (image jobs). Coordination with the
+    updates process goes through the DB (scheduled_posts / media_jobs)."""
+    worker_app = Application.builder().token(Config.BOT_TOKEN).build()
+    stop_event = _stop_on_signals()
+    async with worker_app:
+        try:
+            if supabase.journal:
+                _start_background(supabase.drain_journal_loop())
+            if role == "scheduler":
+                from scheduler import init_scheduler, on_startup, scheduler_loop
+                await supabase.load_settings()
+                _start_background(supabase.settings_refresh_loop(Config.SETTINGS_REFRESH_SECONDS))
+                init_scheduler(worker_app, supabase)
+                await on_startup()
+                worker = asyncio.create_task(scheduler_loop(Config.SPLIT_SCHEDULER_RECONCILE_SECONDS))
+            else:
+                worker = asyncio.create_task(media_worker_loop(
+                    worker_app.bot, supabase, Config.INSTANCE_ID, Config.MEDIA_WORKER_POLL_SECONDS
+                ))
+            stopped = asyncio.create_task(stop_event.wait())
+            try:
+                await asyncio.wait({worker, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                stopped.cancel()
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+            if stop_event.is_set():
+                logger.info(f"Stop signal received, shutting down the {role} role")
+            else:
+                # The loop ended on its own: surface its error, if any
+                worker.result()
+        finally:
+            await post_shutdown(worker_app)
+
+
+def _stop_on_signals() -> asyncio.Event:
+    """Event set on SIGTERM/SIGINT (Render sends SIGTERM on deploys), so the
+    long-running modes leave through their shutdown/flush path."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on this platform / not the main thread
+            logger.warning(f"Cannot handle {sig.name}; shutdown relies on cancellation")
+    return stop_event
+
+
+async def run_webhook(application) -> None:
+    """UPDATE_MODE=webhook: register the webhook and serve updates plus the
+    health/metrics routes from one asyncio server on PORT."""
+    port = int(os.environ.get("PORT", 10000))
+    server = WebhookServer(application, port, Config.WEBHOOK_PATH, Config.WEBHOOK_SECRET)
+    stop_event = _stop_on_signals()
+    async with application:
+        try:
+            await post_init(application)
+            await application.start()
+            await server.start()
+            try:
+                await application.bot.set_webhook(
+                    url=Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+                    secret_token=Config.WEBHOOK_SECRET,
+                    allowed_updates=ALLOWED_UPDATES,
+                    drop_pending_updates=True,
+                )
+                logger.info("Webhook registered, waiting for updates")
+                await stop_event.wait()
+                logger.info("Stop signal received, shutting down")
+            finally:
+                await server.stop()
+                if application.running:
+                    await application.stop()
+        finally:
+            # Flush pending case writes and stop background tasks even when
+            # startup failed half-way
+            await post_shutdown(application)
+
+
+def start_health_server() -> None:
+    """Health check server for Render (needs an open port)."""
+    port = int(os.environ.get("PORT", 10000))
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, content_type, body = health_response(self.path)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, format, *args):
+            pass  # Suppress logs
+    try:
+        server = HTTPServer(("0.0.0.0", port), HealthHandler)
+    except OSError as e:
+        # Several roles on one host: only the first one gets the port
+        logger.warning(f"Health check server not started on port {port}: {e}")
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Health check server on port {port}")
 
 
 def main() -> None:
     """Main entry point for the bot."""
-    global supabase, app
+    global supabase, app, queue_allocator, update_processor
 
     try:
-        # Initialize Supabase
-        supabase = init_supabase(Config.SUPABASE_URL, Config.SUPABASE_KEY, Config.SUPABASE_SERVICE_KEY)
-        logger.info("Supabase initialized")
+        # Initialize the storage backend (Supabase, or local SQLite for dev)
+        supabase = init_storage()
+        queue_allocator = QueueSlotAllocator(supabase)
+        logger.info(f"Storage initialized ({Config.STORAGE_BACKEND}, role {Config.BOT_ROLE})")
+
+        # Split roles without Telegram updates run their own loop
+        if Config.BOT_ROLE in ("scheduler", "media"):
+            start_health_server()
+            asyncio.run(run_worker_role(Config.BOT_ROLE))
+            return
 
         # Create bot application with post_init for command menu
-        app = Application.builder().token(Config.BOT_TOKEN).post_init(post_init).build()
+        builder = (
+            Application.builder()
+            .token(Config.BOT_TOKEN)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+        )
+        if Config.UPDATE_CONCURRENCY > 1:
+            update_processor = PerUserOrderedProcessor(
+                Config.UPDATE_CONCURRENCY,
+                fast_user_ids=Config.ADMIN_USER_IDS,
+                fast_lane_workers=Config.ADMIN_LANE_CONCURRENCY,
+            )
+            builder = builder.concurrent_updates(update_processor)
+            deeplink_admission.queue_depth = lambda: update_processor.backlog(LANE_PUBLIC)
+        app = builder.build()
 
         # Register handlers
         # Start command
@@ -2395,6 +2706,7 @@ def main() -> None:
             ],
             states={
                 STATE_EDIT_PUBLISHED_NUMBER: [
+                    CallbackQueryHandler(edit_published_pick_callback, pattern="^edit_pub_pick_"),
                     CommandHandler("cancelar", edit_published_cancelar),
                     MessageHandler(_BTN_CANCELAR, edit_published_cancelar),
                     MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.UpdateType.EDITED_MESSAGE, edit_published_number_handler),
@@ -2435,9 +2747,11 @@ def main() -> None:
         app.add_handler(CommandHandler("preview", fallback_preview))
         app.add_handler(CommandHandler("publicar", fallback_publicar))
         app.add_handler(CommandHandler("cola", cola_command))
+        app.add_handler(CommandHandler("slo", slo_command))
         app.add_handler(CommandHandler("desprogramar", desprogramar_command))
         app.add_handler(CommandHandler("hora_cola", hora_cola_command))
         app.add_handler(CommandHandler("dias_cola", dias_cola_command))
+        app.add_handler(CommandHandler("rebalancear_cola", rebalancear_cola_command))
 
         # Keyboard button text fallbacks (without slash)
         app.add_handler(MessageHandler(_BTN_CANCELAR, fallback_cancelar))
@@ -2515,7 +2829,7 @@ def main() -> None:
                 # Update preview in Supabase if exists
                 preview_uuid = context.user_data.get("preview_uuid")
                 if preview_uuid:
-                    supabase.update_case(preview_uuid, context.user_data["pending_case"])
+                    supabase.queue_case_update(preview_uuid, context.user_data["pending_case"])
 
                 # Build score
                 checks = [
@@ -2595,20 +2909,14 @@ def main() -> None:
         app.add_error_handler(error_handler)
 
         logger.info("Bot handlers registered")
-        logger.info("Starting bot in polling mode...")
 
-        # Start health check server for Render (needs an open port)
-        port = int(os.environ.get("PORT", 10000))
-        class HealthHandler(BaseHTTPRequestHandler):
-            def do_GET(self):
-                self.send_response(200)
-                self.end_headers()
-                self.wfile.write(b"OK")
-            def log_message(self, format, *args):
-                pass  # Suppress logs
-        server = HTTPServer(("0.0.0.0", port), HealthHandler)
-        threading.Thread(target=server.serve_forever, daemon=True).start()
-        logger.info(f"Health check server on port {port}")
+        if Config.UPDATE_MODE == "webhook":
+            logger.info("Starting bot in webhook mode...")
+            asyncio.run(run_webhook(app))
+            return
+
+        logger.info("Starting bot in polling mode...")
+        start_health_server()
 
         # Ensure event loop exists (required for Python 3.14+)
         try:
@@ -2621,7 +2929,7 @@ def main() -> None:
         # allowed_updates includes edited_message so bot detects when admin edits case text
         app.run_polling(
             drop_pending_updates=True,
-            allowed_updates=["message", "edited_message", "callback_query"],
+            allowed_updates=ALLOWED_UPDATES,
         )
 
     except Exception as e:
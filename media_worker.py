@@ -0,0 +1,72 @@
+"""
+Media processing: Telegram photo → Storage URL.
+
+In a single process (BOT_ROLE=all) the handlers call store_telegram_image()
+directly. With split roles the "updates" process only queues a media job
+(enqueue_media_job) and waits for its result, while one or more "media"
+processes run media_worker_loop(): claim jobs with a lease, download the
+file from Telegram, upload it and store the URL on the job.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# How often the updates role checks a job it is waiting for
+JOB_WAIT_POLL_SECONDS = 0.5
+
+
+async def store_telegram_image(bot, client, file_id: str, filename: str) -> Optional[str]:
+    """Download a Telegram file and upload it to the bucket. Returns its URL."""
+    file = await bot.get_file(file_id)
+    file_bytes = await file.download_as_bytearray()
+    return await client.upload_image(bytes(file_bytes), filename)
+
+
+async def wait_media_job(client, job_id: str, timeout: float) -> Optional[str]:
+    """Wait for a queued media job. Returns its URL, or None if it failed
+    or no media worker finished it within `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await client.get_media_job(job_id)
+        if job and job["status"] == "done":
+            return job["result_url"]
+        if job and job["status"] == "failed":
+            logger.error(f"Media job {job_id} failed: {job.get('error_message')}")
+            return None
+        await asyncio.sleep(JOB_WAIT_POLL_SECONDS)
+    logger.error(f"Media job {job_id} not finished after {timeout:.0f}s (is a media worker running?)")
+    return None
+
+
+async def _process_job(bot, client, job: dict) -> None:
+    try:
+        url = await store_telegram_image(bot, client, job["file_id"], job["filename"])
+        await client.finish_media_job(job["id"], result_url=url, error_msg=None if url else "Error al subir la imagen")
+        if url:
+            logger.info(f"Media job {job['id']} done")
+    except Exception as e:
+        logger.error(f"Media job {job['id']} failed: {e}")
+        await client.finish_media_job(job["id"], error_msg=str(e))
+
+
+async def media_worker_loop(bot, client, owner: str, poll_seconds: float):
+    """Claim and process media jobs until cancelled (BOT_ROLE=media)."""
+    logger.info(f"Media worker {owner} started")
+    while True:
+        try:
+            jobs = await client.claim_media_jobs(owner, datetime.now(timezone.utc))
+            if not jobs:
+                await asyncio.sleep(poll_seconds)
+                continue
+            await asyncio.gather(*(_process_job(bot, client, job) for job in jobs))
+        except asyncio.CancelledError:
+            logger.info("Media worker cancelled")
+            break
+        except Exception as e:
+            logger.error(f"Media worker error: {e}", exc_info=True)
+            await asyncio.sleep(poll_seconds)
@@ -0,0 +1,169 @@
+"""
+Scheduler SLO metrics: how late scheduled cases actually go out.
+
+Per published post the scheduler records:
+- claim_to_publish: from claiming the post to the poll being sent
+- deadline_lag: from scheduled_at to the poll being sent
+- send_duration: time spent in the Telegram sends
+and counts failures by cause. Samples are kept in rolling windows
+(bounded by age and count) and summarized as percentiles for the /slo
+admin command; the /metrics route of the health server exposes lifetime
+histograms instead, so Prometheus counters never go down.
+"""
+
+import math
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+WINDOW_SECONDS = 7 * 24 * 3600
+MAX_SAMPLES = 5000
+PERCENTILES = (50, 90, 99)
+
+# "On the minute": a post counts as on time if sent within this lag
+ON_TIME_SECONDS = 60.0
+
+# Prometheus-style histogram buckets (seconds)
+BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900)
+
+
+class RollingHistogram:
+    """Samples of the last WINDOW_SECONDS (at most MAX_SAMPLES), plus
+    lifetime bucket counts that only ever grow (for Prometheus rate())."""
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS, max_samples: int = MAX_SAMPLES):
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=max_samples)  # (timestamp, value)
+        self._lock = threading.Lock()
+        self._bucket_totals = [0] * len(BUCKETS)
+        self.total_count = 0
+        self.total_sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._samples.append((time.time(), value))
+            self.total_count += 1
+            self.total_sum += value
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    self._bucket_totals[i] += 1
+
+    def values(self) -> List[float]:
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return [value for _, value in self._samples]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """count, max and nearest-rank percentiles over the window."""
+        values = sorted(self.values())
+        result: Dict[str, Optional[float]] = {"count": len(values), "max": values[-1] if values else None}
+        for p in PERCENTILES:
+            if values:
+                rank = max(1, math.ceil(p / 100 * len(values)))
+                result[f"p{p}"] = values[rank - 1]
+            else:
+                result[f"p{p}"] = None
+        return result
+
+    def buckets(self) -> Dict[str, int]:
+        """Lifetime cumulative counts per bucket upper bound (plus +Inf)."""
+        with self._lock:
+            counts = {str(bound): total for bound, total in zip(BUCKETS, self._bucket_totals)}
+            counts["+Inf"] = self.total_count
+        return counts
+
+
+class SchedulerMetrics:
+    """All scheduler SLO measures (shared by the scheduler and the reports)."""
+
+    def __init__(self):
+        self.claim_to_publish = RollingHistogram()
+        self.deadline_lag = RollingHistogram()
+        self.send_duration = RollingHistogram()
+        self.failures: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record_published(self, claim_to_publish: float, deadline_lag: float, send_duration: float) -> None:
+        self.claim_to_publish.observe(claim_to_publish)
+        self.deadline_lag.observe(deadline_lag)
+        self.send_duration.observe(send_duration)
+
+    def record_failure(self, cause: str) -> None:
+        with self._lock:
+            self.failures[cause] += 1
+
+    def on_time_ratio(self) -> Optional[float]:
+        lags = self.deadline_lag.values()
+        if not lags:
+            return None
+        return sum(1 for lag in lags if lag <= ON_TIME_SECONDS) / len(lags)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            failures = dict(self.failures)
+        return {
+            "claim_to_publish_seconds": self.claim_to_publish.summary(),
+            "deadline_lag_seconds": self.deadline_lag.summary(),
+            "send_duration_seconds": self.send_duration.summary(),
+            "on_time_ratio": self.on_time_ratio(),
+            "failures": failures,
+        }
+
+    def render_text(self) -> str:
+        """Admin report (HTML) for /slo."""
+        def fmt(value: Optional[float]) -> str:
+            return "—" if value is None else f"{value:.1f}s"
+
+        snap = self.snapshot()
+        lines = ["📈 <b>SLO de publicación</b> (últimos 7 días)\n"]
+        for label, key in (
+            ("Retraso vs hora programada", "deadline_lag_seconds"),
+            ("Claim → publicado", "claim_to_publish_seconds"),
+            ("Envío a Telegram", "send_duration_seconds"),
+        ):
+            s = snap[key]
+            lines.append(
+                f"<b>{label}</b> ({s['count']}): p50 {fmt(s['p50'])} · p90 {fmt(s['p90'])} · "
+                f"p99 {fmt(s['p99'])} · máx {fmt(s['max'])}"
+            )
+        ratio = snap["on_time_ratio"]
+        lines.append(
+            f"\n⏱️ A tiempo (≤{ON_TIME_SECONDS:.0f}s): " + ("—" if ratio is None else f"{ratio * 100:.1f}%")
+        )
+        if snap["failures"]:
+            lines.append("\n❌ <b>Fallos</b>:")
+            lines.extend(f"  • {cause}: {count}" for cause, count in sorted(snap["failures"].items()))
+        else:
+            lines.append("\n✅ Sin fallos")
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """Text exposition format for the /metrics route."""
+        out = []
+        for name, hist in (
+            ("scheduler_claim_to_publish_seconds", self.claim_to_publish),
+            ("scheduler_deadline_lag_seconds", self.deadline_lag),
+            ("scheduler_send_duration_seconds", self.send_duration),
+        ):
+            # Lifetime totals: counters must never go down between scrapes
+            out.append(f"# TYPE {name} histogram")
+            for bound, count in hist.buckets().items():
+                out.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            out.append(f"{name}_sum {hist.total_sum:.3f}")
+            out.append(f"{name}_count {hist.total_count}")
+        out.append("# TYPE scheduler_failures_total counter")
+        with self._lock:
+            for cause, count in sorted(self.failures.items()):
+                out.append(f'scheduler_failures_total{{cause="{cause}"}} {count}')
+        ratio = self.on_time_ratio()
+        if ratio is not None:
+            out.append("# TYPE scheduler_on_time_ratio gauge")
+            out.append(f"scheduler_on_time_ratio {ratio:.4f}")
+        return "\n".join(out) + "\n"
+
+
+# Process-wide instance
+scheduler_metrics = SchedulerMetrics()
@@ -0,0 +1,22 @@
+-- Maintained case counter for O(1) case numbering (/publicar, 📢 Publicar).
+-- Replaces the `select count(*) from cases` scan done on every publish.
+-- Seeded so the next number matches the old count + 1 behaviour.
+
+create sequence if not exists case_number_seq;
+
+select setval(
+    'case_number_seq',
+    greatest((select count(*) from cases), 1),
+    (select count(*) from cases) > 0
+);
+
+create or replace function next_case_number()
+returns bigint
+language sql
+volatile
+security definer
+as $$
+    select nextval('case_number_seq');
+$$;
+
+grant execute on function next_case_number() to service_role;
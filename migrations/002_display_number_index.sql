@@ -0,0 +1,26 @@
+-- Indexed display-number lookups for /editar_caso.
+-- display_number is written at publish time; older rows are backfilled by the
+-- bot on startup through set_display_numbers() (one call for every row).
+
+create index if not exists cases_display_number_idx
+    on cases (display_number)
+    where published;
+
+-- payload: [{"id": "<uuid>", "display_number": 1234}, ...]
+create or replace function set_display_numbers(payload jsonb)
+returns integer
+language sql
+volatile
+security definer
+as $$
+    with updated as (
+        update cases c
+        set display_number = (p->>'display_number')::int
+        from jsonb_array_elements(payload) p
+        where c.id = (p->>'id')::uuid
+        returning 1
+    )
+    select count(*)::int from updated;
+$$;
+
+grant execute on function set_display_numbers(jsonb) to service_role;
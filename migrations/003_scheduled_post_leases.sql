@@ -0,0 +1,45 @@
+-- Lease-based claim of due scheduled posts, so several bot instances (e.g.
+-- two overlapping during a deploy) never publish the same post twice.
+-- A claimed post is 'publishing' with an owner and an expiry; if the owner
+-- dies, the lease expires and another instance reclaims the post.
+
+alter table scheduled_posts
+    add column if not exists lease_owner text,
+    add column if not exists lease_expires_at timestamptz;
+
+create index if not exists scheduled_posts_due_idx
+    on scheduled_posts (scheduled_at)
+    where status in ('pending', 'publishing');
+
+-- Atomically claim up to p_limit posts that are due (or whose lease expired).
+-- Returns only the rows this caller won.
+create or replace function claim_due_posts(
+    p_owner text,
+    p_now timestamptz,
+    p_lease_seconds integer,
+    p_limit integer
+)
+returns table (id uuid, case_id uuid, scheduled_at timestamptz, reclaimed boolean)
+language sql
+volatile
+security definer
+as $$
+    with candidates as (
+        select sp.id, sp.status = 'publishing' as reclaimed
+        from scheduled_posts sp
+        where (sp.status = 'pending' and sp.scheduled_at <= p_now)
+           or (sp.status = 'publishing' and sp.lease_expires_at < p_now)
+        order by sp.scheduled_at, sp.id
+        limit p_limit
+        for update skip locked
+    )
+    update scheduled_posts sp
+    set status = 'publishing',
+        lease_owner = p_owner,
+        lease_expires_at = p_now + make_interval(secs => p_lease_seconds)
+    from candidates c
+    where sp.id = c.id
+    returning sp.id, sp.case_id, sp.scheduled_at, c.reclaimed;
+$$;
+
+grant execute on function claim_due_posts(text, timestamptz, integer, integer) to service_role;
@@ -0,0 +1,20 @@
+-- Bulk reschedule of pending posts (queue rebalancing after /hora_cola or
+-- /dias_cola). One call moves every post; rows that stopped being
+-- 'pending' meanwhile (claimed, published, cancelled) are left untouched.
+-- p_changes: [{"id": "<uuid>", "scheduled_at": "<timestamptz>"}, ...]
+
+create or replace function reschedule_posts(p_changes jsonb)
+returns setof uuid
+language sql
+volatile
+security definer
+as $$
+    update scheduled_posts sp
+    set scheduled_at = c.scheduled_at
+    from jsonb_to_recordset(p_changes) as c(id uuid, scheduled_at timestamptz)
+    where sp.id = c.id
+      and sp.status = 'pending'
+    returning sp.id;
+$$;
+
+grant execute on function reschedule_posts(jsonb) to service_role;
@@ -0,0 +1,20 @@
+-- Work queue between the "updates" role (receives admin photos) and the
+-- "media" role (downloads them from Telegram and uploads them to Storage).
+-- Jobs are claimed with a lease like scheduled posts (migrations/003); an
+-- expired 'processing' job is picked up again by another media worker.
+
+create table if not exists media_jobs (
+    id uuid primary key,
+    file_id text not null,
+    filename text not null,
+    status text not null default 'pending',  -- pending | processing | done | failed
+    result_url text,
+    error_message text,
+    lease_owner text,
+    lease_expires_at timestamptz,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists media_jobs_open_idx
+    on media_jobs (created_at)
+    where status in ('pending', 'processing');
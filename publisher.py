@@ -0,0 +1,309 @@
+"""
+Publish engine for the public channel.
+
+- build_poll_payload() turns a case row into everything send_poll needs
+  (question, truncated options, correct index, explanation, Mini App
+  button); validate_payload() checks it against the Bot API limits. The
+  scheduler builds payloads ahead of scheduled_at so only the sends remain.
+- PublishEngine is the single way out to Telegram for cases posted to the
+  channel (manual /publicar and scheduled cases): a priority queue (manual
+  beats scheduled), per-chat + global token buckets matched to the Bot API
+  limits, and RetryAfter handling instead of ad-hoc sleeps.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import RetryAfter
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Bot API limits
+POLL_QUESTION_MAX = 300
+POLL_OPTION_MAX = 100
+POLL_EXPLANATION_MAX = 200
+POLL_MIN_OPTIONS = 2
+POLL_MAX_OPTIONS = 10
+MESSAGE_TEXT_MAX = 4096
+
+# Vignettes longer than this go out as a separate message before the poll
+INLINE_VIGNETTE_MAX = 290
+LONG_VIGNETTE_QUESTION = "¿Cuál es la respuesta correcta?"
+
+
+@dataclass
+class PollPayload:
+    """Fully rendered quiz poll for one case."""
+    case_id: str
+    question: str
+    options: List[str]
+    correct_index: int
+    explanation: str
+    button_url: str
+    intro_text: Optional[str] = None  # long vignette, sent before the poll
+    correct_found: bool = True
+
+    def reply_markup(self) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            [[InlineKeyboardButton(text="VER JUSTIFICACIÓN 💬", url=self.button_url)]]
+        )
+
+
+def miniapp_url(bot_username: str, case_id: str) -> str:
+    return f"https://t.me/{bot_username}/{Config.MINIAPP_SHORT_NAME}?startapp={case_id}"
+
+
+def build_poll_payload(case_id: str, case_data: Dict[str, Any], bot_username: str) -> PollPayload:
+    """Render the quiz poll of a case (same rules as manual /publicar)."""
+    vignette = case_data.get("vignette") or ""
+    options = case_data.get("options") or []
+
+    intro_text = None
+    question = vignette
+    if len(vignette) > INLINE_VIGNETTE_MAX:
+        intro_text = vignette
+        question = LONG_VIGNETTE_QUESTION
+
+    option_texts = []
+    for opt in options:
+        full = f"{opt['letter']}. {opt['text']}"
+        if len(full) > POLL_OPTION_MAX:
+            full = full[:POLL_OPTION_MAX - 3] + "..."
+        option_texts.append(full)
+
+    correct_letter = case_data.get("correct_letter")
+    correct_index = next(
+        (i for i, opt in enumerate(options) if opt["letter"] == correct_letter),
+        None,
+    )
+
+    # TIP for the explanation tooltip, fallback to justification
+    tip_text = case_data.get("tip") or ""
+    explanation = f"💡 {tip_text[:195]}" if tip_text else (case_data.get("justification") or "")[:200]
+
+    return PollPayload(
+        case_id=case_id,
+        question=question,
+        options=option_texts,
+        correct_index=correct_index if correct_index is not None else 0,
+        explanation=explanation,
+        button_url=miniapp_url(bot_username, case_id),
+        intro_text=intro_text,
+        correct_found=correct_index is not None,
+    )
+
+
+def validate_payload(payload: PollPayload) -> List[str]:
+    """Problems that would make send_poll fail or publish a broken quiz."""
+    errors = []
+    if not payload.question.strip():
+        errors.append("La viñeta está vacía")
+    if len(payload.question) > POLL_QUESTION_MAX:
+        errors.append(f"Pregunta de {len(payload.question)} caracteres (máx. {POLL_QUESTION_MAX})")
+    if payload.intro_text and len(payload.intro_text) > MESSAGE_TEXT_MAX:
+        errors.append(f"Viñeta de {len(payload.intro_text)} caracteres (máx. {MESSAGE_TEXT_MAX})")
+    if not POLL_MIN_OPTIONS <= len(payload.options) <= POLL_MAX_OPTIONS:
+        errors.append(f"{len(payload.options)} opciones (deben ser {POLL_MIN_OPTIONS}-{POLL_MAX_OPTIONS})")
+    if len(set(payload.options)) != len(payload.options):
+        errors.append("Hay opciones repetidas")
+    if not payload.correct_found:
+        errors.append("La respuesta correcta no coincide con ninguna opción")
+    if len(payload.explanation) > POLL_EXPLANATION_MAX:
+        errors.append(f"Explicación de {len(payload.explanation)} caracteres (máx. {POLL_EXPLANATION_MAX})")
+    return errors
+
+
+# ═══════════════════════════════════════════
+# RATE-LIMITED PUBLISH ENGINE
+# ═══════════════════════════════════════════
+
+# Lower value = sent first
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 1
+
+# Bot API: ~30 messages/s overall, 20/min per group or channel, ~1/s per private chat
+GLOBAL_RATE_PER_SECOND = 30.0
+PRIVATE_CHAT_RATE_PER_SECOND = 1.0
+MAX_RETRY_AFTER_ATTEMPTS = 3
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/s, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def wait_ready(self) -> None:
+        """Wait until a token is available (without taking it)."""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill()
+            if self.tokens >= 1:
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def acquire(self) -> None:
+        await self.wait_ready()
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """Flood wait from Telegram: no tokens for `seconds`."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class PublishEngine:
+    """Serializes channel sends through one priority queue.
+
+    submit(job, priority) runs `job` exclusively, highest priority first
+    (FIFO within a priority). Inside a job, every Bot API request goes
+    through call(chat_id, fn), which waits for rate-limit tokens and
+    retries after RetryAfter. Jobs must not submit() other jobs.
+    """
+
+    def __init__(self, channel_rate_per_minute: float, burst: int):
+        self.channel_rate = channel_rate_per_minute / 60.0
+        self.burst = burst
+        self._global = TokenBucket(GLOBAL_RATE_PER_SECOND, GLOBAL_RATE_PER_SECOND)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+        self._last_bucket: Optional[TokenBucket] = None
+        self.sent = 0
+        self.flood_waits = 0
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:  # group / channel
+                bucket = TokenBucket(self.channel_rate, self.burst)
+            else:
+                bucket = TokenBucket(PRIVATE_CHAT_RATE_PER_SECOND, 1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def call(self, chat_id: int, fn: Callable[[], Awaitable[T]]) -> T:
+        """One rate-limited Bot API request, retried after flood waits."""
+        bucket = self._last_bucket = self._bucket(chat_id)
+        for attempt in range(1, MAX_RETRY_AFTER_ATTEMPTS + 1):
+            await bucket.acquire()
+            await self._global.acquire()
+            try:
+                result = await fn()
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                self.flood_waits += 1
+                delay = _retry_after_seconds(e)
+                bucket.block(delay)
+                if attempt >= MAX_RETRY_AFTER_ATTEMPTS:
+                    raise
+                logger.warning(f"Flood wait on chat {chat_id}: retrying in {delay:.0f}s")
+
+    async def submit(self, job: Callable[[], Awaitable[T]], priority: int = PRIORITY_SCHEDULED) -> T:
+        """Queue a job and wait for its result."""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((priority, next(self._seq), job, future))
+        return await future
+
+    async def send(self, chat_id: int, fn: Callable[[], Awaitable[T]], priority: int = PRIORITY_SCHEDULED) -> T:
+        """Queue a single Bot API request."""
+        return await self.submit(lambda: self.call(chat_id, fn), priority)
+
+    async def _run(self) -> None:
+        while True:
+            # Wait for capacity *before* dequeuing, so a higher-priority job
+            # queued meanwhile goes next instead of the one already taken
+            if self._last_bucket is not None:
+                await self._last_bucket.wait_ready()
+            _, _, job, future = await self._queue.get()
+            if future.cancelled():
+                continue
+            try:
+                result = await job()
+                if not future.cancelled():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "flood_waits": self.flood_waits,
+        }
+
+
+_engine: Optional[PublishEngine] = None
+
+
+def get_engine() -> PublishEngine:
+    """Process-wide publish engine (created on first use)."""
+    global _engine
+    if _engine is None:
+        _engine = PublishEngine(Config.CHANNEL_RATE_PER_MINUTE, Config.CHANNEL_BURST)
+    return _engine
+
+
+async def publish_case(
+    bot, payload: PollPayload, chat_id: int, priority: int = PRIORITY_SCHEDULED
+) -> Message:
+    """Send a rendered quiz (intro message + poll) as one uninterrupted job.
+    Validation is up to the caller: the scheduler rejects payloads failing
+    validate_payload(), manual /publicar sends as it always did (an
+    unmatched correct letter falls back to the first option)."""
+    engine = get_engine()
+
+    async def job() -> Message:
+        if payload.intro_text:
+            await engine.call(chat_id, lambda: bot.send_message(chat_id=chat_id, text=payload.intro_text))
+        return await engine.call(
+            chat_id,
+            lambda: bot.send_poll(
+                chat_id=chat_id,
+                question=payload.question,
+                options=payload.options,
+                type="quiz",
+                correct_option_id=payload.correct_index,
+                explanation=payload.explanation,
+                is_anonymous=True,
+                reply_markup=payload.reply_markup(),
+            ),
+        )
+
+    return await engine.submit(job, priority)
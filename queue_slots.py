@@ -0,0 +1,174 @@
+"""
+Auto-queue slot allocation.
+
+Queue slots are one per active day at the configured hour, following the
+latest pending queue entry. QueueSlotAllocator hands out N consecutive
+slots in one pass (settings + tail read once) and writes them with one
+bulk insert, under a lock so two quick 📥 Cola clicks never get the same
+slot. It also remembers the last slot it allocated (until that slot has
+passed), since a journaled insert may not be visible in the DB yet when the
+next allocation runs.
+
+Rebalancing recomputes every pending queue entry under the current
+settings, keeping their order: plan_rebalance() gives the diff to preview,
+rebalance() applies it with one bulk reschedule.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import pytz
+
+from config import Config
+from due_timers import deadline_of
+from supabase_client import queue_cursor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_HOUR = "07:00"
+DEFAULT_ACTIVE_DAYS = [1, 2, 3, 4, 5, 6]
+
+# Safety: max 2 weeks lookahead per slot
+MAX_LOOKAHEAD_DAYS = 14
+
+QUEUE_LOAD_PAGE_SIZE = 500
+
+
+def next_queue_slots(
+    count: int,
+    hour_str: str,
+    active_days: Iterable[int],
+    last_queued: Optional[datetime],
+    now: datetime,
+) -> List[datetime]:
+    """`count` consecutive slots (aware, in now's timezone).
+    1. Start the day AFTER last_queued, or today if before the hour (else tomorrow)
+    2. One slot per active day (isoweekday: 1=Mon, 7=Sun)
+    """
+    tz = now.tzinfo
+    hour, minute = map(int, hour_str.split(":"))
+    active_days = set(active_days)
+
+    if last_queued:
+        last_local = last_queued.astimezone(tz)
+        candidate = last_local.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(days=1)
+    else:
+        today_slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        candidate = today_slot if today_slot > now else today_slot + timedelta(days=1)
+
+    slots = []
+    for _ in range(count):
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if candidate.isoweekday() in active_days:
+                break
+            candidate += timedelta(days=1)
+        slots.append(_localize(candidate, tz))
+        candidate += timedelta(days=1)
+    return slots
+
+
+def _localize(dt: datetime, tz) -> datetime:
+    """Re-resolve the UTC offset after day arithmetic (DST-safe with pytz)."""
+    if hasattr(tz, "localize"):
+        return tz.localize(dt.replace(tzinfo=None))
+    return dt
+
+
+class SlotMove(NamedTuple):
+    """One pending queue entry in a rebalance plan."""
+    entry_id: str
+    vignette: str
+    old: datetime
+    new: datetime
+
+    @property
+    def changed(self) -> bool:
+        return self.old != self.new
+
+
+class QueueSlotAllocator:
+    """Serialized allocation + bulk insert of auto-queue entries."""
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = asyncio.Lock()
+        self._tail: Optional[datetime] = None
+        client.add_schedule_listener(self._on_schedule_change)
+
+    def _on_schedule_change(self, event: str, entry_id: str, scheduled_at=None):
+        # A cancelled or moved entry may have been the tail: trust the DB again
+        if event in ("cancelled", "rescheduled"):
+            self._tail = None
+
+    async def _queue_tail(self, now: datetime) -> Optional[datetime]:
+        if self._tail and self._tail <= now:
+            # Already published: the queue has drained past it
+            self._tail = None
+        last_queued = await self.client.get_last_queued_date()
+        if self._tail and (last_queued is None or self._tail > last_queued):
+            return self._tail
+        return last_queued
+
+    async def plan(self, count: int, now: Optional[datetime] = None) -> List[datetime]:
+        """Next `count` free slots (read-only; call under the lock to keep them)."""
+        hour_str = await self.client.get_setting("queue_default_hour", DEFAULT_QUEUE_HOUR)
+        active_days = await self.client.get_setting("queue_active_days", DEFAULT_ACTIVE_DAYS)
+        now = now or datetime.now(pytz.timezone(Config.TZ))
+        return next_queue_slots(count, hour_str, active_days, await self._queue_tail(now), now)
+
+    async def allocate(self, case_ids: Sequence[str], admin_user_id: int) -> List[Tuple[str, datetime]]:
+        """Queue the cases on consecutive slots. Returns (entry_id, slot)
+        pairs in case order, or [] if the insert failed."""
+        if not case_ids:
+            return []
+        async with self._lock:
+            slots = await self.plan(len(case_ids))
+            entry_ids = await self.client.schedule_cases_queue(list(zip(case_ids, slots)), admin_user_id)
+            if not entry_ids:
+                return []
+            self._tail = slots[-1]
+            return list(zip(entry_ids, slots))
+
+    async def _pending_queue_entries(self) -> List[Dict]:
+        """Every pending source='queue' post, in queue order."""
+        entries, after = [], None
+        while True:
+            page = await self.client.get_queue(limit=QUEUE_LOAD_PAGE_SIZE, after=after)
+            entries.extend(row for row in page if row.get("source") == "queue")
+            if len(page) < QUEUE_LOAD_PAGE_SIZE:
+                return entries
+            after = queue_cursor(page)
+
+    async def plan_rebalance(self, now: Optional[datetime] = None) -> List[SlotMove]:
+        """Where each pending queue entry would go under the current settings
+        (same order, consecutive slots from the next free one)."""
+        hour_str = await self.client.get_setting("queue_default_hour", DEFAULT_QUEUE_HOUR)
+        active_days = await self.client.get_setting("queue_active_days", DEFAULT_ACTIVE_DAYS)
+        tz = pytz.timezone(Config.TZ)
+        now = now or datetime.now(tz)
+        entries = await self._pending_queue_entries()
+        slots = next_queue_slots(len(entries), hour_str, active_days, None, now)
+        moves = []
+        for entry, slot in zip(entries, slots):
+            old = datetime.fromtimestamp(deadline_of(entry["scheduled_at"]), tz)
+            vignette = ((entry.get("cases") or {}).get("vignette") or "(sin viñeta)")
+            moves.append(SlotMove(entry["id"], vignette, old, slot))
+        return moves
+
+    async def rebalance(self, expected_ids: Sequence[str]) -> Optional[int]:
+        """Apply the current plan in one bulk reschedule. `expected_ids` are
+        the entry ids of the previewed plan: if the queue changed since, nothing
+        is applied and None is returned. Returns how many posts moved.
+        Raises RuntimeError if the backend failed to apply it."""
+        async with self._lock:
+            moves = await self.plan_rebalance()
+            if [move.entry_id for move in moves] != list(expected_ids):
+                return None
+            changes = [(move.entry_id, move.new) for move in moves if move.changed]
+            moved = await self.client.reschedule_posts(changes)
+            self._tail = None
+            if moved is None:
+                raise RuntimeError("reschedule_posts failed")
+            return len(moved)
@@ -0,0 +1,151 @@
+"""
+Resilient call layer for backend (Supabase) requests.
+
+- Jittered exponential retries, only for idempotent operations
+- Circuit breaker: after repeated transient failures every call fails fast
+  until a probe succeeds, so handlers never wait on a dead backend
+- Counters for retries, breaker trips and fast failures
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.3
+DEFAULT_MAX_DELAY = 3.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the breaker is open."""
+
+
+def is_transient(error: Exception) -> bool:
+    """True for failures worth retrying (network, timeouts, 5xx, 429)."""
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in (408, 429) or status >= 500
+    return False
+
+
+class CircuitBreaker:
+    """closed → open after N consecutive transient failures; after
+    reset_timeout one probe call is let through (half-open)."""
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def would_allow(self) -> bool:
+        """Whether allow() would let a call through now (no state change):
+        closed, half-open, or open past reset_timeout (a probe is due)."""
+        return self.state != "open" or time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Let one probe through (again, if a previous probe never reported back)
+            self.state = "half_open"
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit breaker closed: backend healthy again")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        if self.state == "half_open":
+            self._open()
+            return
+        self.failures += 1
+        if self.state == "closed" and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.failures = 0
+        self.trips += 1
+        logger.warning(f"Circuit breaker OPEN (trip #{self.trips}), failing fast for {self.reset_timeout:.0f}s")
+
+
+class ResilientCaller:
+    """Runs backend calls through retries + a shared circuit breaker."""
+
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retries = 0
+        self.fast_failures = 0
+
+    @property
+    def available(self) -> bool:
+        """False while the breaker is open (backend considered down) and its
+        probe is not due yet; True again once a probe call may go through."""
+        return self.breaker.would_allow()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform(0, min(max_delay, base * 2^attempt))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def call(self, name: str, fn: Callable[[], Awaitable[Any]], idempotent: bool = True) -> Any:
+        """Await fn(), retrying transient failures if idempotent.
+        Raises CircuitOpenError without calling fn while the breaker is open."""
+        if not self.breaker.allow():
+            self.fast_failures += 1
+            raise CircuitOpenError(f"{name}: backend unavailable (circuit open)")
+
+        attempts = self.max_attempts if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                result = await fn()
+            except Exception as e:
+                if not is_transient(e):
+                    # The backend answered (4xx etc.): it is up
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= attempts or self.breaker.state == "open":
+                    raise
+                self.retries += 1
+                delay = self._backoff(attempt)
+                logger.warning(f"{name} failed ({e!r}), retry {attempt}/{attempts - 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "retries": self.retries,
+            "fast_failures": self.fast_failures,
+        }
@@ -2,19 +2,34 @@
 ACAMEDICS Scheduler — Automatic publication of scheduled cases.
 
 Runs as an async background loop inside the bot process.
-- Polls Supabase every 30 seconds for due posts
+- Keeps pending posts in a timer heap and wakes exactly at the next
+  scheduled_at (fed by the client's schedule listeners)
+- Reconciles the heap with the DB every few minutes as a safety net
+- Claims due posts atomically with a lease (safe with several instances),
+  reclaims posts whose lease expired, and loads each case on publish
+- Renders and validates each poll PUBLISH_PREFETCH_SECONDS ahead, so only
+  the Telegram sends remain at the deadline (errors reach the admin early)
 - Uses asyncio.Lock to serialize publications (never 2 in parallel)
-- On startup, marks overdue posts as 'failed' (no auto-publish of past posts)
+- Catch-up: posts missed while offline are published late (one every
+  CATCHUP_SPACING_SECONDS, waited out before each claim) unless older than CATCHUP_MAX_LATENESS_SECONDS,
+  which are marked 'failed'; the admin gets a summary
 - Notifies admin on failures
+- Records publish latency / deadline lag / failures for the /slo report
 """
 
 import asyncio
 import logging
+import time
 from datetime import datetime
 
 import pytz
 
 from config import Config
+from display_numbers import case_display_num
+from due_timers import DueTimerHeap, deadline_of
+from metrics import scheduler_metrics
+from publisher import PRIORITY_SCHEDULED, PollPayload, build_poll_payload, publish_case, validate_payload
+from supabase_client import CLAIM_BATCH_SIZE, queue_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +40,21 @@ _publish_lock = asyncio.Lock()
 _bot_app = None
 _supabase = None
 
-POLL_INTERVAL_SECONDS = 30
+RETRY_DELAY_SECONDS = 10
+HEAP_LOAD_PAGE_SIZE = 500
+
+# Pending posts by deadline; _wakeup interrupts the sleep when it changes
+_timers = DueTimerHeap()
+_prefetch_timers = DueTimerHeap(lead_seconds=Config.PUBLISH_PREFETCH_SECONDS)
+_wakeup = asyncio.Event()
+
+# entry_id -> (case row it was built from, payload, validation errors);
+# (None, None, errors) when the case could not be loaded
+_prepared: dict = {}
+
+# Catch-up drain state: posts published late since the drain started
+_catchup_published: list = []
+_last_catchup_at = 0.0
 
 
 def init_scheduler(bot_app, supabase_client):
@@ -33,13 +62,55 @@ def init_scheduler(bot_app, supabase_client):
     global _bot_app, _supabase
     _bot_app = bot_app
     _supabase = supabase_client
+    _supabase.add_schedule_listener(_on_schedule_change)
     logger.info("Scheduler initialized")
 
 
+def _on_schedule_change(event: str, entry_id: str, scheduled_at=None):
+    """Keep the timer heap in sync with schedule_case / cancel_scheduled."""
+    if event in ("scheduled", "rescheduled") and scheduled_at is not None:
+        _timers.add(entry_id, scheduled_at)
+        _prefetch_timers.add(entry_id, scheduled_at)
+    elif event == "cancelled":
+        _timers.remove(entry_id)
+        _prefetch_timers.remove(entry_id)
+        _prepared.pop(entry_id, None)
+    _wakeup.set()
+
+
+async def _reload_timers() -> bool:
+    """Rebuild the heap from every pending post (ids + times only)."""
+    rows, after = [], None
+    while True:
+        page = await _supabase.get_queue(limit=HEAP_LOAD_PAGE_SIZE, after=after, columns="id,scheduled_at")
+        rows.extend(page)
+        if len(page) < HEAP_LOAD_PAGE_SIZE:
+            break
+        after = queue_cursor(page)
+    if not rows and not _supabase.available:
+        return False
+    _timers.rebuild(rows)
+    pending_ids = {row["id"] for row in rows}
+    for entry_id in set(_prepared) - pending_ids:
+        _prepared.pop(entry_id, None)
+    _prefetch_timers.rebuild(row for row in rows if row["id"] not in _prepared)
+    logger.info(f"Scheduler timers loaded ({len(_timers)} pending posts)")
+    return True
+
+
+def _format_slot(scheduled_at: str, tz) -> str:
+    try:
+        dt = datetime.fromisoformat(scheduled_at.replace("Z", "+00:00"))
+        return dt.astimezone(tz).strftime("%a %d %b %H:%M")
+    except Exception:
+        return (scheduled_at or "?")[:16]
+
+
 async def on_startup():
     """
     Called once after bot starts.
-    Marks overdue posts as 'failed' and notifies admin.
+    Fails posts too late to catch up, announces the catch-up of the rest
+    and notifies admin.
     """
     if not _supabase:
         return
@@ -47,199 +118,299 @@ async def on_startup():
     tz = pytz.timezone(Config.TZ)
     now = datetime.now(tz)
 
-    overdue = _supabase.mark_overdue_as_failed(now)
-    if overdue and _bot_app and Config.ADMIN_USER_IDS:
+    overdue = await _supabase.mark_overdue_as_failed(now, Config.CATCHUP_MAX_LATENESS_SECONDS)
+    late = await _supabase.get_due_posts(now)
+    if (overdue or late) and _bot_app and Config.ADMIN_USER_IDS:
         # Notify first admin
         admin_id = Config.ADMIN_USER_IDS[0]
-        lines = []
-        for post in overdue:
-            case_data = post.get("cases") or {}
-            vig = (case_data.get("vignette") or "???")[:60].replace("\n", " ")
-            scheduled = post.get("scheduled_at", "?")
-            # Parse and format the date nicely
-            try:
-                dt = datetime.fromisoformat(scheduled.replace("Z", "+00:00"))
-                dt_local = dt.astimezone(tz)
-                date_str = dt_local.strftime("%a %d %b %H:%M")
-            except Exception:
-                date_str = scheduled[:16]
-            lines.append(f"  • {date_str} — «{vig}...»")
-
-        msg = (
-            f"⚠️ <b>{len(overdue)} caso(s) no se publicaron</b> "
-            f"(bot offline):\n\n"
-            + "\n".join(lines)
-            + "\n\nPublícalos manualmente con /publicar o /caso."
-        )
+        parts = []
+        if overdue:
+            lines = []
+            for post in overdue:
+                case_data = post.get("cases") or {}
+                vig = (case_data.get("vignette") or "???")[:60].replace("\n", " ")
+                lines.append(f"  • {_format_slot(post.get('scheduled_at', '?'), tz)} — «{vig}...»")
+            parts.append(
+                f"⚠️ <b>{len(overdue)} caso(s) no se publicaron</b> "
+                f"(bot offline más de {Config.CATCHUP_MAX_LATENESS_SECONDS // 60} min):\n\n"
+                + "\n".join(lines)
+                + "\n\nPublícalos manualmente con /publicar o /caso."
+            )
+        if late:
+            lines = [f"  • {_format_slot(post['scheduled_at'], tz)}" for post in late]
+            parts.append(
+                f"⏳ <b>{len(late)} caso(s) atrasado(s) se publicarán ahora</b> "
+                f"(uno cada {Config.CATCHUP_SPACING_SECONDS} s):\n\n"
+                + "\n".join(lines)
+            )
         try:
             await _bot_app.bot.send_message(
-                chat_id=admin_id, text=msg, parse_mode="HTML"
+                chat_id=admin_id, text="\n\n".join(parts), parse_mode="HTML"
             )
         except Exception as e:
             logger.error(f"Could not notify admin about overdue posts: {e}")
 
-    # Also clean up any stuck 'publishing' entries (from crash during publish)
-    try:
-        result = (
-            _supabase.service_client.table("scheduled_posts")
-            .select("id")
-            .eq("status", "publishing")
-            .execute()
-        )
-        stuck = result.data or []
-        for post in stuck:
-            _supabase.mark_failed(post["id"], "Bot se reinició durante publicación")
-        if stuck:
-            logger.warning(f"Cleaned up {len(stuck)} stuck 'publishing' entries")
-    except Exception as e:
-        logger.error(f"Error cleaning up stuck entries: {e}")
+    # Clean up 'publishing' entries without a lease (older crash during publish);
+    # leased ones are reclaimed by the claim once their lease expires
+    stuck = await _supabase.fail_stuck_publishing("Bot se reinició durante publicación")
+    if stuck:
+        logger.warning(f"Cleaned up {len(stuck)} stuck 'publishing' entries")
 
 
-async def scheduler_loop():
+async def scheduler_loop(reconcile_seconds: int = None):
     """
-    Main scheduler loop. Runs forever, polling every 30 seconds.
+    Main scheduler loop. Sleeps until the earliest pending deadline (or a
+    schedule change), publishes what is due, and reconciles with the DB
+    every `reconcile_seconds` (default SCHEDULER_RECONCILE_SECONDS; shorter
+    when running as its own process, since schedule changes made by the
+    updates process only reach the heap through reconciliation).
     """
     logger.info("Scheduler loop started")
+    reconcile_seconds = reconcile_seconds or Config.SCHEDULER_RECONCILE_SECONDS
+
+    await _reload_timers()
+    next_reconcile = time.monotonic() + reconcile_seconds
 
     while True:
         try:
-            await asyncio.sleep(POLL_INTERVAL_SECONDS)
-            await _check_and_publish()
+            delays = [
+                max(0.0, next_reconcile - time.monotonic()),
+                _timers.seconds_until_next(),
+                _prefetch_timers.seconds_until_next(),
+            ]
+            timeout = min(d for d in delays if d is not None)
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+
+            if time.monotonic() >= next_reconcile:
+                await _reload_timers()
+                # Also picks up posts whose publish lease expired
+                await _check_and_publish()
+                next_reconcile = time.monotonic() + reconcile_seconds
+
+            await _prefetch_due()
+
+            next_deadline = _timers.next_deadline()
+            if next_deadline is None or next_deadline > time.time():
+                continue
+
+            cycle_start = time.time()
+            if await _check_and_publish():
+                _timers.pop_due(cycle_start)
+            else:
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
         except asyncio.CancelledError:
             logger.info("Scheduler loop cancelled")
             break
         except Exception as e:
             logger.error(f"Scheduler loop error: {e}", exc_info=True)
             # Don't crash the loop on errors
-            await asyncio.sleep(10)
+            await asyncio.sleep(RETRY_DELAY_SECONDS)
+
+
+async def _prefetch_due():
+    """Render + validate the polls of posts entering the prefetch window."""
+    for entry_id in _prefetch_timers.pop_due():
+        if entry_id in _prepared:
+            continue
+        try:
+            post = await _supabase.get_scheduled_post(entry_id, columns="id,case_id,scheduled_at,status")
+            if not post or post.get("status") != "pending":
+                continue
+            case_data = await _supabase.get_case(post["case_id"], fresh=_case_reads_fresh())
+            if not case_data:
+                # Recorded so later reconciles don't warn again
+                errors = ["Caso no encontrado en la DB"]
+                _prepared[entry_id] = (None, None, errors)
+                await _notify_admin_prefetch_problem(post, errors)
+                continue
+            payload = build_poll_payload(post["case_id"], case_data, _bot_app.bot.username)
+            errors = validate_payload(payload)
+            _prepared[entry_id] = (case_data, payload, errors)
+            if errors:
+                await _notify_admin_prefetch_problem(post, errors)
+            else:
+                logger.info(f"Poll for scheduled post {entry_id} prepared")
+        except Exception as e:
+            logger.error(f"Error preparing scheduled post {entry_id}: {e}")
+
+
+def _case_reads_fresh() -> bool:
+    """With split roles, edits and manual /publicar happen in the updates
+    process: this process' case cache may be stale, so read the DB."""
+    return Config.BOT_ROLE != "all"
+
 
+def _payload_for(entry_id: str, case_id: str, case_data: dict) -> PollPayload:
+    """Prepared payload if the case is unchanged since prefetch, else build it now."""
+    prepared = _prepared.pop(entry_id, None)
+    if prepared and prepared[0] == case_data:
+        return prepared[1]
+    return build_poll_payload(case_id, case_data, _bot_app.bot.username)
 
-async def _check_and_publish():
-    """Check for due posts and publish them one by one."""
+
+async def _check_and_publish() -> bool:
+    """Claim due posts one at a time (each under its own lease) and publish them.
+    Returns False if the cycle could not run (posts stay pending)."""
     if not _supabase or not _bot_app:
-        return
+        return False
+
+    # Backend down (circuit open, probe not due yet): keep posts pending and retry shortly
+    if not _supabase.available:
+        logger.warning("Supabase unavailable, skipping scheduler cycle")
+        return False
 
     tz = pytz.timezone(Config.TZ)
-    now = datetime.now(tz)
 
-    due_posts = _supabase.get_due_posts(now)
-    if not due_posts:
+    # Only rows this instance won come back (ids + times only). One post per
+    # claim, each with a fresh lease: sends wait on the channel rate limit, so
+    # a batch could outlive its lease and be reclaimed by another instance.
+    while True:
+        if _is_catching_up():
+            # Pace before claiming, so the wait never eats into the lease
+            await _pace_catchup()
+        claimed = await _supabase.claim_due_posts(
+            Config.INSTANCE_ID, datetime.now(tz), Config.PUBLISH_LEASE_SECONDS, CLAIM_BATCH_SIZE
+        )
+        if claimed is None:
+            # Claim failed: keep the due timers and retry after a short delay
+            return False
+        if not claimed:
+            await _finish_catchup()
+            return _supabase.available
+
+        claimed_at = time.monotonic()
+        logger.info(f"Claimed {len(claimed)} due post(s) to publish")
+
+        for post in claimed:
+            # No longer pending: keeps _is_catching_up() current mid-drain
+            _timers.remove(post["id"])
+            if post.get("reclaimed"):
+                logger.warning(f"Reclaimed post {post['id']} after its publish lease expired")
+            lateness = time.time() - deadline_of(post["scheduled_at"])
+            if lateness > Config.CATCHUP_MAX_LATENESS_SECONDS:
+                scheduler_metrics.record_failure("too_late")
+                await _supabase.mark_failed(
+                    post["id"], f"Demasiado tarde para publicar ({int(lateness // 60)} min)", owner=Config.INSTANCE_ID
+                )
+                await _notify_admin_failure(post["id"], f"Se pasó la hora por {int(lateness // 60)} min")
+                continue
+            async with _publish_lock:
+                published = await _publish_single(
+                    post, notify=lateness <= Config.CATCHUP_GRACE_SECONDS, claimed_at=claimed_at
+                )
+            if published and lateness > Config.CATCHUP_GRACE_SECONDS:
+                _catchup_published.append(post)
+
+        if len(claimed) < CLAIM_BATCH_SIZE:
+            await _finish_catchup()
+            return True
+
+
+def _is_catching_up() -> bool:
+    """True while the oldest pending deadline is past the grace window."""
+    oldest = _timers.next_deadline()
+    return oldest is not None and time.time() - oldest > Config.CATCHUP_GRACE_SECONDS
+
+
+async def _pace_catchup():
+    """Space late publications so the channel is not flooded."""
+    global _last_catchup_at
+    wait = _last_catchup_at + Config.CATCHUP_SPACING_SECONDS - time.monotonic()
+    if _last_catchup_at and wait > 0:
+        await asyncio.sleep(wait)
+    _last_catchup_at = time.monotonic()
+
+
+async def _finish_catchup():
+    """Send the admin one summary once the late posts are drained."""
+    global _last_catchup_at
+    if not _catchup_published:
         return
-
-    logger.info(f"Found {len(due_posts)} due post(s) to publish")
-
-    for post in due_posts:
-        async with _publish_lock:
-            await _publish_single(post)
+    tz = pytz.timezone(Config.TZ)
+    lines = [f"  • {_format_slot(post['scheduled_at'], tz)}" for post in _catchup_published]
+    _catchup_published.clear()
+    _last_catchup_at = 0.0
+    if not _bot_app or not Config.ADMIN_USER_IDS:
+        return
+    try:
+        await _bot_app.bot.send_message(
+            chat_id=Config.ADMIN_USER_IDS[0],
+            text=f"✅ <b>Recuperación completada</b>: {len(lines)} caso(s) publicados con retraso\n\n" + "\n".join(lines),
+            parse_mode="HTML",
+        )
+    except Exception as e:
+        logger.error(f"Could not send catch-up summary: {e}")
 
 
-async def _publish_single(post: dict):
+async def _publish_single(post: dict, notify: bool = True, claimed_at: float = None) -> bool:
     """
-    Publish a single scheduled post.
-    Reuses the same logic as manual /publicar.
+    Publish a single scheduled post, with the poll prepared by _prefetch_due
+    when the case has not changed since. Returns True if it went out.
+    `notify=False` skips the per-post success message (catch-up summary instead).
+    `claimed_at` (time.monotonic() of the claim) feeds the SLO metrics.
     """
     entry_id = post["id"]
     case_id = post["case_id"]
-    case_data = post.get("cases")
+    case_data = await _supabase.get_case(case_id, fresh=_case_reads_fresh())
 
     if not case_data:
-        _supabase.mark_failed(entry_id, "Case data not found in DB")
+        scheduler_metrics.record_failure("case_not_found")
+        await _supabase.mark_failed(entry_id, "Case data not found in DB", owner=Config.INSTANCE_ID)
         await _notify_admin_failure(entry_id, "Caso no encontrado en la DB")
-        return
+        return False
 
     # Skip if case was already published manually
     if case_data.get("published"):
         logger.info(f"Skipping {entry_id}: case {case_id} already published manually")
-        _supabase.service_client.table("scheduled_posts").update({
-            "status": "done",
-            "error_message": "Already published manually",
-        }).eq("id", entry_id).execute()
-        return
+        await _supabase.mark_done(entry_id, None, note="Already published manually", owner=Config.INSTANCE_ID)
+        return False
 
-    # Mark as publishing (lock in DB)
-    if not _supabase.mark_publishing(entry_id):
-        return
+    payload = _payload_for(entry_id, case_id, case_data)
+    errors = validate_payload(payload)
+    if errors:
+        scheduler_metrics.record_failure("invalid_payload")
+        await _supabase.mark_failed(entry_id, "; ".join(errors), owner=Config.INSTANCE_ID)
+        await _notify_admin_failure(entry_id, "; ".join(errors))
+        return False
 
     try:
-        bot = _bot_app.bot
-
-        # ── Prepare poll data (same logic as _do_publicar in main.py) ──
-        vignette = case_data["vignette"]
-        options = case_data.get("options", [])
-
-        poll_question = vignette
-        if len(vignette) > 290:
-            await bot.send_message(
-                chat_id=Config.PUBLIC_CHANNEL_ID,
-                text=vignette,
-            )
-            poll_question = "¿Cuál es la respuesta correcta?"
-
-        option_texts = []
-        for opt in options:
-            full = f"{opt['letter']}. {opt['text']}"
-            if len(full) > 100:
-                full = full[:97] + "..."
-            option_texts.append(full)
-
-        correct_letter = case_data["correct_letter"]
-        correct_index = next(
-            (i for i, opt in enumerate(options) if opt["letter"] == correct_letter),
-            0,
-        )
-
-        # Explanation tooltip
-        tip_text = case_data.get("tip", "")
-        explanation = f"💡 {tip_text[:195]}" if tip_text else (case_data.get("justification") or "")[:200]
-
-        # Mini App button
-        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-
-        miniapp_short_name = Config.MINIAPP_SHORT_NAME
-        keyboard = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text="VER JUSTIFICACIÓN 💬",
-                        url=f"https://t.me/{bot.username}/{miniapp_short_name}?startapp={case_id}",
-                    )
-                ]
-            ]
-        )
-
-        # Send poll to channel
-        poll_msg = await bot.send_poll(
-            chat_id=Config.PUBLIC_CHANNEL_ID,
-            question=poll_question,
-            options=option_texts,
-            type="quiz",
-            correct_option_id=correct_index,
-            explanation=explanation,
-            is_anonymous=True,
-            reply_markup=keyboard,
+        send_started = time.monotonic()
+        poll_msg = await publish_case(_bot_app.bot, payload, Config.PUBLIC_CHANNEL_ID, PRIORITY_SCHEDULED)
+        sent_at = time.monotonic()
+        scheduler_metrics.record_published(
+            claim_to_publish=sent_at - (claimed_at if claimed_at is not None else send_started),
+            deadline_lag=time.time() - deadline_of(post["scheduled_at"]),
+            send_duration=sent_at - send_started,
         )
 
         logger.info(f"Scheduled post {entry_id} published: poll msg {poll_msg.message_id}")
 
         # Update case as published
-        from main import case_display_num
-        _supabase.update_case(case_id, {
+        await _supabase.update_case(case_id, {
             "telegram_message_id": poll_msg.message_id,
             "published": True,
             "display_number": case_display_num(case_id),
         })
 
         # Mark schedule entry as done
-        _supabase.mark_done(entry_id, poll_msg.message_id)
+        await _supabase.mark_done(entry_id, poll_msg.message_id, owner=Config.INSTANCE_ID)
 
         # Notify admin
-        await _notify_admin_success(case_id, post.get("scheduled_at", ""))
+        if notify:
+            await _notify_admin_success(case_id, post.get("scheduled_at", ""))
+        return True
 
     except Exception as e:
         error_msg = str(e)[:500]
+        scheduler_metrics.record_failure(f"publish:{type(e).__name__}")
         logger.error(f"Failed to publish scheduled post {entry_id}: {e}")
-        _supabase.mark_failed(entry_id, error_msg)
+        await _supabase.mark_failed(entry_id, error_msg, owner=Config.INSTANCE_ID)
         await _notify_admin_failure(entry_id, error_msg)
+        return False
 
 
 async def _notify_admin_success(case_id: str, scheduled_at: str):
@@ -263,6 +434,30 @@ async def _notify_admin_success(case_id: str, scheduled_at: str):
         logger.error(f"Could not send success notification: {e}")
 
 
+async def _notify_admin_prefetch_problem(post: dict, errors: list):
+    """Warn the first admin that a scheduled case will fail at its slot."""
+    if not _bot_app or not Config.ADMIN_USER_IDS:
+        return
+    try:
+        tz = pytz.timezone(Config.TZ)
+        try:
+            dt = datetime.fromisoformat(post["scheduled_at"].replace("Z", "+00:00"))
+            time_str = dt.astimezone(tz).strftime("%d/%m %H:%M")
+        except Exception:
+            time_str = "?"
+        await _bot_app.bot.send_message(
+            chat_id=Config.ADMIN_USER_IDS[0],
+            text=(
+                f"⚠️ <b>El caso programado para {time_str} no se podrá publicar</b>\n\n"
+                + "\n".join(f"• {e}" for e in errors)
+                + "\n\nCorrígelo o desprográmalo con /cola."
+            ),
+            parse_mode="HTML",
+        )
+    except Exception as e:
+        logger.error(f"Could not send prefetch warning: {e}")
+
+
 async def _notify_admin_failure(entry_id: str, error_msg: str):
     """Send a failure notification to the first admin."""
     if not _bot_app or not Config.ADMIN_USER_IDS:
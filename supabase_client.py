@@ -1,16 +1,99 @@
 """
 Supabase client wrapper for Medical Clinical Cases Telegram Bot.
 Handles all database operations and file storage.
+
+SupabaseClient is the original synchronous wrapper (supabase-py).
+AsyncSupabaseClient exposes the same surface as coroutines and is what the
+bot uses: it talks to PostgREST/Storage over one pooled keep-alive
+httpx.AsyncClient, so database latency never blocks the event loop.
 """
 
+import asyncio
 import logging
+import mimetypes
 import uuid
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Tuple, Callable, Union
+
+import httpx
 from supabase import create_client, Client
 
+from case_cache import CaseCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from case_writes import CaseWriteBuffer, DEFAULT_DEBOUNCE_SECONDS
+from display_numbers import DisplayNumberIndex, case_display_num
+from resilience import CircuitOpenError, ResilientCaller, is_transient
+from write_journal import WriteJournal
+
 logger = logging.getLogger(__name__)
 
+# HTTP pool shared by the anon and service keys
+HTTP_TIMEOUT_SECONDS = 15.0
+HTTP_CONNECT_TIMEOUT_SECONDS = 5.0
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60.0
+
+SETTINGS_REFRESH_SECONDS = 300
+
+# Per-operation timeouts (seconds)
+READ_TIMEOUT_SECONDS = 5.0
+WRITE_TIMEOUT_SECONDS = 10.0
+UPLOAD_TIMEOUT_SECONDS = 30.0
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PATCH", "DELETE")
+
+JOURNAL_DRAIN_IDLE_SECONDS = 5.0
+JOURNAL_DRAIN_RETRY_SECONDS = 10.0
+
+IMAGES_BUCKET = "justification-images"
+
+# Projections / page sizes for scheduled_posts reads (keyset on scheduled_at,id)
+QUEUE_PAGE_SIZE = 10
+DUE_POSTS_BATCH = 50
+QUEUE_COLUMNS = "id,case_id,scheduled_at,source,cases(vignette)"
+DUE_POST_COLUMNS = "id,case_id,scheduled_at"
+SCHEDULED_POST_COLUMNS = "id,case_id,scheduled_at,status,source"
+
+# Publish claims: leases (migrations/003) let several instances share the queue.
+# One post per claim, so every send runs under a lease taken just before it
+CLAIM_BATCH_SIZE = 1
+DEFAULT_LEASE_SECONDS = 120
+
+# Media jobs (split "media" role, migrations/005)
+MEDIA_CLAIM_BATCH_SIZE = 3
+MEDIA_LEASE_SECONDS = 120
+
+# Page size of full-table scans (at or below PostgREST's default max-rows)
+FULL_SCAN_PAGE_SIZE = 1000
+
+# (scheduled_at, id) of the last row of the previous page
+QueueCursor = Tuple[str, str]
+
+
+def queue_cursor(rows: List[Dict[str, Any]]) -> Optional[QueueCursor]:
+    """Keyset cursor pointing after the last row of a page."""
+    if not rows:
+        return None
+    return rows[-1]["scheduled_at"], rows[-1]["id"]
+
+
+def _keyset_filter(after: QueueCursor) -> str:
+    """PostgREST `or` filter for rows strictly after (scheduled_at, id)."""
+    scheduled_at, entry_id = after
+    return f'(scheduled_at.gt."{scheduled_at}",and(scheduled_at.eq."{scheduled_at}",id.gt.{entry_id}))'
+
+
+def _is_missing_rpc(error: Exception) -> bool:
+    """True when PostgREST reports that the called function does not exist
+    (404 / PGRST202), i.e. its migration was not applied."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    if error.response.status_code == 404:
+        return True
+    try:
+        return error.response.json().get("code") == "PGRST202"
+    except Exception:
+        return False
+
 
 class SupabaseClient:
     """Wrapper around Supabase client for database and storage operations."""
@@ -80,7 +163,7 @@ class SupabaseClient:
         """Upload an image to Supabase storage. Returns public URL."""
         try:
             unique_filename = f"{uuid.uuid4()}_{filename}"
-            bucket_name = "justification-images"
+            bucket_name = IMAGES_BUCKET
             self.service_client.storage.from_(bucket_name).upload(unique_filename, file_bytes)
             public_url = self.client.storage.from_(bucket_name).get_public_url(unique_filename)
             logger.info(f"Image uploaded: {unique_filename}")
@@ -364,6 +447,1129 @@ class SupabaseClient:
             return None
 
 
+class ScheduleNotifier:
+    """Lets the scheduler follow scheduled_posts changes made through this
+    client. Listeners are called as listener(event, entry_id, scheduled_at)
+    with event "scheduled", "rescheduled" (new scheduled_at) or "cancelled"."""
+
+    schedule_listeners: List[Callable[[str, str, Optional[datetime]], None]]
+
+    def add_schedule_listener(self, listener: Callable[[str, str, Optional[datetime]], None]) -> None:
+        self.schedule_listeners.append(listener)
+
+    def _notify_schedule(self, event: str, entry_id: str, scheduled_at: Optional[datetime] = None) -> None:
+        for listener in self.schedule_listeners:
+            try:
+                listener(event, entry_id, scheduled_at)
+            except Exception as e:
+                logger.error(f"Schedule listener failed on {event} {entry_id}: {e}")
+
+
+class AsyncSupabaseClient(ScheduleNotifier):
+    """Asyncio counterpart of SupabaseClient with the same method surface.
+
+    Every call goes through one shared httpx.AsyncClient (pooled, keep-alive)
+    straight to PostgREST and Storage; only the auth headers differ between
+    the anon and the service key. Case rows are served from a read-through
+    CaseCache that every case write refreshes or invalidates.
+
+    Requests run through a ResilientCaller: per-operation timeouts, jittered
+    retries for idempotent operations (inserts are made idempotent with
+    on_conflict=id) and a circuit breaker that fails fast during outages.
+    Public methods keep swallowing errors and returning None/False/[].
+
+    With a WriteJournal, fire-and-forget mutations the backend cannot take
+    (outage, circuit open) are recorded locally and replayed in order by
+    drain_journal_loop(); otherwise they go straight to the backend.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        service_key: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        case_cache_size: int = DEFAULT_MAX_ENTRIES,
+        case_cache_ttl: float = DEFAULT_TTL_SECONDS,
+        resilience: Optional[ResilientCaller] = None,
+        write_debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        journal: Optional[WriteJournal] = None,
+    ):
+        self.url = supabase_url.rstrip("/")
+        self.key = supabase_key
+        self.service_key = service_key
+        self.rest_url = f"{self.url}/rest/v1"
+        self.storage_url = f"{self.url}/storage/v1"
+        self.http: httpx.AsyncClient = http_client or httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        self.resilience = resilience or ResilientCaller()
+        self.case_cache = CaseCache(case_cache_size, case_cache_ttl)
+        self.display_index = DisplayNumberIndex()
+        self.case_writes = CaseWriteBuffer(self._patch_case, write_debounce)
+        self.journal = journal
+        self.schedule_listeners = []
+        self._journal_wakeup = asyncio.Event()
+        # Drainer and inline drains (from _mutate) replay one at a time
+        self._journal_drain_lock = asyncio.Lock()
+        # bot_settings snapshot (key -> value); None until first load
+        self._settings: Optional[Dict[str, Any]] = None
+        logger.info("Async Supabase client initialized")
+
+    async def close(self) -> None:
+        """Close the shared HTTP pool (and the journal)."""
+        await self.http.aclose()
+        if self.journal:
+            self.journal.close()
+
+    # ═══════════════════════════════════════════
+    # LOW-LEVEL HTTP
+    # ═══════════════════════════════════════════
+
+    def _headers(self, service: bool, prefer: Optional[str] = None) -> Dict[str, str]:
+        key = self.service_key if service else self.key
+        headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        if prefer:
+            headers["Prefer"] = prefer
+        return headers
+
+    @property
+    def available(self) -> bool:
+        """False while the circuit breaker is open (backend down) and no
+        half-open probe is due yet."""
+        return self.resilience.available
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Retry / circuit-breaker counters."""
+        return self.resilience.stats()
+
+    async def _rest(
+        self,
+        method: str,
+        table: str,
+        params=None,
+        json=None,
+        service: bool = True,
+        prefer: Optional[str] = None,
+        timeout: Optional[float] = None,
+        idempotent: Optional[bool] = None,
+    ) -> httpx.Response:
+        """Run one PostgREST request through the resilience layer.
+        Raises on HTTP errors and CircuitOpenError while the backend is down."""
+        if timeout is None:
+            timeout = READ_TIMEOUT_SECONDS if method in ("GET", "HEAD") else WRITE_TIMEOUT_SECONDS
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        async def send() -> httpx.Response:
+            response = await self.http.request(
+                method,
+                f"{self.rest_url}/{table}",
+                params=params,
+                json=json,
+                headers=self._headers(service, prefer),
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            return response
+
+        return await self.resilience.call(f"{method} {table}", send, idempotent=idempotent)
+
+    async def _insert(self, table: str, row: Union[Dict[str, Any], List[Dict[str, Any]]]) -> None:
+        """Insert a row (or a list of rows, as one bulk request) with
+        client-generated ids. Duplicates are ignored, which makes the insert
+        safe to retry (and to replay)."""
+        await self._mutate(
+            "POST",
+            table,
+            params={"on_conflict": "id"},
+            json=row,
+            prefer="resolution=ignore-duplicates,return=minimal",
+        )
+
+    async def _mutate(
+        self,
+        method: str,
+        table: str,
+        params: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        prefer: Optional[str] = "return=minimal",
+    ) -> None:
+        """Run an idempotent fire-and-forget mutation, raising on failure.
+        With a journal, a mutation the backend cannot take right now (circuit
+        open, transient error) is recorded locally and applied by the drainer
+        instead; while entries are pending, new mutations queue behind them
+        so they never overtake (and get clobbered by) an older replay."""
+        if self.journal is None:
+            await self._rest(method, table, params=params, json=json, prefer=prefer, idempotent=True)
+            return
+        if self.journal.pending_count() and self.available:
+            await self.drain_journal()
+        if not self.journal.pending_count() and self.available:
+            try:
+                await self._rest(method, table, params=params, json=json, prefer=prefer, idempotent=True)
+                return
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenError) or is_transient(e)):
+                    raise
+                logger.warning(f"{method} {table} failed ({e!r}), journaled for replay")
+        self.journal.append(
+            {"method": method, "table": table, "params": params, "json": json, "prefer": prefer}
+        )
+        self._journal_wakeup.set()
+
+    # ═══════════════════════════════════════════
+    # WRITE-AHEAD JOURNAL
+    # ═══════════════════════════════════════════
+
+    async def drain_journal(self) -> int:
+        """Replay journaled mutations in order until the journal is empty or
+        the backend fails. Returns how many entries were applied."""
+        if self.journal is None:
+            return 0
+        async with self._journal_drain_lock:
+            return await self._drain_journal_locked()
+
+    async def _drain_journal_locked(self) -> int:
+        applied = 0
+        while True:
+            entries = self.journal.pending()
+            if not entries:
+                return applied
+            for seq, key, op in entries:
+                try:
+                    await self._rest(
+                        op["method"],
+                        op["table"],
+                        params=op.get("params"),
+                        json=op.get("json"),
+                        prefer=op.get("prefer"),
+                        idempotent=True,
+                    )
+                except Exception as e:
+                    if isinstance(e, CircuitOpenError) or is_transient(e):
+                        # Backend unhealthy: keep order, try again later
+                        self.journal.record_failure(seq, repr(e))
+                        return applied
+                    # Rejected by the backend: park it so it does not block the queue
+                    logger.error(f"Journal entry {key} rejected, parked as dead: {e}")
+                    self.journal.record_failure(seq, repr(e), dead=True)
+                    continue
+                self.journal.ack(seq)
+                applied += 1
+
+    async def drain_journal_loop(self) -> None:
+        """Background drainer: replay as soon as something is journaled,
+        back off while the backend is down."""
+        if self.journal is None:
+            return
+        logger.info("Write journal drainer started")
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._journal_wakeup.wait(), JOURNAL_DRAIN_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._journal_wakeup.clear()
+                applied = await self.drain_journal()
+                if applied:
+                    logger.info(f"Write journal: replayed {applied} entries")
+                if self.journal.pending_count():
+                    await asyncio.sleep(JOURNAL_DRAIN_RETRY_SECONDS)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Write journal drainer error: {e}", exc_info=True)
+                await asyncio.sleep(JOURNAL_DRAIN_RETRY_SECONDS)
+
+    def journal_stats(self) -> Optional[Dict[str, Any]]:
+        """Pending/dead/replayed counters, or None when the journal is off."""
+        return self.journal.stats() if self.journal else None
+
+    async def _select(self, table: str, params, service: bool = True) -> List[Dict[str, Any]]:
+        response = await self._rest("GET", table, params=params, service=service)
+        return response.json() or []
+
+    # ═══════════════════════════════════════════
+    # CASES TABLE
+    # ═══════════════════════════════════════════
+
+    async def save_case(self, parsed_case: Dict[str, Any]) -> Optional[str]:
+        """Save a parsed case to the database. Returns UUID."""
+        try:
+            case_uuid = str(uuid.uuid4())
+            case_data = {
+                "id": case_uuid,
+                "vignette": parsed_case.get("vignette", ""),
+                "options": [
+                    {"letter": opt.get("letter", ""), "text": opt.get("text", "")}
+                    for opt in parsed_case.get("options", [])
+                ],
+                "correct_letter": parsed_case.get("correct_letter", ""),
+                "correct_text": parsed_case.get("correct_text", ""),
+                "justification": parsed_case.get("justification", ""),
+                "tip": parsed_case.get("tip", ""),
+                "bibliography": parsed_case.get("bibliography", []),
+                "images": parsed_case.get("images", []),
+                "published": False,
+                "telegram_message_id": None,
+            }
+            await self._insert("cases", case_data)
+            self.case_cache.put(case_data)
+            self.case_writes.track(case_data)
+            logger.info(f"Case saved with UUID: {case_uuid}")
+            return case_uuid
+        except Exception as e:
+            logger.error(f"Error saving case to database: {e}")
+            return None
+
+    async def get_case(self, case_uuid: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Retrieve a case (served from the case cache when possible).
+        `fresh` skips the cache, for callers that must see writes made by
+        another process (the split scheduler role)."""
+        cached = None if fresh else self.case_cache.get(case_uuid)
+        if cached is not None:
+            return cached
+        try:
+            rows = await self._select(
+                "cases", {"select": "*", "id": f"eq.{case_uuid}"}, service=False
+            )
+            if rows:
+                self.case_cache.put(rows[0])
+                return rows[0]
+            logger.warning(f"Case not found: {case_uuid}")
+            return None
+        except Exception as e:
+            logger.error(f"Error retrieving case: {e}")
+            return None
+
+    async def update_case(self, case_uuid: str, data: Dict[str, Any]) -> bool:
+        """Update a case in the database.
+        Buffered writes for the same case are flushed first to keep order."""
+        if self.case_writes.has_pending(case_uuid):
+            await self.case_writes.flush(case_uuid)
+        ok = await self._patch_case(case_uuid, data)
+        if ok:
+            self.case_writes.note_written(case_uuid, data)
+        return ok
+
+    async def _patch_case(self, case_uuid: str, data: Dict[str, Any]) -> bool:
+        """PATCH the given columns of one case and refresh local state."""
+        try:
+            await self._mutate("PATCH", "cases", params={"id": f"eq.{case_uuid}"}, json=data)
+            self.case_cache.merge(case_uuid, data)
+            if data.get("display_number") is not None and data.get("published", True):
+                self.display_index.add(case_uuid, data["display_number"])
+            logger.info(f"Case updated: {case_uuid}")
+            return True
+        except Exception as e:
+            self.case_cache.invalidate(case_uuid)
+            logger.error(f"Error updating case: {e}")
+            return False
+
+    # ── Write-behind for draft cases ──
+
+    def queue_case_update(self, case_uuid: str, data: Dict[str, Any]) -> None:
+        """Queue the latest state of a draft case. Debounced and sent later
+        as one PATCH with only the columns that changed."""
+        self.case_writes.queue(case_uuid, data)
+
+    async def flush_case_writes(self, case_uuid: Optional[str] = None) -> bool:
+        """Barrier: write buffered updates now (one case, or all)."""
+        if case_uuid is None:
+            return await self.case_writes.flush_all()
+        return await self.case_writes.flush(case_uuid)
+
+    async def sync_case(self, case_uuid: str, data: Dict[str, Any]) -> bool:
+        """Persist the current state of a draft case, sending only changed columns."""
+        self.case_writes.queue(case_uuid, data)
+        return await self.case_writes.flush(case_uuid)
+
+    async def upload_image(self, file_bytes: bytes, filename: str) -> Optional[str]:
+        """Upload an image to Supabase storage. Returns public URL."""
+        try:
+            unique_filename = f"{uuid.uuid4()}_{filename}"
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            headers = self._headers(service=True)
+            headers["Content-Type"] = content_type
+            # Unique name + upsert: a retried upload just overwrites itself
+            headers["x-upsert"] = "true"
+
+            async def send() -> httpx.Response:
+                response = await self.http.post(
+                    f"{self.storage_url}/object/{IMAGES_BUCKET}/{unique_filename}",
+                    content=file_bytes,
+                    headers=headers,
+                    timeout=UPLOAD_TIMEOUT_SECONDS,
+                )
+                response.raise_for_status()
+                return response
+
+            await self.resilience.call("upload image", send, idempotent=True)
+            public_url = f"{self.storage_url}/object/public/{IMAGES_BUCKET}/{unique_filename}"
+            logger.info(f"Image uploaded: {unique_filename}")
+            return public_url
+        except Exception as e:
+            logger.error(f"Error uploading image: {e}")
+            return None
+
+    async def get_case_images(self, case_uuid: str) -> List[str]:
+        """Get all image URLs for a case."""
+        try:
+            case = await self.get_case(case_uuid)
+            if case and "images" in case:
+                return case["images"]
+            return []
+        except Exception as e:
+            logger.error(f"Error retrieving case images: {e}")
+            return []
+
+    async def delete_case(self, case_uuid: str) -> bool:
+        """Delete a case from the database."""
+        self.case_cache.invalidate(case_uuid)
+        self.display_index.remove(case_uuid)
+        self.case_writes.discard(case_uuid)
+        try:
+            await self._mutate("DELETE", "cases", params={"id": f"eq.{case_uuid}"})
+            logger.info(f"Case deleted: {case_uuid}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting case: {e}")
+            return False
+
+    async def _rpc(self, function: str, args: Optional[Dict[str, Any]] = None, idempotent: bool = False) -> Any:
+        """Call a Postgres function exposed by PostgREST (service key)."""
+        response = await self._rest("POST", f"rpc/{function}", json=args or {}, idempotent=idempotent)
+        return response.json()
+
+    async def get_next_case_number(self) -> int:
+        """Get the next case number for display.
+        Uses the case_number_seq sequence (migrations/001); falls back to
+        counting rows only if the RPC is not installed. Transient errors are
+        retried (a retry at most skips a number) and then raised: a count
+        taken during an outage could hand out a duplicate number."""
+        try:
+            return int(await self._rpc("next_case_number", idempotent=True))
+        except Exception as e:
+            if not _is_missing_rpc(e):
+                logger.error(f"Error getting next case number: {e}")
+                raise
+            logger.warning(f"next_case_number RPC not installed, counting rows: {e}")
+        response = await self._rest(
+            "HEAD", "cases", params={"select": "id"}, service=False, prefer="count=exact"
+        )
+        content_range = response.headers.get("content-range", "")
+        total = content_range.rsplit("/", 1)[-1]
+        if total.isdigit():
+            return int(total) + 1
+        return 1
+
+    # ── Display numbers (#1000-#3000 shown in the Mini App) ──
+
+    async def _select_all(self, table: str, params: Dict[str, str], service: bool = True) -> List[Dict[str, Any]]:
+        """Every row matching `params`, keyset-paginated on id so PostgREST's
+        max-rows cap never truncates the result (`select` must include id)."""
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            page_params = dict(params, order="id.asc", limit=str(FULL_SCAN_PAGE_SIZE))
+            if last_id:
+                page_params["id"] = f"gt.{last_id}"
+            page = await self._select(table, page_params, service=service)
+            if not page:
+                return rows
+            rows.extend(page)
+            last_id = page[-1]["id"]
+
+    async def load_display_index(self) -> int:
+        """Build the display_number → UUID index from published cases
+        (id + display_number projection only, paginated)."""
+        try:
+            rows = await self._select_all(
+                "cases",
+                {"select": "id,display_number", "published": "eq.true", "display_number": "not.is.null"},
+                service=False,
+            )
+            self.display_index.rebuild(rows)
+            logger.info(f"Display-number index loaded ({len(self.display_index)} cases)")
+            return len(self.display_index)
+        except Exception as e:
+            logger.error(f"Error loading display-number index: {e}")
+            return 0
+
+    async def backfill_display_numbers(self) -> int:
+        """One-shot job: compute display_number for every published case that
+        lacks it and store them all in a single RPC call. Returns rows updated.
+        Runs on every startup, so a one-row probe (served by the partial
+        display_number index) skips the full pass once nothing is missing."""
+        missing = {"select": "id", "published": "eq.true", "display_number": "is.null"}
+        try:
+            if not await self._select("cases", dict(missing, limit="1")):
+                return 0
+            rows = await self._select_all("cases", missing)
+            if not rows:
+                return 0
+            payload = [{"id": row["id"], "display_number": case_display_num(row["id"])} for row in rows]
+            updated = int(await self._rpc("set_display_numbers", {"payload": payload}, idempotent=True))
+            for item in payload:
+                self.display_index.add(item["id"], item["display_number"])
+                self.case_cache.merge(item["id"], {"display_number": item["display_number"]})
+            logger.info(f"Backfilled display_number for {updated} cases")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling display numbers: {e}")
+            return 0
+
+    async def find_case_ids_by_display_number(self, display_number: int) -> List[str]:
+        """UUIDs of published cases with this display number (may be several).
+        Always confirmed with one query on the indexed column, whose result
+        replaces the index entry; the index only answers while the query fails."""
+        try:
+            rows = await self._select(
+                "cases",
+                {"select": "id,display_number", "display_number": f"eq.{display_number}", "published": "eq.true"},
+                service=False,
+            )
+        except Exception as e:
+            logger.error(f"Error finding case #{display_number}: {e}")
+            return self.display_index.lookup(display_number)
+        found = {row["id"] for row in rows}
+        for case_uuid in set(self.display_index.lookup(display_number)) - found:
+            self.display_index.remove(case_uuid)
+        for row in rows:
+            self.display_index.add(row["id"], row["display_number"])
+        return sorted(found)
+
+    async def warm_case_cache(self, limit: int = 50) -> int:
+        """Preload the most recently published cases. Returns rows cached."""
+        if limit <= 0:
+            return 0
+        try:
+            rows = await self._select(
+                "cases",
+                {
+                    "select": "*",
+                    "published": "eq.true",
+                    "order": "telegram_message_id.desc.nullslast",
+                    "limit": str(limit),
+                },
+                service=False,
+            )
+            for row in rows:
+                self.case_cache.put(row)
+            logger.info(f"Case cache warmed with {len(rows)} published cases")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error warming case cache: {e}")
+            return 0
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the case cache."""
+        return self.case_cache.stats()
+
+    # ═══════════════════════════════════════════
+    # SCHEDULED POSTS TABLE
+    # ═══════════════════════════════════════════
+
+    async def schedule_case(self, case_id: str, scheduled_at: datetime, admin_user_id: int) -> Optional[str]:
+        """
+        Schedule a case for future publication.
+        Returns schedule entry UUID if successful.
+        """
+        try:
+            entry_id = str(uuid.uuid4())
+            data = {
+                "id": entry_id,
+                "case_id": case_id,
+                "scheduled_at": scheduled_at.isoformat(),
+                "status": "pending",
+                "admin_user_id": admin_user_id,
+                "source": "manual",
+            }
+            await self._insert("scheduled_posts", data)
+            logger.info(f"Case {case_id} scheduled for {scheduled_at} (entry {entry_id})")
+            self._notify_schedule("scheduled", entry_id, scheduled_at)
+            return entry_id
+        except Exception as e:
+            logger.error(f"Error scheduling case: {e}")
+            return None
+
+    async def get_due_posts(
+        self,
+        now: datetime,
+        limit: int = DUE_POSTS_BATCH,
+        after: Optional[QueueCursor] = None,
+        columns: str = DUE_POST_COLUMNS,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get one page of pending scheduled posts whose time has arrived,
+        ordered by scheduled_at (earliest first). Only ids and times by
+        default: the case itself is loaded when the post is published.
+        """
+        try:
+            params = {
+                "select": columns,
+                "status": "eq.pending",
+                "scheduled_at": f"lte.{now.isoformat()}",
+                "order": "scheduled_at.asc,id.asc",
+                "limit": str(limit),
+            }
+            if after:
+                params["or"] = _keyset_filter(after)
+            posts = await self._select("scheduled_posts", params)
+            for post in posts:
+                if post.get("cases") and post["cases"].get("id"):
+                    self.case_cache.put(post["cases"])
+            return posts
+        except Exception as e:
+            logger.error(f"Error fetching due posts: {e}")
+            return []
+
+    async def get_queue(
+        self,
+        limit: int = QUEUE_PAGE_SIZE,
+        after: Optional[QueueCursor] = None,
+        columns: str = QUEUE_COLUMNS,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get one page of pending scheduled posts, ordered by date.
+        Pass queue_cursor(previous_page) as `after` to get the next page.
+        """
+        try:
+            params = {
+                "select": columns,
+                "status": "eq.pending",
+                "order": "scheduled_at.asc,id.asc",
+                "limit": str(limit),
+            }
+            if after:
+                params["or"] = _keyset_filter(after)
+            return await self._select("scheduled_posts", params)
+        except Exception as e:
+            logger.error(f"Error fetching queue: {e}")
+            return []
+
+    async def count_queue(self) -> int:
+        """Number of pending scheduled posts (count only, no rows)."""
+        try:
+            response = await self._rest(
+                "HEAD", "scheduled_posts", params={"select": "id", "status": "eq.pending"}, prefer="count=exact"
+            )
+            total = response.headers.get("content-range", "").rsplit("/", 1)[-1]
+            return int(total) if total.isdigit() else 0
+        except Exception as e:
+            logger.error(f"Error counting queue: {e}")
+            return 0
+
+    async def get_scheduled_post(
+        self, entry_id: str, columns: str = SCHEDULED_POST_COLUMNS
+    ) -> Optional[Dict[str, Any]]:
+        """Get a single scheduled post by its ID (projected columns)."""
+        try:
+            rows = await self._select("scheduled_posts", {"select": columns, "id": f"eq.{entry_id}"})
+            if rows:
+                return rows[0]
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching scheduled post {entry_id}: {e}")
+            return None
+
+    async def get_scheduled_case_id(self, entry_id: str) -> Optional[str]:
+        """Get only the case_id of a scheduled post."""
+        try:
+            rows = await self._select(
+                "scheduled_posts", {"select": "case_id", "id": f"eq.{entry_id}"}, service=False
+            )
+            if rows:
+                return rows[0]["case_id"]
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching case_id for scheduled post {entry_id}: {e}")
+            return None
+
+    async def mark_publishing(
+        self, entry_id: str, owner: Optional[str] = None, lease_expires_at: Optional[datetime] = None
+    ) -> bool:
+        """Mark a scheduled post as currently publishing (lock), optionally
+        leased to `owner`. True only if this call moved it out of 'pending'."""
+        try:
+            data: Dict[str, Any] = {"status": "publishing"}
+            if owner:
+                data["lease_owner"] = owner
+                data["lease_expires_at"] = lease_expires_at.isoformat() if lease_expires_at else None
+            response = await self._rest(
+                "PATCH",
+                "scheduled_posts",
+                params={"id": f"eq.{entry_id}", "status": "eq.pending", "select": "id"},
+                json=data,
+                prefer="return=representation",
+            )
+            return bool(response.json())
+        except Exception as e:
+            logger.error(f"Error marking post as publishing: {e}")
+            return False
+
+    async def claim_due_posts(
+        self,
+        owner: str,
+        now: datetime,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        limit: int = CLAIM_BATCH_SIZE,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Atomically claim due posts (and posts whose lease expired) for
+        `owner`. Returns only the rows this caller won, as
+        {id, case_id, scheduled_at, reclaimed}, earliest first; [] when
+        nothing is due and None when the claim itself failed.
+        Falls back to row-by-row conditional claims without the RPC.
+        """
+        try:
+            rows = await self._rpc(
+                "claim_due_posts",
+                {"p_owner": owner, "p_now": now.isoformat(), "p_lease_seconds": lease_seconds, "p_limit": limit},
+            ) or []
+            rows.sort(key=lambda r: r.get("scheduled_at") or "")
+            return rows
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_transient(e):
+                logger.error(f"Error claiming due posts: {e}")
+                return None
+            logger.warning(f"claim_due_posts RPC unavailable, claiming row by row: {e}")
+        try:
+            due = await self._select("scheduled_posts", {
+                "select": DUE_POST_COLUMNS,
+                "status": "eq.pending",
+                "scheduled_at": f"lte.{now.isoformat()}",
+                "order": "scheduled_at.asc,id.asc",
+                "limit": str(limit),
+            })
+        except Exception as e:
+            logger.error(f"Error claiming due posts: {e}")
+            return None
+        won = []
+        expires = now + timedelta(seconds=lease_seconds)
+        for post in due:
+            if await self.mark_publishing(post["id"], owner, expires):
+                won.append({**post, "reclaimed": False})
+        return won
+
+    @staticmethod
+    def _claimed_by(entry_id: str, owner: Optional[str]) -> Dict[str, str]:
+        """Filter for a post; with `owner`, only while that owner still holds
+        its publish lease (a reclaimed post is left to the new owner)."""
+        params = {"id": f"eq.{entry_id}"}
+        if owner:
+            params["status"] = "eq.publishing"
+            params["lease_owner"] = f"eq.{owner}"
+        return params
+
+    async def mark_done(
+        self,
+        entry_id: str,
+        telegram_message_id: Optional[int],
+        note: Optional[str] = None,
+        owner: Optional[str] = None,
+    ) -> bool:
+        """Mark a scheduled post as successfully published.
+        `note` is stored in error_message (e.g. when the case was already published manually).
+        Without a telegram_message_id (nothing sent) published_at and
+        telegram_message_id keep their values.
+        With `owner`, only applies while that owner still holds the lease."""
+        try:
+            data: Dict[str, Any] = {"status": "done"}
+            if telegram_message_id is not None:
+                data["published_at"] = datetime.now(timezone.utc).isoformat()
+                data["telegram_message_id"] = telegram_message_id
+            if note:
+                data["error_message"] = note
+            await self._mutate("PATCH", "scheduled_posts", params=self._claimed_by(entry_id, owner), json=data)
+            return True
+        except Exception as e:
+            logger.error(f"Error marking post as done: {e}")
+            return False
+
+    async def mark_failed(self, entry_id: str, error_msg: str, owner: Optional[str] = None) -> bool:
+        """Mark a scheduled post as failed.
+        With `owner`, only applies while that owner still holds the lease."""
+        try:
+            await self._mutate(
+                "PATCH",
+                "scheduled_posts",
+                params=self._claimed_by(entry_id, owner),
+                json={"status": "failed", "error_message": error_msg[:500]},
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error marking post as failed: {e}")
+            return False
+
+    async def cancel_scheduled(self, entry_id: str) -> bool:
+        """
+        Cancel a scheduled post and delete its case from the DB.
+        Only cancels if status is 'pending'.
+        """
+        try:
+            rows = await self._select(
+                "scheduled_posts", {"select": "id,case_id,status", "id": f"eq.{entry_id}"}
+            )
+            if not rows:
+                return False
+            post = rows[0]
+            if post["status"] != "pending":
+                logger.warning(f"Cannot cancel post {entry_id}: status is {post['status']}")
+                return False
+
+            case_id = post["case_id"]
+
+            # Delete the scheduled entry only if it is still pending: the
+            # scheduler may have claimed it since the read above
+            response = await self._rest(
+                "DELETE",
+                "scheduled_posts",
+                params={"id": f"eq.{entry_id}", "status": "eq.pending"},
+                prefer="return=representation",
+            )
+            if not response.json():
+                logger.warning(f"Cannot cancel post {entry_id}: no longer pending")
+                return False
+            self._notify_schedule("cancelled", entry_id)
+
+            # Delete the case from DB (cleanup)
+            await self.delete_case(case_id)
+
+            logger.info(f"Scheduled post {entry_id} cancelled + case {case_id} deleted")
+            return True
+        except Exception as e:
+            logger.error(f"Error cancelling scheduled post: {e}")
+            return False
+
+    # ── Bulk status transitions (one filtered PATCH each) ──
+
+    async def _transition_posts(
+        self, filters: Dict[str, str], data: Dict[str, Any], select: str = "*"
+    ) -> List[Dict[str, Any]]:
+        """Apply `data` to every scheduled post matching `filters` in a single
+        request. Returns the affected rows (ordered by scheduled_at)."""
+        params = dict(filters)
+        params["select"] = select
+        response = await self._rest(
+            "PATCH", "scheduled_posts", params=params, json=data, prefer="return=representation"
+        )
+        rows = response.json() or []
+        rows.sort(key=lambda r: r.get("scheduled_at") or "")
+        return rows
+
+    async def fail_overdue_posts(self, now: datetime, error_msg: str) -> List[Dict[str, Any]]:
+        """pending → failed for every post scheduled before `now`."""
+        try:
+            return await self._transition_posts(
+                {"status": "eq.pending", "scheduled_at": f"lt.{now.isoformat()}"},
+                {"status": "failed", "error_message": error_msg[:500]},
+                select="id,case_id,scheduled_at,cases(vignette)",
+            )
+        except Exception as e:
+            logger.error(f"Error failing overdue posts: {e}")
+            return []
+
+    async def fail_stuck_publishing(self, error_msg: str) -> List[Dict[str, Any]]:
+        """publishing → failed for posts left mid-publish without a lease
+        (leased posts are reclaimed by claim_due_posts once the lease expires)."""
+        try:
+            return await self._transition_posts(
+                {"status": "eq.publishing", "lease_expires_at": "is.null"},
+                {"status": "failed", "error_message": error_msg[:500]},
+                select="id,case_id,scheduled_at",
+            )
+        except Exception as e:
+            logger.error(f"Error failing stuck publishing posts: {e}")
+            return []
+
+    async def set_posts_status(
+        self, entry_ids: List[str], status: str, error_msg: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Set `status` on an arbitrary list of scheduled posts at once."""
+        if not entry_ids:
+            return []
+        data: Dict[str, Any] = {"status": status}
+        if error_msg is not None:
+            data["error_message"] = error_msg[:500]
+        try:
+            return await self._transition_posts(
+                {"id": f"in.({','.join(entry_ids)})"}, data, select="id,case_id,scheduled_at,status"
+            )
+        except Exception as e:
+            logger.error(f"Error setting status {status} on {len(entry_ids)} posts: {e}")
+            return []
+
+    async def mark_overdue_as_failed(self, now: datetime, max_lateness_seconds: float = 0) -> List[Dict[str, Any]]:
+        """
+        On bot startup: mark as 'failed' every pending post that is more than
+        `max_lateness_seconds` late (the rest can still be caught up).
+        Returns the list so admin can be notified.
+        """
+        cutoff = now - timedelta(seconds=max_lateness_seconds)
+        overdue = await self.fail_overdue_posts(cutoff, "Bot estaba offline a la hora programada")
+        if overdue:
+            logger.warning(f"Marked {len(overdue)} overdue posts as failed on startup")
+        return overdue
+
+    # ═══════════════════════════════════════════
+    # BOT SETTINGS TABLE
+    # ═══════════════════════════════════════════
+
+    async def load_settings(self) -> bool:
+        """Load every bot setting into the in-process snapshot (one query)."""
+        try:
+            rows = await self._select("bot_settings", {"select": "key,value"})
+            self._settings = {row["key"]: row["value"] for row in rows}
+            logger.info(f"Loaded {len(self._settings)} bot settings")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading bot settings: {e}")
+            return False
+
+    async def settings_refresh_loop(self, interval: float = SETTINGS_REFRESH_SECONDS) -> None:
+        """Reload the settings snapshot forever (picks up edits made outside the bot)."""
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await self.load_settings()
+            except asyncio.CancelledError:
+                break
+
+    async def get_setting(self, key: str, default=None):
+        """Get a bot setting by key. Returns parsed JSON value.
+        Served from the settings snapshot; falls back to a direct query only
+        while the snapshot could not be loaded."""
+        if self._settings is None:
+            await self.load_settings()
+        if self._settings is not None:
+            return self._settings.get(key, default)
+        try:
+            rows = await self._select("bot_settings", {"select": "value", "key": f"eq.{key}"})
+            if rows:
+                return rows[0]["value"]
+            return default
+        except Exception as e:
+            logger.error(f"Error getting setting {key}: {e}")
+            return default
+
+    async def set_setting(self, key: str, value) -> bool:
+        """Upsert a bot setting (write-through to the snapshot)."""
+        try:
+            await self._mutate(
+                "POST",
+                "bot_settings",
+                json={"key": key, "value": value, "updated_at": datetime.now().isoformat()},
+                prefer="resolution=merge-duplicates,return=minimal",
+            )
+            if self._settings is not None:
+                self._settings[key] = value
+            return True
+        except Exception as e:
+            logger.error(f"Error setting {key}: {e}")
+            return False
+
+    # ═══════════════════════════════════════════
+    # AUTO-QUEUE LOGIC
+    # ═══════════════════════════════════════════
+
+    async def get_last_queued_date(self) -> Optional[datetime]:
+        """Get the scheduled_at of the latest pending queue entry."""
+        try:
+            rows = await self._select(
+                "scheduled_posts",
+                {
+                    "select": "scheduled_at",
+                    "status": "eq.pending",
+                    "source": "eq.queue",
+                    "order": "scheduled_at.desc",
+                    "limit": "1",
+                },
+            )
+            if rows:
+                raw = rows[0]["scheduled_at"]
+                return datetime.fromisoformat(raw.replace("Z", "+00:00"))
+            return None
+        except Exception as e:
+            logger.error(f"Error getting last queued date: {e}")
+            return None
+
+    async def schedule_case_queue(self, case_id: str, scheduled_at: datetime, admin_user_id: int) -> Optional[str]:
+        """Schedule a case via auto-queue (sets source='queue')."""
+        entry_ids = await self.schedule_cases_queue([(case_id, scheduled_at)], admin_user_id)
+        return entry_ids[0] if entry_ids else None
+
+    async def schedule_cases_queue(
+        self, entries: List[Tuple[str, datetime]], admin_user_id: int
+    ) -> List[str]:
+        """Auto-queue several (case_id, scheduled_at) pairs with one bulk insert.
+        Returns the entry UUIDs in order, or [] on failure."""
+        try:
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "case_id": case_id,
+                    "scheduled_at": scheduled_at.isoformat(),
+                    "status": "pending",
+                    "admin_user_id": admin_user_id,
+                    "source": "queue",
+                }
+                for case_id, scheduled_at in entries
+            ]
+            await self._insert("scheduled_posts", rows)
+            for row, (case_id, scheduled_at) in zip(rows, entries):
+                logger.info(f"Case {case_id} auto-queued for {scheduled_at} (entry {row['id']})")
+                self._notify_schedule("scheduled", row["id"], scheduled_at)
+            return [row["id"] for row in rows]
+        except Exception as e:
+            logger.error(f"Error auto-queuing cases: {e}")
+            return []
+
+    async def reschedule_posts(self, changes: List[Tuple[str, datetime]]) -> Optional[List[str]]:
+        """Move pending posts to new times in one call (reschedule_posts RPC,
+        migrations/004). Posts no longer pending are skipped. Returns the ids
+        actually moved, or None if the backend failed (some posts may then
+        be unmoved); falls back to one conditional PATCH per post."""
+        if not changes:
+            return []
+        moved = None
+        try:
+            moved = await self._rpc(
+                "reschedule_posts",
+                {"p_changes": [{"id": entry_id, "scheduled_at": at.isoformat()} for entry_id, at in changes]},
+                idempotent=True,
+            ) or []
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_transient(e):
+                logger.error(f"Error rescheduling posts: {e}")
+                return None
+            logger.warning(f"reschedule_posts RPC unavailable, updating row by row: {e}")
+        failed = False
+        if moved is None:
+            moved = []
+            for entry_id, scheduled_at in changes:
+                try:
+                    response = await self._rest(
+                        "PATCH",
+                        "scheduled_posts",
+                        params={"id": f"eq.{entry_id}", "status": "eq.pending", "select": "id"},
+                        json={"scheduled_at": scheduled_at.isoformat()},
+                        prefer="return=representation",
+                        idempotent=True,
+                    )
+                    if response.json():
+                        moved.append(entry_id)
+                except Exception as e:
+                    failed = True
+                    logger.error(f"Error rescheduling post {entry_id}: {e}")
+        new_times = dict(changes)
+        for entry_id in moved:
+            self._notify_schedule("rescheduled", entry_id, new_times.get(entry_id))
+        logger.info(f"Rescheduled {len(moved)}/{len(changes)} pending posts")
+        return None if failed else moved
+
+    # ═══════════════════════════════════════════
+    # MEDIA JOBS
+    # ═══════════════════════════════════════════
+
+    async def enqueue_media_job(self, file_id: str, filename: str) -> Optional[str]:
+        """Queue a Telegram file for the media role. Returns the job UUID.
+        Sent right away (never journaled): a worker has to see it now."""
+        try:
+            job_id = str(uuid.uuid4())
+            await self._rest(
+                "POST",
+                "media_jobs",
+                params={"on_conflict": "id"},
+                json={"id": job_id, "file_id": file_id, "filename": filename, "status": "pending"},
+                prefer="resolution=ignore-duplicates,return=minimal",
+                idempotent=True,
+            )
+            return job_id
+        except Exception as e:
+            logger.error(f"Error queuing media job: {e}")
+            return None
+
+    async def get_media_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a media job: {id, status, result_url, error_message}."""
+        try:
+            rows = await self._select(
+                "media_jobs",
+                {"select": "id,status,result_url,error_message", "id": f"eq.{job_id}"},
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.error(f"Error fetching media job {job_id}: {e}")
+            return None
+
+    async def claim_media_jobs(
+        self,
+        owner: str,
+        now: datetime,
+        lease_seconds: int = MEDIA_LEASE_SECONDS,
+        limit: int = MEDIA_CLAIM_BATCH_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """Claim pending media jobs (or ones whose lease expired) with a
+        conditional PATCH per job. Returns {id, file_id, filename} of the
+        jobs this caller won, oldest first."""
+        claimable = f"(status.eq.pending,and(status.eq.processing,lease_expires_at.lt.{now.isoformat()}))"
+        try:
+            candidates = await self._select(
+                "media_jobs",
+                {"select": "id", "or": claimable, "order": "created_at.asc", "limit": str(limit)},
+            )
+        except Exception as e:
+            logger.error(f"Error listing media jobs: {e}")
+            return []
+        won = []
+        for job in candidates:
+            try:
+                response = await self._rest(
+                    "PATCH",
+                    "media_jobs",
+                    params={"id": f"eq.{job['id']}", "or": claimable, "select": "id,file_id,filename"},
+                    json={
+                        "status": "processing",
+                        "lease_owner": owner,
+                        "lease_expires_at": (now + timedelta(seconds=lease_seconds)).isoformat(),
+                    },
+                    prefer="return=representation",
+                )
+                won.extend(response.json() or [])
+            except Exception as e:
+                logger.error(f"Error claiming media job {job['id']}: {e}")
+        return won
+
+    async def finish_media_job(
+        self, job_id: str, result_url: Optional[str] = None, error_msg: Optional[str] = None
+    ) -> bool:
+        """Store the outcome of a media job (done with its URL, or failed)."""
+        try:
+            data = {"status": "done", "result_url": result_url} if result_url else {
+                "status": "failed",
+                "error_message": (error_msg or "Sin resultado")[:500],
+            }
+            await self._rest(
+                "PATCH", "media_jobs", params={"id": f"eq.{job_id}"}, json=data,
+                prefer="return=minimal", idempotent=True,
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error finishing media job {job_id}: {e}")
+            return False
+
+
 def init_supabase(url: str, key: str, service_key: str) -> SupabaseClient:
     """Initialize and return a Supabase client."""
     return SupabaseClient(url, key, service_key)
+
+
+def init_async_supabase(url: str, key: str, service_key: str, **options) -> AsyncSupabaseClient:
+    """Initialize and return the asyncio Supabase client used by the bot."""
+    return AsyncSupabaseClient(url, key, service_key, **options)
@@ -0,0 +1,55 @@
+import os
+import sys
+import types
+
+import pytest
+
+# The bot's modules are flat at the repo root and validate Config on import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "123:test")
+os.environ.setdefault("PUBLIC_CHANNEL_ID", "-100")
+os.environ.setdefault("MINIAPP_URL", "https://example.com/app")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+
+
+@pytest.fixture
+def local_db(tmp_path):
+    """LocalSqliteClient on a throwaway file, case writes applied at once."""
+    from local_client import LocalSqliteClient
+
+    client = LocalSqliteClient(str(tmp_path / "bot.db"), str(tmp_path / "bucket"), write_debounce=0)
+    yield client
+    client.conn.close()
+
+
+class FakeBot:
+    """Just enough of telegram.Bot for the scheduler: records admin messages."""
+
+    username = "casos_bot"
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+
+
+@pytest.fixture
+def scheduler_env(monkeypatch, local_db):
+    """scheduler module wired to `local_db` and a FakeBot, with fresh state."""
+    import scheduler
+    from config import Config
+    from due_timers import DueTimerHeap
+
+    bot = FakeBot()
+    monkeypatch.setattr(Config, "ADMIN_USER_IDS", [1])
+    monkeypatch.setattr(Config, "BOT_ROLE", "all")
+    monkeypatch.setattr(scheduler, "_bot_app", types.SimpleNamespace(bot=bot))
+    monkeypatch.setattr(scheduler, "_supabase", local_db)
+    monkeypatch.setattr(scheduler, "_timers", DueTimerHeap())
+    monkeypatch.setattr(scheduler, "_prefetch_timers", DueTimerHeap(lead_seconds=Config.PUBLISH_PREFETCH_SECONDS))
+    monkeypatch.setattr(scheduler, "_prepared", {})
+    monkeypatch.setattr(scheduler, "_catchup_published", [])
+    monkeypatch.setattr(scheduler, "_last_catchup_at", 0.0)
+    local_db.add_schedule_listener(scheduler._on_schedule_change)
+    return bot
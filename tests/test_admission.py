@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from admission import ADMITTED, SHED_OVERLOADED, SHED_STALE, AdmissionController
+
+
+async def _outcome(controller, sent_at=None):
+    async with controller.admit(sent_at) as outcome:
+        return outcome
+
+
+def test_admits_fresh_updates():
+    controller = AdmissionController(max_concurrent=2, max_queue=10, max_age_seconds=60)
+    assert asyncio.run(_outcome(controller, datetime.now(timezone.utc))) == ADMITTED
+    assert controller.stats()[ADMITTED] == 1
+    assert controller.stats()["running"] == 0
+
+
+def test_sheds_stale_updates():
+    controller = AdmissionController(max_concurrent=2, max_queue=10, max_age_seconds=60)
+    old = datetime.now(timezone.utc) - timedelta(seconds=120)
+    assert asyncio.run(_outcome(controller, old)) == SHED_STALE
+    assert controller.stats()[SHED_STALE] == 1
+
+
+def test_max_age_zero_disables_the_stale_check():
+    controller = AdmissionController(max_concurrent=1, max_queue=10, max_age_seconds=0)
+    old = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert asyncio.run(_outcome(controller, old)) == ADMITTED
+
+
+def test_sheds_when_the_backlog_ahead_is_full():
+    controller = AdmissionController(max_concurrent=2, max_queue=5, max_age_seconds=60, queue_depth=lambda: 5)
+    assert asyncio.run(_outcome(controller)) == SHED_OVERLOADED
+    assert controller.stats()[SHED_OVERLOADED] == 1
+
+
+def test_concurrency_is_bounded_and_waiters_count_towards_the_queue():
+    controller = AdmissionController(max_concurrent=1, max_queue=2, max_age_seconds=60)
+    release = asyncio.Event()
+    running = []
+
+    async def hold(tag):
+        async with controller.admit() as outcome:
+            running.append((tag, controller.running))
+            if outcome == ADMITTED:
+                await release.wait()
+            return outcome
+
+    async def run():
+        first = asyncio.create_task(hold("first"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(hold(f"w{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        assert controller.waiting == 2
+        # The queue (2 waiting) is full: the next one is shed at once
+        assert await _outcome(controller) == SHED_OVERLOADED
+        release.set()
+        return await asyncio.gather(first, *waiters)
+
+    outcomes = asyncio.run(run())
+    assert outcomes == [ADMITTED, ADMITTED, ADMITTED]
+    assert all(count == 1 for _, count in running)
+    assert controller.stats()["waiting"] == 0
+
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from resilience import ResilientCaller
+from supabase_client import AsyncSupabaseClient
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def _schedule(local_db, *offsets_minutes):
+    async def run():
+        case_id = await local_db.save_case({"vignette": "Caso de prueba"})
+        return [await local_db.schedule_case(case_id, NOW + timedelta(minutes=m), 1) for m in offsets_minutes]
+
+    return asyncio.run(run())
+
+
+def _status(local_db, entry_id):
+    return asyncio.run(local_db.get_scheduled_post(entry_id, columns="status"))["status"]
+
+
+def test_fail_overdue_posts_moves_only_overdue_pending_posts(local_db):
+    late, later, future = _schedule(local_db, -30, -5, 30)
+    failed = asyncio.run(local_db.fail_overdue_posts(NOW, "offline"))
+    assert [post["id"] for post in failed] == [late, later]
+    assert failed[0]["cases"] == {"vignette": "Caso de prueba"}
+    assert _status(local_db, future) == "pending"
+    # Already failed: a second pass touches nothing
+    assert asyncio.run(local_db.fail_overdue_posts(NOW, "offline")) == []
+
+
+def test_set_posts_status_updates_exactly_the_listed_posts(local_db):
+    first, second, other = _schedule(local_db, 10, 20, 30)
+    rows = asyncio.run(local_db.set_posts_status([second, first], "failed", "x"))
+    assert [row["id"] for row in rows] == [first, second]
+    assert all(row["status"] == "failed" and row["error_message"] == "x" for row in rows)
+    assert _status(local_db, other) == "pending"
+    assert asyncio.run(local_db.set_posts_status([], "failed")) == []
+
+
+def test_supabase_transition_is_one_filtered_patch():
+    requests = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[
+            {"id": "b", "scheduled_at": "2026-10-17T11:00:00+00:00"},
+            {"id": "a", "scheduled_at": "2026-10-17T10:00:00+00:00"},
+        ])
+
+    client = AsyncSupabaseClient(
+        "http://supabase.test",
+        "anon",
+        "service",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handle)),
+        resilience=ResilientCaller(max_attempts=1),
+    )
+    rows = asyncio.run(client.fail_overdue_posts(NOW, "offline"))
+    assert [row["id"] for row in rows] == ["a", "b"]
+    assert len(requests) == 1
+    request = requests[0]
+    assert request.method == "PATCH"
+    assert request.url.params["status"] == "eq.pending"
+    assert request.url.params["scheduled_at"] == f"lt.{NOW.isoformat()}"
+    assert request.headers["prefer"] == "return=representation"
@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+
+import case_cache
+from case_cache import CaseCache
+from resilience import ResilientCaller
+from supabase_client import AsyncSupabaseClient
+
+
+def test_get_returns_a_copy_and_counts_hits():
+    cache = CaseCache()
+    cache.put({"id": "a", "vignette": "v"})
+    row = cache.get("a")
+    row["vignette"] = "changed"
+    assert cache.get("a") == {"id": "a", "vignette": "v"}
+    assert cache.get("missing") is None
+    assert cache.stats() == {"size": 1, "hits": 2, "misses": 1, "hit_ratio": 0.667}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CaseCache(max_entries=2)
+    cache.put({"id": "a"})
+    cache.put({"id": "b"})
+    cache.get("a")
+    cache.put({"id": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(case_cache.time, "monotonic", lambda: now[0])
+    cache = CaseCache(ttl_seconds=10)
+    cache.put({"id": "a"})
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_merge_only_updates_cached_rows():
+    cache = CaseCache()
+    cache.merge("a", {"vignette": "v"})
+    assert cache.get("a") is None
+    cache.put({"id": "a", "vignette": "old", "tip": "t"})
+    cache.merge("a", {"vignette": "new"})
+    assert cache.get("a") == {"id": "a", "vignette": "new", "tip": "t"}
+
+
+class _Cases:
+    """PostgREST stand-in for the cases table."""
+
+    def __init__(self):
+        self.reads = 0
+        self.fail_writes = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            self.reads += 1
+            return httpx.Response(200, json=[{"id": "case-1", "vignette": "v1"}])
+        return httpx.Response(400 if self.fail_writes else 204)
+
+
+def _client(backend):
+    return AsyncSupabaseClient(
+        "http://supabase.test",
+        "anon",
+        "service",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(backend.handle)),
+        resilience=ResilientCaller(max_attempts=1),
+    )
+
+
+def test_get_case_reads_through_and_fresh_skips_the_cache():
+    backend = _Cases()
+    client = _client(backend)
+
+    async def run():
+        await client.get_case("case-1")
+        await client.get_case("case-1")
+        assert backend.reads == 1
+        await client.get_case("case-1", fresh=True)
+        assert backend.reads == 2
+
+    asyncio.run(run())
+
+
+def test_case_writes_refresh_or_invalidate_the_cached_row():
+    backend = _Cases()
+    client = _client(backend)
+
+    async def run():
+        await client.get_case("case-1")
+        assert await client.update_case("case-1", {"vignette": "v2"})
+        assert (await client.get_case("case-1"))["vignette"] == "v2"
+        backend.fail_writes = True
+        assert not await client.update_case("case-1", {"vignette": "v3"})
+        assert client.case_cache.get("case-1") is None
+
+    asyncio.run(run())
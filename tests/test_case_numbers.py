@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+import pytest
+
+from resilience import ResilientCaller
+from supabase_client import AsyncSupabaseClient
+
+
+class _Backend:
+    """PostgREST stand-in: next_case_number answers `rpc`, HEAD cases counts 41 rows."""
+
+    def __init__(self, rpc: httpx.Response):
+        self.rpc = rpc
+        self.calls = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.method)
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"content-range": "0-40/41"})
+        return self.rpc
+
+
+def _next_number(backend):
+    client = AsyncSupabaseClient(
+        "http://supabase.test",
+        "anon",
+        "service",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(backend.handle)),
+        resilience=ResilientCaller(max_attempts=2, base_delay=0),
+    )
+    return asyncio.run(client.get_next_case_number())
+
+
+def test_number_comes_from_the_sequence_rpc():
+    backend = _Backend(httpx.Response(200, json=1234))
+    assert _next_number(backend) == 1234
+    assert backend.calls == ["POST"]
+
+
+@pytest.mark.parametrize("missing", [
+    httpx.Response(404, json={"code": "PGRST202", "message": "Could not find the function"}),
+    httpx.Response(400, json={"code": "PGRST202"}),
+])
+def test_counts_rows_only_when_the_rpc_is_not_installed(missing):
+    backend = _Backend(missing)
+    assert _next_number(backend) == 42
+    assert backend.calls == ["POST", "HEAD"]
+
+
+def test_transient_errors_are_retried_then_raised_without_counting():
+    backend = _Backend(httpx.Response(503))
+    with pytest.raises(httpx.HTTPStatusError):
+        _next_number(backend)
+    assert backend.calls == ["POST", "POST"]
+
+
+def test_local_sequence_never_repeats(local_db):
+    async def run():
+        return [await local_db.get_next_case_number() for _ in range(3)]
+
+    first, second, third = asyncio.run(run())
+    assert first < second < third
@@ -0,0 +1,76 @@
+import asyncio
+
+from case_writes import CaseWriteBuffer, column_diff
+
+
+class _Writes:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.calls = []
+
+    async def __call__(self, case_uuid, columns):
+        self.calls.append((case_uuid, columns))
+        return self.ok
+
+
+def test_column_diff_keeps_only_changed_columns():
+    assert column_diff({"a": 1, "b": [1]}, {"a": 1, "b": [2]}) == {"b": [1]}
+    assert column_diff({"a": 1}, None) == {"a": 1}
+
+
+def test_queued_updates_are_debounced_into_one_minimal_write():
+    writes = _Writes()
+    buffer = CaseWriteBuffer(writes, debounce_seconds=0.01)
+    buffer.track({"id": "c", "vignette": "v", "images": []})
+
+    async def run():
+        buffer.queue("c", {"vignette": "v", "images": ["1.jpg"]})
+        buffer.queue("c", {"vignette": "v", "images": ["1.jpg", "2.jpg"]})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert writes.calls == [("c", {"images": ["1.jpg", "2.jpg"]})]
+    assert not buffer.has_pending("c")
+
+
+def test_max_wait_bounds_the_debounce():
+    writes = _Writes()
+    buffer = CaseWriteBuffer(writes, debounce_seconds=10, max_wait_seconds=0.02)
+
+    async def run():
+        buffer.queue("c", {"images": ["1.jpg"]})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert writes.calls == [("c", {"images": ["1.jpg"]})]
+
+
+def test_flush_is_a_barrier_and_skips_unchanged_state():
+    writes = _Writes()
+    buffer = CaseWriteBuffer(writes, debounce_seconds=10)
+
+    async def run():
+        buffer.queue("c", {"tip": "t"})
+        assert await buffer.flush("c")
+        buffer.queue("c", {"tip": "t"})
+        assert await buffer.flush("c")
+
+    asyncio.run(run())
+    assert writes.calls == [("c", {"tip": "t"})]
+    assert buffer.stats()["skipped_writes"] == 1
+
+
+def test_failed_write_stays_pending_for_the_next_flush():
+    writes = _Writes(ok=False)
+    buffer = CaseWriteBuffer(writes, debounce_seconds=10)
+
+    async def run():
+        buffer.queue("c", {"tip": "t"})
+        assert not await buffer.flush("c")
+        assert buffer.has_pending("c")
+        writes.ok = True
+        assert await buffer.flush_all()
+
+    asyncio.run(run())
+    assert writes.calls == [("c", {"tip": "t"}), ("c", {"tip": "t"})]
+    assert not buffer.has_pending("c")
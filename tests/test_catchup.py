@@ -0,0 +1,74 @@
+import asyncio
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import scheduler
+from config import Config
+
+CASE = {
+    "vignette": "Paciente de 45 años con dolor torácico",
+    "options": [{"letter": "A", "text": "Uno"}, {"letter": "B", "text": "Dos"}],
+    "correct_letter": "B",
+}
+
+
+@pytest.fixture
+def channel(monkeypatch):
+    """Fake publish_case plus recorded pacing sleeps."""
+    sent, slept = [], []
+
+    async def publish_case(bot, payload, chat_id, priority):
+        sent.append(payload.case_id)
+        return types.SimpleNamespace(message_id=len(sent))
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(scheduler, "publish_case", publish_case)
+    monkeypatch.setattr(scheduler, "asyncio", types.SimpleNamespace(sleep=sleep))
+    monkeypatch.setattr(Config, "CATCHUP_GRACE_SECONDS", 120)
+    monkeypatch.setattr(Config, "CATCHUP_MAX_LATENESS_SECONDS", 7200)
+    monkeypatch.setattr(Config, "CATCHUP_SPACING_SECONDS", 60)
+    return types.SimpleNamespace(sent=sent, slept=slept)
+
+
+def _schedule_late(local_db, *minutes_late):
+    async def run():
+        now = datetime.now(timezone.utc)
+        entries = []
+        for minutes in minutes_late:
+            case_id = await local_db.save_case(CASE)
+            entries.append(await local_db.schedule_case(case_id, now - timedelta(minutes=minutes), 1))
+        return entries
+
+    return asyncio.run(run())
+
+
+def _status(local_db, entry_id):
+    return asyncio.run(local_db.get_scheduled_post(entry_id, columns="status"))["status"]
+
+
+def test_late_posts_are_published_paced_and_summarised(scheduler_env, local_db, channel):
+    too_late, late, later = _schedule_late(local_db, 180, 20, 10)
+    assert asyncio.run(scheduler._check_and_publish())
+
+    assert _status(local_db, too_late) == "failed"
+    assert _status(local_db, late) == "done"
+    assert _status(local_db, later) == "done"
+    assert len(channel.sent) == 2
+    # One claim at a time, spaced by CATCHUP_SPACING_SECONDS
+    assert channel.slept == [pytest.approx(60, abs=1)] * 2
+    failure, summary = scheduler_env.sent
+    assert "Se pasó la hora por 180 min" in failure
+    assert "2 caso(s) publicados con retraso" in summary
+
+
+def test_posts_within_the_grace_window_are_not_paced(scheduler_env, local_db, channel):
+    _schedule_late(local_db, 1, 1)
+    assert asyncio.run(scheduler._check_and_publish())
+    assert len(channel.sent) == 2
+    assert channel.slept == []
+    # Regular per-post notifications, no catch-up summary
+    assert not any("Recuperación" in text for text in scheduler_env.sent)
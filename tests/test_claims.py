@@ -0,0 +1,72 @@
+import asyncio
+import types
+from datetime import datetime, timedelta, timezone
+
+import scheduler
+from due_timers import DueTimerHeap
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def _schedule(local_db, *offsets_minutes):
+    async def run():
+        case_id = await local_db.save_case({"vignette": "v"})
+        return [await local_db.schedule_case(case_id, NOW + timedelta(minutes=m), 1) for m in offsets_minutes]
+
+    return asyncio.run(run())
+
+
+def _post(local_db, entry_id):
+    return asyncio.run(local_db.get_scheduled_post(entry_id, columns="status,lease_owner"))
+
+
+def test_a_due_post_is_claimed_by_one_owner_only(local_db):
+    due, future = _schedule(local_db, -1, 30)
+    claimed = asyncio.run(local_db.claim_due_posts("a", NOW, lease_seconds=60, limit=5))
+    assert [(post["id"], post["reclaimed"]) for post in claimed] == [(due, False)]
+    assert asyncio.run(local_db.claim_due_posts("b", NOW, lease_seconds=60, limit=5)) == []
+    assert _post(local_db, due) == {"status": "publishing", "lease_owner": "a"}
+    assert _post(local_db, future)["status"] == "pending"
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_is_fenced(local_db):
+    (entry_id,) = _schedule(local_db, -1)
+    asyncio.run(local_db.claim_due_posts("a", NOW, lease_seconds=60))
+    later = NOW + timedelta(seconds=61)
+    claimed = asyncio.run(local_db.claim_due_posts("b", later, lease_seconds=60))
+    assert [(post["id"], post["reclaimed"]) for post in claimed] == [(entry_id, True)]
+    # The stale owner's late result is ignored
+    asyncio.run(local_db.mark_failed(entry_id, "timeout", owner="a"))
+    assert _post(local_db, entry_id) == {"status": "publishing", "lease_owner": "b"}
+    asyncio.run(local_db.mark_done(entry_id, 42, owner="b"))
+    assert _post(local_db, entry_id)["status"] == "done"
+
+
+def test_only_pending_posts_can_be_cancelled(local_db):
+    claimed, pending = _schedule(local_db, -1, 30)
+    asyncio.run(local_db.claim_due_posts("a", NOW, lease_seconds=60))
+    assert not asyncio.run(local_db.cancel_scheduled(claimed))
+    assert _post(local_db, claimed)["status"] == "publishing"
+    assert asyncio.run(local_db.cancel_scheduled(pending))
+    assert _post(local_db, pending) is None
+
+
+def test_failed_claim_is_none_not_nothing_due(local_db):
+    _schedule(local_db, -1)
+    local_db.conn.close()
+    assert asyncio.run(local_db.claim_due_posts("a", NOW)) is None
+
+
+def test_scheduler_keeps_due_timers_when_the_claim_fails(monkeypatch):
+    async def claim_due_posts(*args):
+        return None
+
+    timers = DueTimerHeap()
+    timers.add("entry-1", NOW)
+    monkeypatch.setattr(scheduler, "_timers", timers)
+    monkeypatch.setattr(scheduler, "_bot_app", types.SimpleNamespace())
+    monkeypatch.setattr(
+        scheduler, "_supabase", types.SimpleNamespace(available=True, claim_due_posts=claim_due_posts)
+    )
+    assert asyncio.run(scheduler._check_and_publish()) is False
+    assert len(timers) == 1
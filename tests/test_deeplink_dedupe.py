@@ -0,0 +1,62 @@
+import time
+import types
+
+import pytest
+
+import main
+from admission import DEDUPED, AdmissionController
+from config import Config
+
+CASE_ID = "0b5e4c1e-8f3a-4c55-9d0e-7a1b2c3d4e5f"
+
+
+def test_deeplink_key_normalizes_raw_uuid_links():
+    assert main._deeplink_key(CASE_ID) == f"case_{CASE_ID}"
+    assert main._deeplink_key(f"case_{CASE_ID}") == f"case_{CASE_ID}"
+
+
+def test_deeplink_key_leaves_other_payloads_alone():
+    assert main._deeplink_key("ref_abc") == "ref_abc"
+    assert main._deeplink_key("") == ""
+
+
+def _context(last_deeplink=None, justification_ids=(1, 2)):
+    user_data = {"last_justification_ids": list(justification_ids)}
+    if last_deeplink:
+        user_data["last_deeplink"] = last_deeplink
+    return types.SimpleNamespace(user_data=user_data)
+
+
+@pytest.fixture(autouse=True)
+def dedupe_window(monkeypatch):
+    monkeypatch.setattr(Config, "DEEPLINK_DEDUPE_SECONDS", 10)
+
+
+def test_same_link_within_the_window_is_repeated():
+    context = _context((f"case_{CASE_ID}", time.monotonic()))
+    assert main._is_repeated_deeplink(context, CASE_ID)
+    assert main._is_repeated_deeplink(context, f"case_{CASE_ID}")
+
+
+def test_other_link_or_expired_window_is_not_repeated():
+    assert not main._is_repeated_deeplink(_context(("case_other", time.monotonic())), CASE_ID)
+    expired = _context((f"case_{CASE_ID}", time.monotonic() - 11))
+    assert not main._is_repeated_deeplink(expired, CASE_ID)
+
+
+def test_not_repeated_once_the_messages_are_gone():
+    context = _context((f"case_{CASE_ID}", time.monotonic()), justification_ids=())
+    assert not main._is_repeated_deeplink(context, CASE_ID)
+
+
+def test_window_zero_disables_dedupe(monkeypatch):
+    monkeypatch.setattr(Config, "DEEPLINK_DEDUPE_SECONDS", 0)
+    assert not main._is_repeated_deeplink(_context((f"case_{CASE_ID}", time.monotonic())), CASE_ID)
+
+
+def test_record_counts_deduped_taps_in_stats_and_prometheus():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, max_age_seconds=60)
+    controller.record(DEDUPED)
+    controller.record(DEDUPED)
+    assert controller.stats()[DEDUPED] == 2
+    assert 'deeplink_requests_total{outcome="deduped"} 2' in controller.render_prometheus()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import httpx
+
+from display_numbers import DisplayNumberIndex, case_display_num
+from resilience import ResilientCaller
+from supabase_client import AsyncSupabaseClient
+
+CASE_ID = "0b5e4c1e-8f3a-4c55-9d0e-7a1b2c3d4e5f"
+
+
+def test_display_number_is_stable_and_in_range():
+    assert case_display_num(CASE_ID) == case_display_num(CASE_ID)
+    assert 1000 <= case_display_num(CASE_ID) <= 3000
+    assert case_display_num("") == 1000
+
+
+def test_index_keeps_every_uuid_of_a_colliding_number():
+    index = DisplayNumberIndex()
+    index.add("b", 1500)
+    index.add("a", 1500)
+    index.add("c", 2000)
+    assert index.lookup(1500) == ["a", "b"]
+    # Re-adding moves the uuid; removing the last one drops the number
+    index.add("a", 2000)
+    assert index.lookup(1500) == ["b"]
+    index.remove("b")
+    assert index.lookup(1500) == []
+    assert index.lookup(2000) == ["a", "c"]
+    assert len(index) == 2
+
+
+def test_rebuild_skips_rows_without_a_number():
+    index = DisplayNumberIndex()
+    index.add("old", 1234)
+    index.rebuild([{"id": "a", "display_number": 1500}, {"id": "b", "display_number": None}])
+    assert index.loaded
+    assert index.lookup(1234) == []
+    assert len(index) == 1
+
+
+class _Cases:
+    """PostgREST stand-in: `missing` published cases lack a display_number."""
+
+    def __init__(self, missing=(), by_number=()):
+        self.missing = list(missing)
+        self.by_number = list(by_number)
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path.endswith("/rpc/set_display_numbers"):
+            return httpx.Response(200, json=len(json.loads(request.content)["payload"]))
+        params = request.url.params
+        if params.get("display_number") == "is.null":
+            if params.get("id"):  # keyset page after the last id
+                return httpx.Response(200, json=[])
+            return httpx.Response(200, json=[{"id": case_id} for case_id in self.missing][: int(params["limit"])])
+        return httpx.Response(200, json=self.by_number)
+
+
+def _client(backend):
+    return AsyncSupabaseClient(
+        "http://supabase.test",
+        "anon",
+        "service",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(backend.handle)),
+        resilience=ResilientCaller(max_attempts=1),
+    )
+
+
+def test_backfill_is_one_probe_when_nothing_is_missing():
+    backend = _Cases()
+    assert asyncio.run(_client(backend).backfill_display_numbers()) == 0
+    assert len(backend.requests) == 1
+    assert backend.requests[0].url.params["limit"] == "1"
+
+
+def test_backfill_stores_the_missing_numbers_in_one_rpc():
+    backend = _Cases(missing=["a", "b"])
+    client = _client(backend)
+    assert asyncio.run(client.backfill_display_numbers()) == 2
+    rpc = [r for r in backend.requests if r.url.path.endswith("/rpc/set_display_numbers")]
+    assert len(rpc) == 1
+    assert json.loads(rpc[0].content)["payload"] == [
+        {"id": "a", "display_number": case_display_num("a")},
+        {"id": "b", "display_number": case_display_num("b")},
+    ]
+    assert client.display_index.lookup(case_display_num("a")) == ["a"]
+
+
+def test_lookup_replaces_stale_index_entries_with_the_db_answer():
+    backend = _Cases(by_number=[{"id": "new", "display_number": 1500}])
+    client = _client(backend)
+    client.display_index.add("deleted", 1500)
+    assert asyncio.run(client.find_case_ids_by_display_number(1500)) == ["new"]
+    assert client.display_index.lookup(1500) == ["new"]
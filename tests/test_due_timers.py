@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from due_timers import DueTimerHeap, deadline_of
+
+
+def _at(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def test_deadline_of_accepts_iso_strings_and_datetimes():
+    dt = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+    assert deadline_of(dt) == dt.timestamp()
+    assert deadline_of("2026-10-17T12:00:00Z") == dt.timestamp()
+
+
+def test_next_deadline_is_the_earliest():
+    heap = DueTimerHeap()
+    heap.add("b", _at(2000))
+    heap.add("a", _at(1000))
+    heap.add("c", _at(3000))
+    assert heap.next_deadline() == 1000
+    assert len(heap) == 3
+
+
+def test_pop_due_returns_only_past_entries_in_order():
+    heap = DueTimerHeap()
+    for entry_id, epoch in (("b", 2000), ("a", 1000), ("c", 3000)):
+        heap.add(entry_id, _at(epoch))
+    assert heap.pop_due(now=2000) == ["a", "b"]
+    assert heap.pop_due(now=2000) == []
+    assert heap.next_deadline() == 3000
+
+
+def test_removed_and_rescheduled_entries_are_skipped_lazily():
+    heap = DueTimerHeap()
+    heap.add("a", _at(1000))
+    heap.add("b", _at(2000))
+    heap.remove("a")
+    heap.add("b", _at(5000))  # rescheduled: the old heap item is stale
+    assert heap.next_deadline() == 5000
+    assert heap.pop_due(now=4000) == []
+    assert heap.pop_due(now=5000) == ["b"]
+    assert len(heap) == 0
+
+
+def test_seconds_until_next():
+    heap = DueTimerHeap()
+    assert heap.seconds_until_next(now=0) is None
+    heap.add("a", _at(1000))
+    assert heap.seconds_until_next(now=990) == 10
+    assert heap.seconds_until_next(now=2000) == 0
+
+
+def test_lead_seconds_and_rebuild():
+    heap = DueTimerHeap(lead_seconds=60)
+    heap.add("old", _at(100))
+    heap.rebuild([{"id": "a", "scheduled_at": _at(1000)}, {"id": "b", "scheduled_at": _at(500)}])
+    assert len(heap) == 2
+    assert heap.next_deadline() == 440
+    assert heap.pop_due(now=940) == ["b", "a"]
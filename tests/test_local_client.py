@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timezone
+
+CASE = {
+    "vignette": "Paciente de 45 años",
+    "options": [{"letter": "A", "text": "Uno"}, {"letter": "B", "text": "Dos"}],
+    "correct_letter": "B",
+    "bibliography": ["Harrison"],
+}
+
+
+def test_cases_come_back_shaped_like_postgrest_rows(local_db):
+    async def run():
+        case_id = await local_db.save_case(CASE)
+        await local_db.update_case(case_id, {"published": True, "images": ["1.jpg"], "unknown_column": 1})
+        return await local_db.get_case(case_id)
+
+    case = asyncio.run(run())
+    assert case["options"] == CASE["options"]
+    assert case["bibliography"] == ["Harrison"]
+    assert case["images"] == ["1.jpg"]
+    assert case["published"] is True
+    assert "unknown_column" not in case
+
+
+def test_deleting_a_case_removes_its_scheduled_posts(local_db):
+    async def run():
+        case_id = await local_db.save_case(CASE)
+        entry_id = await local_db.schedule_case(case_id, datetime(2026, 10, 20, 7, tzinfo=timezone.utc), 1)
+        post = await local_db.get_scheduled_post(entry_id, columns="id,scheduled_at,cases(vignette)")
+        assert post["cases"] == {"vignette": CASE["vignette"]}
+        assert post["scheduled_at"].startswith("2026-10-20T07:00:00")
+        await local_db.delete_case(case_id)
+        return await local_db.get_case(case_id), await local_db.get_scheduled_post(entry_id)
+
+    assert asyncio.run(run()) == (None, None)
+
+
+def test_settings_round_trip_as_json(local_db):
+    async def run():
+        assert await local_db.get_setting("queue_hours", [7]) == [7]
+        await local_db.set_setting("queue_hours", [8, 20])
+        await local_db.set_setting("queue_hours", [9])
+        return await local_db.get_setting("queue_hours")
+
+    assert asyncio.run(run()) == [9]
+
+
+def test_images_are_stored_in_the_bucket_directory(local_db, tmp_path):
+    url = asyncio.run(local_db.upload_image(b"jpeg", "photo.jpg"))
+    assert url.startswith("file://") and url.endswith("_photo.jpg")
+    assert [p.read_bytes() for p in (tmp_path / "bucket").iterdir()] == [b"jpeg"]
@@ -0,0 +1,54 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import media_worker
+from media_worker import media_worker_loop, wait_media_job
+
+
+class _Bot:
+    """Telegram stand-in: get_file() returns a downloadable file, or fails."""
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+
+    async def get_file(self, file_id):
+        if file_id in self.broken:
+            raise RuntimeError("file is too big")
+        return self
+
+    async def download_as_bytearray(self):
+        return bytearray(b"jpeg")
+
+
+def _run_worker_until(local_db, bot, job_ids):
+    async def run():
+        worker = asyncio.create_task(media_worker_loop(bot, local_db, "media-1", poll_seconds=0.01))
+        try:
+            return [await wait_media_job(local_db, job_id, timeout=2) for job_id in job_ids]
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_queued_jobs_are_uploaded_by_the_media_worker(local_db, monkeypatch):
+    monkeypatch.setattr(media_worker, "JOB_WAIT_POLL_SECONDS", 0.01)
+    job_ids = [asyncio.run(local_db.enqueue_media_job(f"file-{i}", f"photo_{i}.jpg")) for i in range(2)]
+    urls = _run_worker_until(local_db, _Bot(), job_ids)
+    assert all(url and url.endswith(f"_photo_{i}.jpg") for i, url in enumerate(urls))
+
+
+def test_failed_jobs_report_none_to_the_waiting_handler(local_db, monkeypatch):
+    monkeypatch.setattr(media_worker, "JOB_WAIT_POLL_SECONDS", 0.01)
+    job_id = asyncio.run(local_db.enqueue_media_job("file-x", "photo.jpg"))
+    assert _run_worker_until(local_db, _Bot(broken=["file-x"]), [job_id]) == [None]
+    assert asyncio.run(local_db.get_media_job(job_id))["error_message"] == "file is too big"
+
+
+def test_a_job_is_claimed_once_until_its_lease_expires(local_db):
+    asyncio.run(local_db.enqueue_media_job("file-1", "photo.jpg"))
+    now = datetime.now(timezone.utc)
+    assert len(asyncio.run(local_db.claim_media_jobs("a", now, lease_seconds=60))) == 1
+    assert asyncio.run(local_db.claim_media_jobs("b", now, lease_seconds=60)) == []
+    assert len(asyncio.run(local_db.claim_media_jobs("b", now + timedelta(seconds=61), lease_seconds=60))) == 1
@@ -0,0 +1,43 @@
+import metrics
+from metrics import RollingHistogram, SchedulerMetrics
+
+
+def test_summary_uses_nearest_rank_percentiles():
+    hist = RollingHistogram()
+    for value in range(1, 101):
+        hist.observe(float(value))
+    assert hist.summary() == {"count": 100, "max": 100.0, "p50": 50.0, "p90": 90.0, "p99": 99.0}
+    assert RollingHistogram().summary()["p50"] is None
+
+
+def test_window_drops_old_samples_but_lifetime_buckets_keep_counting(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics.time, "time", lambda: now[0])
+    hist = RollingHistogram(window_seconds=60)
+    hist.observe(0.4)
+    hist.observe(3.0)
+    now[0] += 61
+    hist.observe(700.0)
+    assert hist.values() == [700.0]
+    buckets = hist.buckets()
+    assert buckets["0.5"] == 1
+    assert buckets["5"] == 2
+    assert buckets["900"] == 3
+    assert buckets["+Inf"] == 3
+    assert hist.total_sum == 703.4
+
+
+def test_reports_cover_lag_on_time_ratio_and_failures():
+    slo = SchedulerMetrics()
+    slo.record_published(claim_to_publish=1.0, deadline_lag=5.0, send_duration=0.5)
+    slo.record_published(claim_to_publish=2.0, deadline_lag=90.0, send_duration=0.7)
+    slo.record_failure("too_late")
+    assert slo.on_time_ratio() == 0.5
+    text = slo.render_text()
+    assert "A tiempo (≤60s): 50.0%" in text
+    assert "too_late: 1" in text
+    prometheus = slo.render_prometheus()
+    assert 'scheduler_deadline_lag_seconds_bucket{le="+Inf"} 2' in prometheus
+    assert "scheduler_deadline_lag_seconds_count 2" in prometheus
+    assert 'scheduler_failures_total{cause="too_late"} 1' in prometheus
+    assert "scheduler_on_time_ratio 0.5000" in prometheus
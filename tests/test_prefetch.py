@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import scheduler
+from publisher import LONG_VIGNETTE_QUESTION, build_poll_payload, validate_payload
+
+CASE = {
+    "vignette": "Paciente de 45 años con dolor torácico",
+    "options": [{"letter": "A", "text": "Uno"}, {"letter": "B", "text": "Dos"}],
+    "correct_letter": "B",
+    "tip": "Pensar en SCA",
+}
+
+
+def test_payload_renders_the_case_like_manual_publishing():
+    payload = build_poll_payload("case-1", CASE, "casos_bot")
+    assert payload.question == CASE["vignette"]
+    assert payload.intro_text is None
+    assert payload.options == ["A. Uno", "B. Dos"]
+    assert payload.correct_index == 1
+    assert payload.explanation == "💡 Pensar en SCA"
+    assert payload.button_url.endswith("?startapp=case-1")
+    assert validate_payload(payload) == []
+
+
+def test_long_vignettes_go_before_the_poll_and_long_options_are_cut():
+    case = dict(CASE, vignette="x" * 400, options=[{"letter": "A", "text": "y" * 200}, CASE["options"][1]])
+    payload = build_poll_payload("case-1", case, "casos_bot")
+    assert payload.intro_text == "x" * 400
+    assert payload.question == LONG_VIGNETTE_QUESTION
+    assert len(payload.options[0]) == 100 and payload.options[0].endswith("...")
+
+
+def test_validation_lists_every_problem():
+    case = dict(CASE, vignette="", options=[CASE["options"][0]], correct_letter="Z")
+    errors = validate_payload(build_poll_payload("case-1", case, "casos_bot"))
+    assert errors == [
+        "La viñeta está vacía",
+        "1 opciones (deben ser 2-10)",
+        "La respuesta correcta no coincide con ninguna opción",
+    ]
+
+
+def _schedule_soon(local_db, case):
+    async def run():
+        case_id = await local_db.save_case(case)
+        at = datetime.now(timezone.utc) + timedelta(seconds=60)
+        return case_id, await local_db.schedule_case(case_id, at, 1)
+
+    return asyncio.run(run())
+
+
+def test_prefetch_prepares_the_poll_used_at_publish_time(scheduler_env, local_db):
+    case_id, entry_id = _schedule_soon(local_db, CASE)
+    asyncio.run(scheduler._prefetch_due())
+    case_data, payload, errors = scheduler._prepared[entry_id]
+    assert errors == [] and scheduler_env.sent == []
+    assert scheduler._payload_for(entry_id, case_id, case_data) is payload
+
+
+def test_prefetch_warns_once_about_a_broken_or_missing_case(scheduler_env, local_db, monkeypatch):
+    _, broken = _schedule_soon(local_db, dict(CASE, correct_letter="Z"))
+    _, missing = _schedule_soon(local_db, CASE)
+    get_case = local_db.get_case
+
+    async def get_case_or_none(case_uuid, fresh=False):
+        post = await local_db.get_scheduled_post(missing, columns="case_id")
+        return None if case_uuid == post["case_id"] else await get_case(case_uuid, fresh)
+
+    monkeypatch.setattr(local_db, "get_case", get_case_or_none)
+    asyncio.run(scheduler._prefetch_due())
+    assert scheduler._prepared[missing] == (None, None, ["Caso no encontrado en la DB"])
+    assert len(scheduler_env.sent) == 2
+    # A reconcile re-arms the prefetch timers only for unprepared posts
+    asyncio.run(scheduler._reload_timers())
+    asyncio.run(scheduler._prefetch_due())
+    assert len(scheduler_env.sent) == 2
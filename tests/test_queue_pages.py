@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timezone
+
+from supabase_client import _keyset_filter, queue_cursor
+
+
+def test_queue_cursor_points_after_the_last_row():
+    rows = [{"id": "a", "scheduled_at": "2026-10-17T07:00:00+00:00"}, {"id": "b", "scheduled_at": "2026-10-18T07:00:00+00:00"}]
+    assert queue_cursor(rows) == ("2026-10-18T07:00:00+00:00", "b")
+    assert queue_cursor([]) is None
+
+
+def test_keyset_filter_breaks_ties_on_id():
+    assert _keyset_filter(("2026-10-18T07:00:00+00:00", "b")) == (
+        '(scheduled_at.gt."2026-10-18T07:00:00+00:00",'
+        'and(scheduled_at.eq."2026-10-18T07:00:00+00:00",id.gt.b))'
+    )
+
+
+def test_pages_cover_the_queue_once_even_with_equal_times(local_db):
+    at = datetime(2026, 10, 20, 7, tzinfo=timezone.utc)
+
+    async def run():
+        case_id = await local_db.save_case({"vignette": "v"})
+        scheduled = {await local_db.schedule_case(case_id, at, 1) for _ in range(5)}
+        seen, cursor = [], None
+        while True:
+            page = await local_db.get_queue(limit=2, after=cursor, columns="id,scheduled_at")
+            if not page:
+                return scheduled, seen
+            seen.extend(row["id"] for row in page)
+            cursor = queue_cursor(page)
+
+    scheduled, seen = asyncio.run(run())
+    assert sorted(seen) == sorted(scheduled)
+    assert len(seen) == 5
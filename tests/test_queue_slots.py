@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytz
+
+from queue_slots import QueueSlotAllocator, next_queue_slots
+
+MX = pytz.timezone("America/Mexico_City")
+MADRID = pytz.timezone("Europe/Madrid")
+WEEKDAYS = [1, 2, 3, 4, 5, 6]
+
+
+def test_first_slot_today_when_before_the_hour():
+    now = MX.localize(datetime(2026, 10, 14, 6, 0))  # Wednesday
+    assert next_queue_slots(1, "07:00", WEEKDAYS, None, now) == [MX.localize(datetime(2026, 10, 14, 7, 0))]
+
+
+def test_first_slot_tomorrow_when_past_the_hour():
+    now = MX.localize(datetime(2026, 10, 14, 7, 0))
+    assert next_queue_slots(1, "07:00", WEEKDAYS, None, now) == [MX.localize(datetime(2026, 10, 15, 7, 0))]
+
+
+def test_consecutive_slots_skip_inactive_days():
+    now = MX.localize(datetime(2026, 10, 16, 8, 0))  # Friday, past the hour
+    slots = next_queue_slots(3, "07:00", WEEKDAYS, None, now)
+    assert [s.day for s in slots] == [17, 19, 20]  # Sat, (Sun skipped) Mon, Tue
+    assert all(s.hour == 7 for s in slots)
+
+
+def test_slots_follow_the_last_queued_entry():
+    now = MX.localize(datetime(2026, 10, 14, 6, 0))
+    last = MX.localize(datetime(2026, 10, 20, 7, 0))
+    slots = next_queue_slots(2, "09:30", WEEKDAYS, last, now)
+    assert slots == [MX.localize(datetime(2026, 10, 21, 9, 30)), MX.localize(datetime(2026, 10, 22, 9, 30))]
+
+
+def test_slots_keep_the_local_hour_across_dst():
+    now = MADRID.localize(datetime(2026, 10, 23, 8, 0))  # DST ends on Oct 25
+    slots = next_queue_slots(4, "07:00", [1, 2, 3, 4, 5, 6, 7], None, now)
+    assert [s.hour for s in slots] == [7, 7, 7, 7]
+    assert slots[0].utcoffset() != slots[-1].utcoffset()
+
+
+class _Client:
+    def __init__(self, last_queued=None):
+        self.last_queued = last_queued
+        self.inserted = []
+
+    def add_schedule_listener(self, listener):
+        pass
+
+    async def get_last_queued_date(self):
+        return self.last_queued
+
+    async def get_setting(self, key, default=None):
+        return default
+
+    async def schedule_cases_queue(self, entries, admin_user_id):
+        self.inserted.extend(entries)
+        return [f"entry-{len(self.inserted) - len(entries) + i}" for i in range(len(entries))]
+
+
+def test_allocations_chain_on_the_remembered_tail():
+    client = _Client()
+    allocator = QueueSlotAllocator(client)
+
+    async def run():
+        first = await allocator.allocate(["a", "b"], 1)
+        second = await allocator.allocate(["c"], 1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second[0][1] - first[-1][1] >= timedelta(days=1)
+    assert len({slot for _, slot in first + second}) == 3
+
+
+def test_past_tail_is_ignored_once_the_queue_drained():
+    allocator = QueueSlotAllocator(_Client())
+    now = MX.localize(datetime(2026, 10, 14, 6, 0))
+    allocator._tail = now - timedelta(days=3)
+    slots = asyncio.run(allocator.plan(1, now))
+    assert slots == [MX.localize(datetime(2026, 10, 14, 7, 0))]
+    assert allocator._tail is None
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytz
+
+from config import Config
+from queue_slots import QueueSlotAllocator
+
+
+@pytest.fixture
+def queued(local_db):
+    """Three auto-queued cases plus one manual post, with an allocator."""
+    allocator = QueueSlotAllocator(local_db)
+
+    async def run():
+        case_ids = [await local_db.save_case({"vignette": f"Caso {i}"}) for i in range(3)]
+        await allocator.allocate(case_ids, 1)
+        manual_case = await local_db.save_case({"vignette": "Manual"})
+        await local_db.schedule_case(manual_case, datetime.now(timezone.utc) + timedelta(days=1), 1)
+
+    asyncio.run(run())
+    return allocator
+
+
+def test_plan_keeps_queue_order_and_skips_manual_posts(local_db, queued):
+    asyncio.run(local_db.set_setting("queue_default_hour", "09:30"))
+    moves = asyncio.run(queued.plan_rebalance())
+    assert [move.vignette for move in moves] == ["Caso 0", "Caso 1", "Caso 2"]
+    assert all(move.changed for move in moves)
+    assert all((move.new.hour, move.new.minute) == (9, 30) for move in moves)
+    assert [move.new for move in moves] == sorted(move.new for move in moves)
+
+
+def test_rebalance_moves_every_changed_post(local_db, queued):
+    asyncio.run(local_db.set_setting("queue_default_hour", "09:30"))
+    moves = asyncio.run(queued.plan_rebalance())
+    assert asyncio.run(queued.rebalance([move.entry_id for move in moves])) == 3
+    tz = pytz.timezone(Config.TZ)
+    for move in moves:
+        post = asyncio.run(local_db.get_scheduled_post(move.entry_id, columns="scheduled_at"))
+        assert datetime.fromisoformat(post["scheduled_at"]).astimezone(tz) == move.new
+    # Already balanced: nothing left to move
+    moves = asyncio.run(queued.plan_rebalance())
+    assert not any(move.changed for move in moves)
+    assert asyncio.run(queued.rebalance([move.entry_id for move in moves])) == 0
+
+
+def test_rebalance_refuses_a_stale_preview(local_db, queued):
+    asyncio.run(local_db.set_setting("queue_default_hour", "09:30"))
+    moves = asyncio.run(queued.plan_rebalance())
+    asyncio.run(local_db.cancel_scheduled(moves[0].entry_id))
+    assert asyncio.run(queued.rebalance([move.entry_id for move in moves])) is None
+
+
+def test_rebalance_surfaces_backend_failures(local_db, queued, monkeypatch):
+    async def reschedule_posts(changes):
+        return None
+
+    asyncio.run(local_db.set_setting("queue_default_hour", "09:30"))
+    moves = asyncio.run(queued.plan_rebalance())
+    monkeypatch.setattr(local_db, "reschedule_posts", reschedule_posts)
+    with pytest.raises(RuntimeError):
+        asyncio.run(queued.rebalance([move.entry_id for move in moves]))
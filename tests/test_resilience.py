@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, is_transient
+
+
+def _status_error(status):
+    request = httpx.Request("GET", "http://supabase.test")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_is_transient():
+    assert is_transient(httpx.ConnectError("down"))
+    assert is_transient(asyncio.TimeoutError())
+    assert is_transient(_status_error(503))
+    assert is_transient(_status_error(429))
+    assert not is_transient(_status_error(400))
+    assert not is_transient(ValueError())
+
+
+def test_breaker_opens_after_the_threshold_and_probes_after_the_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert not breaker.would_allow()
+    clock[0] += 30
+    assert breaker.would_allow()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # A failed probe reopens at once
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+class _Flaky:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_idempotent_calls_retry_transient_failures():
+    caller = ResilientCaller(max_attempts=3, base_delay=0)
+    fn = _Flaky([_status_error(503), httpx.ConnectError("down")])
+    assert asyncio.run(caller.call("op", fn)) == "ok"
+    assert fn.calls == 3
+    assert caller.stats()["retries"] == 2
+
+
+def test_non_idempotent_and_non_transient_failures_are_not_retried():
+    caller = ResilientCaller(max_attempts=3, base_delay=0)
+    fn = _Flaky([_status_error(503)])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(caller.call("op", fn, idempotent=False))
+    fn = _Flaky([_status_error(400)])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(caller.call("op", fn))
+    assert fn.calls == 1
+    # A 4xx means the backend answered: it does not count towards the breaker
+    assert caller.breaker.failures == 0
+
+
+def test_open_circuit_fails_fast_without_calling(clock):
+    caller = ResilientCaller(max_attempts=1, failure_threshold=1, reset_timeout=30)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(caller.call("op", _Flaky([httpx.ConnectError("down")])))
+    assert not caller.available
+    fn = _Flaky([])
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(caller.call("op", fn))
+    assert fn.calls == 0
+    assert caller.stats()["fast_failures"] == 1
+    clock[0] += 30
+    assert caller.available
+    assert asyncio.run(caller.call("op", fn)) == "ok"
+    assert caller.breaker.state == "closed"
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import httpx
+
+from resilience import ResilientCaller
+from supabase_client import AsyncSupabaseClient
+
+
+class _Settings:
+    """PostgREST stand-in for bot_settings."""
+
+    def __init__(self, rows):
+        self.rows = dict(rows)
+        self.reads = 0
+        self.down = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.down:
+            return httpx.Response(400)
+        if request.method == "GET":
+            self.reads += 1
+            return httpx.Response(200, json=[{"key": k, "value": v} for k, v in self.rows.items()])
+        body = json.loads(request.content)
+        self.rows[body["key"]] = body["value"]
+        return httpx.Response(201)
+
+
+def _client(backend):
+    return AsyncSupabaseClient(
+        "http://supabase.test",
+        "anon",
+        "service",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(backend.handle)),
+        resilience=ResilientCaller(max_attempts=1),
+    )
+
+
+def test_settings_are_served_from_one_snapshot_load():
+    backend = _Settings({"queue_hours": [7, 19], "queue_days": [1, 2, 3]})
+    client = _client(backend)
+
+    async def run():
+        assert await client.get_setting("queue_hours") == [7, 19]
+        assert await client.get_setting("queue_days") == [1, 2, 3]
+        assert await client.get_setting("missing", "default") == "default"
+
+    asyncio.run(run())
+    assert backend.reads == 1
+
+
+def test_set_setting_writes_through_to_the_snapshot():
+    backend = _Settings({"queue_hours": [7]})
+    client = _client(backend)
+
+    async def run():
+        await client.load_settings()
+        assert await client.set_setting("queue_hours", [8, 20])
+        assert await client.get_setting("queue_hours") == [8, 20]
+
+    asyncio.run(run())
+    assert backend.rows["queue_hours"] == [8, 20]
+    assert backend.reads == 1
+
+
+def test_failed_write_leaves_the_snapshot_alone():
+    backend = _Settings({"queue_hours": [7]})
+    client = _client(backend)
+
+    async def run():
+        await client.load_settings()
+        backend.down = True
+        assert not await client.set_setting("queue_hours", [9])
+        assert await client.get_setting("queue_hours") == [7]
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+import asyncio
+import types
+
+import pytest
+
+import publisher
+from publisher import TokenBucket
+
+
+class FakeClock:
+    """time.monotonic / asyncio.sleep pair where sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(publisher, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(publisher, "asyncio", types.SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+
+def test_burst_up_to_capacity_without_waiting(clock):
+    bucket = TokenBucket(rate=1.0, capacity=3)
+
+    async def run():
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(run())
+    assert clock.slept == []
+    assert bucket.tokens == 0
+
+
+def test_waits_for_the_refill_rate(clock):
+    bucket = TokenBucket(rate=20 / 60, capacity=1)
+
+    async def run():
+        await bucket.acquire()
+        await bucket.acquire()
+
+    asyncio.run(run())
+    assert sum(clock.slept) == pytest.approx(3.0)
+
+
+def test_refill_never_exceeds_capacity(clock):
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    bucket.tokens = 0
+    clock.now += 60
+    bucket._refill()
+    assert bucket.tokens == 2
+
+
+def test_block_holds_every_token_until_retry_after(clock):
+    bucket = TokenBucket(rate=1.0, capacity=5)
+    bucket.block(7)
+
+    async def run():
+        await bucket.acquire()
+
+    asyncio.run(run())
+    assert clock.now >= 1007
+    assert sum(clock.slept) >= 7
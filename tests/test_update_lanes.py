@@ -0,0 +1,68 @@
+import asyncio
+
+from telegram import Update
+
+from update_processing import LANE_FAST, LANE_PUBLIC, PerUserOrderedProcessor
+
+ADMIN_ID = 1
+
+
+def _message(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "text": "/start",
+        },
+    }, None)
+
+
+def _callback(update_id, user_id, data):
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "ci",
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "data": data,
+        },
+    }, None)
+
+
+def test_admins_and_admin_flow_callbacks_take_the_fast_lane():
+    processor = PerUserOrderedProcessor(max_concurrent_updates=2, fast_user_ids=[ADMIN_ID])
+    assert processor.lane_of(_message(1, ADMIN_ID)) == LANE_FAST
+    assert processor.lane_of(_callback(2, 99, "cola_page_2")) == LANE_FAST
+    assert processor.lane_of(_callback(3, 99, "vote_a")) == LANE_PUBLIC
+    assert processor.lane_of(_message(4, 99)) == LANE_PUBLIC
+
+
+def test_admin_updates_run_while_the_public_lane_is_saturated():
+    release = asyncio.Event()
+    done = []
+
+    async def public():
+        await release.wait()
+        done.append("public")
+
+    async def admin():
+        done.append("admin")
+
+    async def run():
+        processor = PerUserOrderedProcessor(max_concurrent_updates=1, fast_user_ids=[ADMIN_ID])
+        spike = [asyncio.create_task(processor.process_update(_message(i, 100 + i), public())) for i in range(5)]
+        await asyncio.sleep(0)
+        assert processor.backlog(LANE_PUBLIC) == 4
+        await asyncio.wait_for(processor.process_update(_message(50, ADMIN_ID), admin()), 1)
+        assert done == ["admin"]
+        release.set()
+        await asyncio.gather(*spike)
+        return processor
+
+    processor = asyncio.run(run())
+    lanes = processor.stats()["lanes"]
+    assert lanes[LANE_FAST]["processed"] == 1
+    assert lanes[LANE_PUBLIC]["processed"] == 5
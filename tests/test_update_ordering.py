@@ -0,0 +1,70 @@
+import asyncio
+
+from telegram import Update
+
+from update_processing import PerUserOrderedProcessor
+
+
+def _message(update_id, user_id, text="hola"):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "text": text,
+        },
+    }, None)
+
+
+def test_ordering_key_is_the_user_then_the_chat():
+    assert PerUserOrderedProcessor.ordering_key(_message(1, 42)) == ("user", 42)
+    channel_post = Update.de_json(
+        {"update_id": 2, "channel_post": {"message_id": 1, "date": 0, "chat": {"id": -100, "type": "channel"}}}, None
+    )
+    assert PerUserOrderedProcessor.ordering_key(channel_post) == ("chat", -100)
+    assert PerUserOrderedProcessor.ordering_key(object()) is None
+
+
+def test_one_users_updates_run_in_order_while_other_users_run_in_parallel():
+    events = []
+
+    async def handle(name, delay):
+        events.append(f"start {name}")
+        await asyncio.sleep(delay)
+        events.append(f"end {name}")
+
+    async def run():
+        processor = PerUserOrderedProcessor(max_concurrent_updates=4)
+        await asyncio.gather(
+            processor.process_update(_message(1, 10), handle("a1", 0.05)),
+            processor.process_update(_message(2, 10), handle("a2", 0)),
+            processor.process_update(_message(3, 20), handle("b1", 0)),
+        )
+        return processor
+
+    processor = asyncio.run(run())
+    # a2 waits for a1; b1 (another user) does not
+    assert events.index("start a2") > events.index("end a1")
+    assert events.index("end b1") < events.index("end a1")
+    assert processor.stats()["users_pending"] == 0
+
+
+def test_worker_limit_bounds_concurrency_across_users():
+    running, peak = [0], [0]
+
+    async def handle():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+
+    async def run():
+        processor = PerUserOrderedProcessor(max_concurrent_updates=2)
+        await asyncio.gather(*(processor.process_update(_message(i, 100 + i), handle()) for i in range(6)))
+        return processor
+
+    processor = asyncio.run(run())
+    assert peak[0] == 2
+    assert processor.stats()["lanes"]["public"]["processed"] == 6
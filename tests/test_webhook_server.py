@@ -0,0 +1,74 @@
+import asyncio
+import os
+import signal
+import types
+
+import httpx
+
+import main
+from webhook_server import SECRET_HEADER, WebhookServer, health_response
+
+UPDATE = {"update_id": 1, "message": {"message_id": 5, "date": 0, "chat": {"id": 7, "type": "private"}, "text": "/start"}}
+
+
+def test_health_routes():
+    assert health_response("/health") == (200, "text/plain", b"OK")
+    assert health_response("/?probe=1")[0] == 200
+    status, content_type, body = health_response("/metrics")
+    assert status == 200 and content_type.startswith("text/plain")
+    assert b"scheduler_deadline_lag_seconds_count" in body
+    assert health_response("/nope")[0] == 404
+
+
+async def _serve(requests):
+    """Start a server on a free port, send (method, path, headers, json) tuples."""
+    application = types.SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+    server = WebhookServer(application, 0, "/telegram", "s3cret", host="127.0.0.1")
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+            statuses = [
+                (await http.request(method, path, headers=headers, json=body)).status_code
+                for method, path, headers, body in requests
+            ]
+    finally:
+        await server.stop()
+    return statuses, application.update_queue, server
+
+
+def test_updates_with_the_secret_token_are_queued():
+    statuses, queue, server = asyncio.run(_serve([("POST", "/telegram", {SECRET_HEADER: "s3cret"}, UPDATE)]))
+    assert statuses == [200]
+    assert queue.get_nowait().update_id == 1
+    assert server.received == 1
+
+
+def test_wrong_or_missing_secret_token_is_rejected():
+    statuses, queue, server = asyncio.run(_serve([
+        ("POST", "/telegram", {SECRET_HEADER: "wrong"}, UPDATE),
+        ("POST", "/telegram", {}, UPDATE),
+    ]))
+    assert statuses == [403, 403]
+    assert queue.empty()
+    assert server.rejected == 2
+
+
+def test_bad_bodies_and_methods_are_refused():
+    statuses, queue, _ = asyncio.run(_serve([
+        ("POST", "/telegram", {SECRET_HEADER: "s3cret"}, ["not", "an", "update"]),
+        ("GET", "/telegram", {}, None),
+        ("POST", "/health", {}, None),
+        ("GET", "/health", {}, None),
+    ]))
+    assert statuses == [400, 405, 405, 200]
+    assert queue.empty()
+
+
+def test_sigterm_sets_the_stop_event():
+    async def run():
+        stop_event = main._stop_on_signals()
+        asyncio.get_running_loop().call_soon(os.kill, os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(stop_event.wait(), 5)
+
+    asyncio.run(run())
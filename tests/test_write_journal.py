@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+
+from resilience import ResilientCaller
+from supabase_client import AsyncSupabaseClient
+from write_journal import WriteJournal
+
+
+class _Backend:
+    """PostgREST stand-in that can be taken down or reject writes."""
+
+    def __init__(self):
+        self.status = 204
+        self.writes = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.status == 204:
+            self.writes.append(json.loads(request.content))
+        return httpx.Response(self.status)
+
+
+def _client(backend, tmp_path):
+    return AsyncSupabaseClient(
+        "http://supabase.test",
+        "anon",
+        "service",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(backend.handle)),
+        resilience=ResilientCaller(max_attempts=1, failure_threshold=100),
+        journal=WriteJournal(str(tmp_path / "journal.db")),
+    )
+
+
+def test_journal_is_fifo_and_survives_reopening(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = WriteJournal(path)
+    journal.append({"n": 1})
+    journal.append({"n": 2})
+    journal.close()
+    journal = WriteJournal(path)
+    assert [op for _, _, op in journal.pending()] == [{"n": 1}, {"n": 2}]
+    journal.ack(journal.pending()[0][0])
+    assert journal.stats()["pending"] == 1
+    assert journal.stats()["replayed"] == 1
+
+
+def test_mutations_go_straight_to_the_backend_when_it_is_up(tmp_path):
+    backend = _Backend()
+    client = _client(backend, tmp_path)
+    assert asyncio.run(client.update_case("case-1", {"vignette": "v1"}))
+    assert backend.writes == [{"vignette": "v1"}]
+    assert client.journal.pending_count() == 0
+
+
+def test_journaled_mutations_replay_before_newer_ones(tmp_path):
+    backend = _Backend()
+    client = _client(backend, tmp_path)
+
+    async def run():
+        backend.status = 503
+        assert await client.update_case("case-1", {"vignette": "v1"})
+        assert client.journal.pending_count() == 1
+        backend.status = 204
+        await client.update_case("case-1", {"vignette": "v2"})
+
+    asyncio.run(run())
+    assert backend.writes == [{"vignette": "v1"}, {"vignette": "v2"}]
+    assert client.journal.pending_count() == 0
+
+
+def test_rejected_replays_are_parked_instead_of_blocking_the_queue(tmp_path):
+    backend = _Backend()
+    client = _client(backend, tmp_path)
+
+    async def run():
+        backend.status = 503
+        await client.update_case("case-1", {"vignette": "v1"})
+        backend.status = 400
+        return await client.drain_journal()
+
+    assert asyncio.run(run()) == 0
+    assert client.journal.stats()["pending"] == 0
+    assert client.journal.stats()["dead"] == 1
@@ -0,0 +1,172 @@
+"""
+Concurrent update processing with per-user ordering.
+
+PerUserOrderedProcessor runs updates of different users in parallel (up to
+`max_concurrent_updates` at a time), while the updates of one user run
+strictly one after another in arrival order, which the ConversationHandler
+state machines (case_conv, edit_pub_conv) rely on. A slow admin upload then
+only delays that admin's own next updates, not public deep links.
+
+Updates are split into two lanes with their own worker slots: admin
+updates (and the admin flows' callback queries) take the fast lane, the
+public traffic (deep links after a post) the bounded public lane, so a
+spike of students never makes the admin's /cola or /publicar wait.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Awaitable, Dict, Hashable, Iterable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import RollingHistogram
+
+logger = logging.getLogger(__name__)
+
+# Cap on public updates accepted but not finished (running + waiting), kept
+# well above the worker limit so a user's queued updates never hold back
+# other users. Enforced per lane here: PTB's own semaphore (taken before
+# do_process_update) is left unbounded so admin updates never queue behind
+# a public spike
+DEFAULT_MAX_IN_FLIGHT = 1000
+
+LANE_FAST = "fast"
+LANE_PUBLIC = "public"
+
+# Callback queries of the admin flows (case_conv, /cola, edit_pub_conv)
+FAST_CALLBACK_PREFIXES = ("action_", "cola_", "edit_pub_")
+
+# Lane wait samples kept for the stats (1 hour)
+LANE_WAIT_WINDOW_SECONDS = 3600
+
+
+class _UserChain:
+    """FIFO lock of one user plus how many of their updates are pending."""
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class PerUserOrderedProcessor(BaseUpdateProcessor):
+    """Parallel across users, sequential per user, admin updates first.
+
+    `max_concurrent_updates` bounds the public lane and `max_in_flight` the
+    public updates accepted at once; the fast lane (updates of
+    `fast_user_ids` and callbacks starting with `fast_callback_prefixes`)
+    has `fast_lane_workers` slots of its own and no in-flight cap.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        fast_user_ids: Iterable[int] = (),
+        fast_lane_workers: int = 4,
+        fast_callback_prefixes: Iterable[str] = FAST_CALLBACK_PREFIXES,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ):
+        super().__init__(sys.maxsize)
+        self.workers = max_concurrent_updates
+        self.max_in_flight = max(max_in_flight, max_concurrent_updates)
+        self._public_in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.fast_workers = fast_lane_workers
+        self.fast_user_ids = set(fast_user_ids)
+        self.fast_callback_prefixes = tuple(fast_callback_prefixes)
+        self._lane_slots = {
+            LANE_FAST: asyncio.Semaphore(fast_lane_workers),
+            LANE_PUBLIC: asyncio.Semaphore(max_concurrent_updates),
+        }
+        self._chains: Dict[Hashable, _UserChain] = {}
+        self.processed = {LANE_FAST: 0, LANE_PUBLIC: 0}
+        self.running = {LANE_FAST: 0, LANE_PUBLIC: 0}
+        self.pending = {LANE_FAST: 0, LANE_PUBLIC: 0}  # accepted, not finished
+        self.lane_wait = {lane: RollingHistogram(LANE_WAIT_WINDOW_SECONDS) for lane in self._lane_slots}
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[Hashable]:
+        """Updates with the same key run in order (user, else chat)."""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return ("user", update.effective_user.id)
+            if update.effective_chat:
+                return ("chat", update.effective_chat.id)
+        return None
+
+    def lane_of(self, update: object) -> str:
+        if isinstance(update, Update):
+            if update.effective_user and update.effective_user.id in self.fast_user_ids:
+                return LANE_FAST
+            data = update.callback_query.data if update.callback_query else None
+            if data and data.startswith(self.fast_callback_prefixes):
+                return LANE_FAST
+        return LANE_PUBLIC
+
+    async def _run(self, lane: str, coroutine: Awaitable[Any], queued_at: float) -> None:
+        async with self._lane_slots[lane]:
+            self.lane_wait[lane].observe(time.monotonic() - queued_at)
+            self.running[lane] += 1
+            try:
+                await coroutine
+            finally:
+                self.running[lane] -= 1
+                self.processed[lane] += 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        queued_at = time.monotonic()
+        lane = self.lane_of(update)
+        self.pending[lane] += 1
+        try:
+            if lane == LANE_FAST:
+                await self._process_ordered(update, lane, coroutine, queued_at)
+            else:
+                async with self._public_in_flight:
+                    await self._process_ordered(update, lane, coroutine, queued_at)
+        finally:
+            self.pending[lane] -= 1
+
+    async def _process_ordered(self, update: object, lane: str, coroutine: Awaitable[Any], queued_at: float) -> None:
+        key = self.ordering_key(update)
+        if key is None:
+            await self._run(lane, coroutine, queued_at)
+            return
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = self._chains[key] = _UserChain()
+        chain.pending += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order: arrival order per user
+            async with chain.lock:
+                await self._run(lane, coroutine, queued_at)
+        finally:
+            chain.pending -= 1
+            if not chain.pending:
+                self._chains.pop(key, None)
+
+    def backlog(self, lane: str = LANE_PUBLIC) -> int:
+        """Updates of a lane accepted but not running yet."""
+        return self.pending[lane] - self.running[lane]
+
+    async def initialize(self) -> None:
+        logger.info(
+            f"Update processor: {self.workers} public + {self.fast_workers} fast-lane "
+            f"concurrent updates, ordered per user"
+        )
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Per lane: running, processed and wait-before-running percentiles (s)."""
+        lanes = {
+            lane: {
+                "running": self.running[lane],
+                "processed": self.processed[lane],
+                "wait": self.lane_wait[lane].summary(),
+            }
+            for lane in self._lane_slots
+        }
+        return {"lanes": lanes, "users_pending": len(self._chains)}
@@ -0,0 +1,159 @@
+"""
+Webhook ingestion: one asyncio HTTP server on PORT for Telegram updates
+and the health/metrics routes (UPDATE_MODE=webhook).
+
+- POST WEBHOOK_PATH: Telegram update, only with the right
+  X-Telegram-Bot-Api-Secret-Token; decoded and put on the Application's
+  update_queue, acknowledged immediately
+- GET /, /health: "OK" for Render
+- GET /metrics: scheduler SLO and deep-link admission metrics (Prometheus text)
+
+Minimal HTTP/1.1 on asyncio streams (keep-alive, Content-Length bodies),
+enough for Telegram and health checkers without a web framework.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+from typing import Optional, Tuple
+
+from telegram import Update
+
+from admission import deeplink_admission
+from metrics import scheduler_metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+# Idle keep-alive connections (and slow clients) are dropped after this
+READ_TIMEOUT_SECONDS = 75
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+def health_response(path: str) -> Tuple[int, str, bytes]:
+    """(status, content type, body) of the health/metrics routes."""
+    path = path.split("?")[0]
+    if path == "/metrics":
+        body = scheduler_metrics.render_prometheus() + deeplink_admission.render_prometheus()
+        return 200, "text/plain; version=0.0.4", body.encode()
+    if path in ("/", "/health"):
+        return 200, "text/plain", b"OK"
+    return 404, "text/plain", b"Not Found"
+
+
+class WebhookServer:
+    """Serves Telegram webhook updates for `application` plus health routes."""
+
+    def __init__(self, application, port: int, path: str, secret_token: str, host: str = "0.0.0.0"):
+        self.application = application
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Webhook server on port {self.port} (updates at {self.path})")
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT_SECONDS)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, content_type, payload = await self._route(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + (b"" if method == "HEAD" else payload)
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except _BadRequest as e:
+            writer.write(f"HTTP/1.1 {e.status} {REASONS.get(e.status, '')}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        except Exception as e:
+            logger.error(f"Webhook connection error: {e}", exc_info=True)
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """(method, path, lowercase headers, body), or None on a clean EOF."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise _BadRequest(400)
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _BadRequest(400)
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise _BadRequest(400)
+        if length < 0:
+            raise _BadRequest(400)
+        if length > MAX_BODY_BYTES:
+            raise _BadRequest(413)
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, headers, body
+
+    async def _route(self, method: str, path: str, headers: dict, body: bytes) -> Tuple[int, str, bytes]:
+        if path.split("?")[0] == self.path:
+            if method != "POST":
+                return 405, "text/plain", b""
+            return await self._handle_update(headers, body)
+        if method not in ("GET", "HEAD"):
+            return 405, "text/plain", b""
+        return health_response(path)
+
+    async def _handle_update(self, headers: dict, body: bytes) -> Tuple[int, str, bytes]:
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()):
+            self.rejected += 1
+            logger.warning("Webhook request with a wrong secret token rejected")
+            return 403, "text/plain", b""
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            logger.error(f"Invalid webhook update: {e}")
+            return 400, "text/plain", b""
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return 200, "text/plain", b""
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
@@ -0,0 +1,103 @@
+"""
+Durable local write-ahead journal for backend mutations.
+
+When enabled (Config.WRITE_JOURNAL_PATH), AsyncSupabaseClient records a
+fire-and-forget mutation (inserts, case PATCH/DELETE, schedule status
+updates, settings upserts) in a local SQLite file when Supabase cannot take
+it (outage, circuit open), and a background drainer replays the entries in
+order once Supabase is reachable. Until the journal is empty, new mutations
+are appended behind the pending ones instead of being sent, so a replay
+never lands on top of newer data. Replay safety comes from the operations
+themselves, not from a key sent to the backend: every journaled operation is
+idempotent (explicit ids, upserts, filtered PATCH/DELETE; schedule status
+updates are also fenced by the publish lease), so replaying an entry that was
+applied right before a crash is harmless. Each entry's idempotency_key is
+only a local, stable id for logs and is never sent to Supabase.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_ERROR_LENGTH = 500
+
+
+class WriteJournal:
+    """Append-only SQLite journal of pending mutations (FIFO by seq)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                op TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                dead INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self.replayed = 0
+        logger.info(f"Write journal at {path} ({self.pending_count()} pending entries)")
+
+    def append(self, op: Dict[str, Any]) -> str:
+        """Record a mutation. Returns its entry key (local only, for logs)."""
+        key = str(uuid.uuid4())
+        self.conn.execute(
+            "INSERT INTO journal (idempotency_key, op, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(op), time.time()),
+        )
+        return key
+
+    def pending(self, limit: int = 50) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Oldest live entries as (seq, entry key, op)."""
+        rows = self.conn.execute(
+            "SELECT seq, idempotency_key, op FROM journal WHERE dead = 0 ORDER BY seq LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [(seq, key, json.loads(op)) for seq, key, op in rows]
+
+    def ack(self, seq: int) -> None:
+        """Entry applied on the backend: drop it."""
+        self.conn.execute("DELETE FROM journal WHERE seq = ?", (seq,))
+        self.replayed += 1
+
+    def record_failure(self, seq: int, error: str, dead: bool = False) -> None:
+        """Count a failed replay; `dead` parks the entry so it stops blocking the queue."""
+        self.conn.execute(
+            "UPDATE journal SET attempts = attempts + 1, last_error = ?, dead = ? WHERE seq = ?",
+            (error[:MAX_ERROR_LENGTH], 1 if dead else 0, seq),
+        )
+
+    def pending_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM journal WHERE dead = 0").fetchone()[0]
+
+    def dead_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM journal WHERE dead = 1").fetchone()[0]
+
+    def oldest_age(self) -> Optional[float]:
+        row = self.conn.execute("SELECT MIN(created_at) FROM journal WHERE dead = 0").fetchone()
+        return time.time() - row[0] if row and row[0] else None
+
+    def stats(self) -> Dict[str, Any]:
+        age = self.oldest_age()
+        return {
+            "pending": self.pending_count(),
+            "dead": self.dead_count(),
+            "replayed": self.replayed,
+            "oldest_pending_seconds": round(age, 1) if age is not None else None,
+        }
+
+    def close(self) -> None:
+        self.conn.close()